@@ -0,0 +1,4 @@
+""" Discrete event simulation of trains on a railroad.
+
+Run `python -m simulation_model --help` for the command-line interface.
+"""
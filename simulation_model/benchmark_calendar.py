@@ -0,0 +1,67 @@
+""" Hold-model benchmark of the event calendar backends.
+
+The calendar is filled with ``size`` pending events on whole hours and
+then ``holds`` pop/push pairs are timed, each pushing the popped event
+back a random number of hours ahead, which keeps the calendar size fixed.
+
+Usage:
+    python -m simulation_model.benchmark_calendar [--sizes 1000 10000 ...] [--holds N]
+"""
+import argparse
+import random
+import time as clock
+
+from . import event_calendar as ec
+
+
+def no_op(simulator, data):
+    pass
+
+
+def hold_benchmark(backend, size, holds=100000, horizon=24 * 30, seed=0):
+    """ Times the pop/push pairs of a calendar holding ``size`` events
+
+    Args:
+        backend (str): calendar backend name, see event_calendar.calendars
+        size (int): number of pending events
+        holds (int): number of timed pop/push pairs
+        horizon (int): range (in hours) of the initial and hold increments
+        seed (int): random seed
+
+    Returns:
+        (float): mean time per pop/push pair in seconds
+    """
+    rng = random.Random(seed)
+    calendar = ec.calendars[backend]()
+    calendar.push_many((rng.randrange(horizon), no_op, None) for _ in range(size))
+    increments = [rng.randrange(1, horizon) for _ in range(holds)]
+
+    start = clock.perf_counter()
+    for increment in increments:
+        time, callback, data = calendar.pop()
+        calendar.push(time + increment, callback, data)
+    return (clock.perf_counter() - start) / holds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10**3, 10**4, 10**5, 10**6])
+    parser.add_argument('--holds', type=int, default=100000)
+    parser.add_argument('--backends', nargs='+', default=['heap', 'bucket', 'list'])
+    parser.add_argument('--max-list-size', type=int, default=10**5,
+                        help='skip the O(n) list backend above this size')
+    args = parser.parse_args()
+
+    print(f'{"pending":>10}' + ''.join(f'{backend:>12}' for backend in args.backends) + '   (us/hold)')
+    for size in args.sizes:
+        row = f'{size:>10}'
+        for backend in args.backends:
+            if backend == 'list' and size > args.max_list_size:
+                row += f'{"-":>12}'
+                continue
+            row += f'{1e6 * hold_benchmark(backend, size, args.holds):>12.2f}'
+        print(row)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+""" Dispatch benchmark on synthetic networks of growing size.
+
+Runs the model on networks with as many yards as terminals and reports
+the time per event, which stays flat when dispatch lookups are O(1).
+
+Usage:
+    python -m simulation_model.benchmark_dispatch [--terminals 50 100 ...] [--horizon H]
+"""
+import argparse
+import time as clock
+
+from . import event_trace as et
+from .build_model import Model
+from .discrete_simulator import Simulator
+from .synthetic import build_network
+
+
+def dispatch_benchmark(terminals, horizon=24 * 30, terminals_per_yard=24, seed=0):
+    """ Times a simulation on a synthetic network
+
+    Args:
+        terminals (int): number of terminals (and yards and trains)
+        horizon (float): simulation time horizon
+        terminals_per_yard (int): number of terminals related to each yard
+        seed (int): random seed
+
+    Returns:
+        events (int): number of simulated events
+        seconds (float): wall time of the simulation
+    """
+    nodes, terminal_list, trains = build_network(terminals, terminals, terminals,
+                                                 terminals_per_yard=terminals_per_yard, seed=seed)
+    model = Model(nodes, terminal_list, trains)
+    model.verbose = False
+    model.trace = et.ring_trace(1)
+
+    start = clock.perf_counter()
+    Simulator().simulate(model, horizon)
+    return model.trace.count, clock.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--terminals', type=int, nargs='+', default=[25, 50, 100, 200, 400])
+    parser.add_argument('--horizon', type=float, default=24 * 30)
+    parser.add_argument('--terminals-per-yard', type=int, default=24)
+    args = parser.parse_args()
+
+    print(f'{"terminals":>10}{"events":>10}{"us/event":>12}')
+    for terminals in args.terminals:
+        events, seconds = dispatch_benchmark(terminals, args.horizon, args.terminals_per_yard)
+        print(f'{terminals:>10}{events:>10}{1e6 * seconds / max(events, 1):>12.2f}')
+
+
+if __name__ == '__main__':
+    main()
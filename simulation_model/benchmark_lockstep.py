@@ -0,0 +1,75 @@
+""" Lockstep benchmark: K variants in one pass against K sequential runs.
+
+Variants of a synthetic network differ in speed and loading time. The
+sequential time is extrapolated from a sample of the variants.
+
+Usage:
+    python -m simulation_model.benchmark_lockstep [--variants 64 256 1024] [--trains F]
+"""
+import argparse
+import pickle
+import time as clock
+
+from .build_model import Model
+from .discrete_simulator import Simulator
+from .lockstep import Lockstep
+from .sweep import build_fleet
+from .synthetic import build_network
+
+
+def variants_of(count, trains):
+    """ Speed/loading time variants of a fleet
+    """
+    return [{'trains': trains, 'speed': 30 + 5 * (index % 7), 'loading_time': 3 + index % 5}
+            for index in range(count)]
+
+
+def sequential_seconds(topology, variants, horizon, sample=32):
+    """ Wall time of simulating the variants one by one, from a sample
+
+    Args:
+        topology (bytes): pickled (nodes, terminals, template trains)
+        variants (list): variants, see Lockstep
+        horizon (float): simulation time horizon
+        sample (int): number of variants simulated
+
+    Returns:
+        (float): estimated seconds for every variant
+    """
+    sampled = variants[::max(1, len(variants) // sample)]
+    start = clock.perf_counter()
+    for variant in sampled:
+        nodes, terminals, templates = pickle.loads(topology)
+        for terminal in terminals:
+            if terminal.can_load:
+                terminal.loading_time = variant['loading_time']
+        model = Model(nodes, terminals, build_fleet(templates, variant['trains'], variant['speed']))
+        model.verbose = False
+        Simulator().simulate(model, horizon)
+    return (clock.perf_counter() - start) * len(variants) / len(sampled)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--variants', type=int, nargs='+', default=[64, 256, 1024])
+    parser.add_argument('--yards', type=int, default=20)
+    parser.add_argument('--trains', type=int, default=10)
+    parser.add_argument('--horizon', type=float, default=24 * 60)
+    args = parser.parse_args()
+
+    nodes, terminals, trains = build_network(args.yards, trains=args.trains)
+    topology = pickle.dumps((nodes, terminals, trains))
+    print(f'{"variants":>10}{"events":>10}{"lockstep s":>12}{"sequential s":>14}{"speedup":>9}')
+    for count in args.variants:
+        variants = variants_of(count, args.trains)
+        start = clock.perf_counter()
+        batch = Lockstep(nodes, terminals, trains, variants)
+        batch.simulate(args.horizon)
+        seconds = clock.perf_counter() - start
+        sequential = sequential_seconds(topology, variants, args.horizon)
+        print(f'{count:>10}{int(batch.pushes.sum()):>10}{seconds:>12.3f}{sequential:>14.3f}'
+              f'{sequential / seconds:>9.1f}')
+
+
+if __name__ == '__main__':
+    main()
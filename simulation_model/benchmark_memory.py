@@ -0,0 +1,141 @@
+""" Memory benchmark of the railroad state objects.
+
+Reports the traced memory per object of every state class and of a whole
+synthetic network with its fleet, for the slotted classes and for
+dict-backed copies of them (the classes before they declared __slots__).
+
+Usage:
+    python -m simulation_model.benchmark_memory [--count N] [--yards Y] [--trains F]
+"""
+import argparse
+import contextlib
+import gc
+import tracemalloc
+
+from . import node as node_module
+from . import synthetic
+from .demand import Demand
+from .distance_map import DistanceMap
+from .node import Node
+from .synthetic import build_network
+from .terminal import Terminal
+from .train import Train
+
+state_classes = {
+    'Train': Train,
+    'Node': Node,
+    'Terminal': Terminal,
+    'Demand': Demand,
+    'DistanceMap': DistanceMap,
+}
+
+
+def dict_backed(cls):
+    """ Copy of a slotted class keeping the attributes in a per-object __dict__
+
+    Args:
+        cls (type): class declaring __slots__
+
+    Returns:
+        (type): class with the same methods and no __slots__
+    """
+    slots = set(cls.__slots__)
+    namespace = {name: value for name, value in vars(cls).items() if name != '__slots__' and name not in slots}
+    return type(cls.__name__, cls.__bases__, namespace)
+
+
+@contextlib.contextmanager
+def using_classes(classes):
+    """ Makes the network builders create objects of other state classes
+
+    Args:
+        classes (dict): class name -> class
+    """
+    saved = [(module, name, getattr(module, name)) for module in (synthetic, node_module)
+             for name in classes if hasattr(module, name)]
+    for module, name, _ in saved:
+        setattr(module, name, classes[name])
+    try:
+        yield
+    finally:
+        for module, name, cls in saved:
+            setattr(module, name, cls)
+
+
+def traced_bytes(build):
+    """ Memory still allocated by a builder after it returns
+
+    Args:
+        build (function): builder returning the objects to keep alive
+
+    Returns:
+        (int): traced bytes
+    """
+    gc.collect()
+    tracemalloc.start()
+    objects = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return size
+
+
+def object_builders(count, classes=state_classes):
+    """ Builders of `count` objects of every state class
+
+    Args:
+        count (int): number of objects
+        classes (dict): class name -> class, defaults to the slotted classes
+
+    Returns:
+        (dict): class name -> builder
+    """
+    Train, Node, Terminal, Demand, DistanceMap = (classes[name] for name in state_classes)
+    terminal = Terminal(id=0, loading_time=1, unloading_time=1)
+    node = Node(node_id=0, node_name='Patio')
+
+    def build_node(index):
+        other = Node(node_id=index, node_name='Patio')
+        other.set_related_nodes([node])
+        other.set_related_terminals([terminal])
+        return other
+
+    def build_terminal(index):
+        other = Terminal(id=index, loading_time=1, unloading_time=1)
+        other.set_related_nodes([node])
+        return other
+
+    return {
+        'Train': lambda: [Train(train_id=index, load=1e3, speed_loaded=40, speed_empty=47)
+                          for index in range(count)],
+        'Node': lambda: [build_node(index) for index in range(count)],
+        'Terminal': lambda: [build_terminal(index) for index in range(count)],
+        'Demand': lambda: [Demand(terminal, terminal, 1e3) for _ in range(count)],
+        'DistanceMap': lambda: [DistanceMap(node, node) for _ in range(count)],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=100000)
+    parser.add_argument('--yards', type=int, default=200)
+    parser.add_argument('--trains', type=int, default=20000)
+    args = parser.parse_args()
+
+    baseline = {name: dict_backed(cls) for name, cls in state_classes.items()}
+    slotted = object_builders(args.count)
+    print(f'{"class":>12}{"dict bytes":>12}{"slots bytes":>13}{"saved":>8}')
+    for name, build in object_builders(args.count, baseline).items():
+        before = traced_bytes(build) / args.count
+        after = traced_bytes(slotted[name]) / args.count
+        print(f'{name:>12}{before:>12.1f}{after:>13.1f}{1 - after / before:>8.0%}')
+
+    with using_classes(baseline):
+        before = traced_bytes(lambda: build_network(args.yards, trains=args.trains))
+    after = traced_bytes(lambda: build_network(args.yards, trains=args.trains))
+    print(f'\nnetwork with {args.yards} yards and {args.trains} trains: '
+          f'{before / 2**20:.1f} MiB dict, {after / 2**20:.1f} MiB slots')
+
+
+if __name__ == '__main__':
+    main()
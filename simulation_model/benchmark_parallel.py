@@ -0,0 +1,65 @@
+""" Parallel benchmark: partitions of a regional network against the sequential engine.
+
+The regions of the network are independent, so every parallel run must
+match the sequential run of the unmodified model exactly.
+
+Usage:
+    python -m simulation_model.benchmark_parallel [--partitions 1 2 4 8] [--regions 8] [--yards 200]
+"""
+import argparse
+import os
+import pickle
+import sys
+import time as clock
+
+from .build_model import Model
+from .discrete_simulator import Simulator
+from .parallel import ParallelSimulator, partition, recursion_limit
+from .synthetic import build_network
+
+
+def outcome(simulator, model):
+    """ Results compared between the engines
+    """
+    productivity, production, time = model.evaluate_produtivity()
+    return (simulator.time, model.queue_time(), productivity.tolist(), production.tolist(), time.tolist(),
+            [demand.current_demand for terminal in model.terminals for demand in terminal.demands])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--partitions', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--regions', type=int, default=8)
+    parser.add_argument('--yards', type=int, default=200)
+    parser.add_argument('--trains', type=int, default=2000)
+    parser.add_argument('--horizon', type=float, default=24 * 365)
+    parser.add_argument('--window', type=float, default=24 * 30)
+    args = parser.parse_args()
+
+    sys.setrecursionlimit(recursion_limit(args.yards))
+    topology = pickle.dumps(build_network(args.yards, trains=args.trains, regions=args.regions))
+    model = Model(*pickle.loads(topology))
+    model.verbose = False
+    simulator = Simulator()
+    start = clock.perf_counter()
+    simulator.simulate(model, args.horizon)
+    sequential = clock.perf_counter() - start
+    expected = outcome(simulator, model)
+
+    print(f'{os.cpu_count()} cores, sequential {sequential:.2f} s')
+    print(f'{"partitions":>10}{"window":>8}{"rounds":>8}{"events":>9}{"parallel s":>12}{"speedup":>9}  match')
+    for partitions in args.partitions:
+        parallel_model = Model(*pickle.loads(topology))
+        parallel_model.verbose = False
+        assignment = partition(parallel_model, partitions)
+        parallel = ParallelSimulator(assignment=assignment, window=args.window)
+        start = clock.perf_counter()
+        parallel.simulate(parallel_model, args.horizon)
+        seconds = clock.perf_counter() - start
+        match = outcome(parallel, parallel_model) == expected
+        print(f'{max(assignment) + 1:>10}{args.window:>8g}{parallel.rounds:>8}{parallel.events:>9}'
+              f'{seconds:>12.2f}{sequential / seconds:>9.2f}  {match}')
+
+
+if __name__ == '__main__':
+    main()
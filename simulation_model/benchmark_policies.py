@@ -0,0 +1,140 @@
+""" Dispatch policy benchmark: throughput against decision cost.
+
+Runs every dispatch policy on the same replicated scenarios (seeded
+perturbations of one network) in a process pool, and reports the mean
+productivity and queue time with the wall time spent per decision.
+
+Usage:
+    python -m simulation_model.benchmark_policies [--yards Y] [--trains F] [--replications R]
+"""
+import argparse
+import os
+import pickle
+import time as clock
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from . import dispatch
+from . import replication
+from .build_model import Model
+from .discrete_simulator import Simulator
+from .synthetic import build_network
+
+policy_dtype = np.dtype([
+    ('policy', 'U16'),
+    ('productivity', float),
+    ('productivity_ci', float, 2),
+    ('queue_time', float),
+    ('us_per_decision', float),
+    ('seconds_per_run', float),
+])
+
+
+def timed_policy(policy, counter):
+    """ Wraps the decisions of a policy with a call counter and timer
+
+    Args:
+        policy (:obj:DispatchPolicy): dispatch policy
+        counter (list): [decisions, seconds], updated in place
+
+    Returns:
+        (:obj:DispatchPolicy): the policy
+    """
+    for name in ('choose_terminal', 'choose_node'):
+        def timed(*args, decide=getattr(policy, name)):
+            start = clock.perf_counter()
+            result = decide(*args)
+            counter[1] += clock.perf_counter() - start
+            counter[0] += 1
+            return result
+        setattr(policy, name, timed)
+    return policy
+
+
+def run_policy(name, seed, horizon, spread=0.2, topology=None):
+    """ Simulates one replication with a dispatch policy
+
+    Args:
+        name (str): policy name, see dispatch.policies
+        seed (int): random seed of the replication
+        horizon (float): simulation time horizon
+        spread (float): relative perturbation, see replication.perturb
+        topology (bytes): pickled (nodes, terminals, trains), defaults to the worker topology
+
+    Returns:
+        (tuple): productivity, queue time, decisions, decision seconds, run seconds
+    """
+    nodes, terminals, trains = pickle.loads(topology if topology is not None else replication.worker_topology)
+    if spread:
+        replication.perturb(terminals, trains, np.random.default_rng(seed), spread)
+    counter = [0, 0.0]
+    model = Model(nodes, terminals, trains)
+    model.verbose = False
+    model.policy = timed_policy(dispatch.policies[name](), counter)
+
+    start = clock.perf_counter()
+    Simulator().simulate(model, horizon)
+    seconds = clock.perf_counter() - start
+    productivity, _, _ = model.evaluate_produtivity()
+    return productivity[-1] if len(productivity) else 0, model.queue_time(), counter[0], counter[1], seconds
+
+
+def compare_policies(nodes, terminals, trains, horizon, names=None, replications=20, spread=0.2, workers=None):
+    """ Runs every policy on the same replications
+
+    Args:
+        nodes (list): list of nodes
+        terminals (list): list of terminals
+        trains (list): list of trains
+        horizon (float): simulation time horizon
+        names (list): policy names, defaults to all of dispatch.policies
+        replications (int): number of replications (seeds 0..replications-1)
+        spread (float): relative perturbation, see replication.perturb
+        workers (int): number of worker processes (defaults to all cores, 1 runs in process)
+
+    Returns:
+        (np.ndarray): structured array with policy_dtype fields, one row per policy
+    """
+    names = list(dispatch.policies) if names is None else names
+    topology = pickle.dumps((nodes, terminals, trains))
+    workers = workers or os.cpu_count()
+    args = [(name, seed, horizon, spread) for name in names for seed in range(replications)]
+    if workers == 1:
+        results = [run_policy(*arg, topology=topology) for arg in args]
+    else:
+        with ProcessPoolExecutor(workers, initializer=replication.set_worker_topology, initargs=(topology,)) as pool:
+            results = list(pool.map(run_policy, *zip(*args)))
+
+    rows = []
+    for index, name in enumerate(names):
+        runs = np.array(results[index * replications:(index + 1) * replications], dtype=float)
+        productivity = replication.summarize(runs[:, 0])
+        rows.append((name, productivity['mean'], productivity['ci'], runs[:, 1].mean(),
+                     1e6 * runs[:, 3].sum() / max(runs[:, 2].sum(), 1), runs[:, 4].mean()))
+    return np.array(rows, dtype=policy_dtype)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--yards', type=int, default=50)
+    parser.add_argument('--trains', type=int, default=100)
+    parser.add_argument('--terminals-per-yard', type=int, default=12)
+    parser.add_argument('--horizon', type=float, default=24 * 30)
+    parser.add_argument('--replications', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    nodes, terminals, trains = build_network(args.yards, trains=args.trains,
+                                             terminals_per_yard=args.terminals_per_yard)
+    table = compare_policies(nodes, terminals, trains, args.horizon,
+                             replications=args.replications, workers=args.workers)
+    print(f'{"policy":>14}{"productivity":>14}{"95% CI":>22}{"queue time":>12}{"us/decision":>13}{"s/run":>8}')
+    for row in table:
+        ci = f'[{row["productivity_ci"][0]:.1f}, {row["productivity_ci"][1]:.1f}]'
+        print(f'{row["policy"]:>14}{row["productivity"]:>14.1f}{ci:>22}{row["queue_time"]:>12.0f}'
+              f'{row["us_per_decision"]:>13.2f}{row["seconds_per_run"]:>8.3f}')
+
+
+if __name__ == '__main__':
+    main()
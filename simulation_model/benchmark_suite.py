@@ -0,0 +1,215 @@
+""" Benchmark suite on synthetic networks at several scales, with JSON baselines.
+
+Every scale runs in a fresh process (so the peak RSS is its own), first
+uninstrumented for the events per second, then with timers around the
+calendar, the dispatch decisions and the event trace for the time per
+event spent in each. Results can be saved as a baseline and later runs
+compared against it; no network access is needed.
+
+Usage:
+    python -m simulation_model.benchmark_suite [--scales small medium] [--save baseline.json]
+    python -m simulation_model.benchmark_suite --compare baseline.json [--tolerance 0.2]
+"""
+import argparse
+import json
+import multiprocessing
+import platform
+import resource
+import sys
+import time as clock
+from concurrent.futures import ProcessPoolExecutor
+
+from . import event_trace as et
+from .build_model import Model
+from .discrete_simulator import Simulator
+from .profiling import Profiler
+from .synthetic import build_network
+
+# name: (yards, terminals, trains, horizon)
+scales = {
+    'small': (10, 10, 20, 24 * 30),
+    'medium': (100, 100, 200, 24 * 30),
+    'large': (1000, 1000, 2000, 24 * 30),
+}
+
+
+def timed(obj, name, counter):
+    """ Replaces a method of an object by a timed wrapper
+
+    Args:
+        obj: object whose method is wrapped
+        name (str): method name
+        counter (list): [calls, seconds], updated in place
+    """
+    method = getattr(obj, name)
+
+    def wrapper(*args, **kwargs):
+        start = clock.perf_counter()
+        result = method(*args, **kwargs)
+        counter[1] += clock.perf_counter() - start
+        counter[0] += 1
+        return result
+    setattr(obj, name, wrapper)
+
+
+def build(yards, terminals, trains, seed):
+    """ Model of a synthetic network
+    """
+    model = Model(*build_network(yards, terminals, trains, seed=seed))
+    model.verbose = False
+    return model
+
+
+def run_scale(name, yards, terminals, trains, horizon, seed=0):
+    """ Benchmarks one scale, meant to run in a fresh process
+
+    Args:
+        name (str): scale name
+        yards (int): number of yards
+        terminals (int): number of terminals
+        trains (int): number of trains
+        horizon (float): simulation time horizon
+        seed (int): random seed of the network
+
+    Returns:
+        (dict): scale, events, seconds, events_per_second, us_per_event,
+            peak_rss_mb and the us per event of calendar, dispatch and logging
+    """
+    model = build(yards, terminals, trains, seed)
+    start = clock.perf_counter()
+    Simulator().simulate(model, horizon)
+    seconds = clock.perf_counter() - start
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    model = build(yards, terminals, trains, seed)
+    model.trace = et.array_trace()
+    simulator = Simulator()
+    simulator.profiler = Profiler(sample_every=1000)
+    counters = {'calendar': [0, 0.0], 'dispatch': [0, 0.0], 'logging': [0, 0.0]}
+    for method in ('push', 'pop'):
+        timed(simulator.calendar, method, counters['calendar'])
+    for method in ('get_next_terminal', 'get_next_terminals', 'get_closest_node'):
+        timed(model, method, counters['dispatch'])
+    timed(model.trace, 'record', counters['logging'])
+    simulator.simulate(model, horizon)
+
+    events = simulator.profiler.events
+    return {
+        'scale': name,
+        'yards': yards,
+        'terminals': terminals,
+        'trains': trains,
+        'horizon': horizon,
+        'events': events,
+        'seconds': seconds,
+        'events_per_second': events / seconds if seconds > 0 else 0,
+        'us_per_event': 1e6 * seconds / max(events, 1),
+        'peak_rss_mb': peak_rss_mb,
+        'breakdown_us_per_event': {part: 1e6 * counter[1] / max(events, 1) for part, counter in counters.items()},
+        'max_queue_length': simulator.profiler.to_dict()['queue_length']['max'],
+    }
+
+
+def run_suite(names, seed=0):
+    """ Runs the scales, each in its own process
+
+    Args:
+        names (list): scale names, see scales
+        seed (int): random seed of the networks
+
+    Returns:
+        (dict): machine description and per-scale results
+    """
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for name in names:
+        with ProcessPoolExecutor(1, mp_context=context) as pool:
+            results.append(pool.submit(run_scale, name, *scales[name], seed).result())
+    return {
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'seed': seed,
+        'results': results,
+    }
+
+
+def load_baseline(path):
+    """ Reads a baseline written with --save
+
+    Args:
+        path (str): JSON baseline
+
+    Returns:
+        (dict): saved results of run_suite
+
+    Raises:
+        ValueError: if the file is not a benchmark baseline
+    """
+    with open(path) as file:
+        baseline = json.load(file)
+    keys = ('scale', 'events', 'us_per_event', 'peak_rss_mb')
+    results = baseline.get('results') if isinstance(baseline, dict) else None
+    if not isinstance(results, list) or not all(isinstance(result, dict) and all(key in result for key in keys)
+                                                for result in results):
+        raise ValueError(f'{path} is not a benchmark baseline')
+    return baseline
+
+
+def compare(suite, baseline, tolerance=0.2):
+    """ Lists the scales slower than the baseline
+
+    Args:
+        suite (dict): results of run_suite
+        baseline (dict): saved results of run_suite
+        tolerance (float): relative slowdown allowed
+
+    Returns:
+        (list): messages, one per regression
+    """
+    reference = {result['scale']: result for result in baseline['results']}
+    regressions = []
+    for result in suite['results']:
+        base = reference.get(result['scale'])
+        if base is None:
+            continue
+        if result['events'] != base['events']:
+            regressions.append(f'{result["scale"]}: {result["events"]} events, baseline {base["events"]}')
+        for key in ('us_per_event', 'peak_rss_mb'):
+            if result[key] > base[key] * (1 + tolerance):
+                regressions.append(f'{result["scale"]}: {key} {result[key]:.2f}, baseline {base[key]:.2f}')
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', nargs='+', default=['small', 'medium'], choices=list(scales))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', default=None, help='write the results as a JSON baseline')
+    parser.add_argument('--compare', default=None, help='JSON baseline to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    baseline = load_baseline(args.compare) if args.compare is not None else None
+    suite = run_suite(args.scales, args.seed)
+    print(f'{"scale":>8}{"events":>10}{"events/s":>12}{"us/event":>10}{"RSS MB":>9}'
+          f'{"calendar":>10}{"dispatch":>10}{"logging":>10}')
+    for result in suite['results']:
+        breakdown = result['breakdown_us_per_event']
+        print(f'{result["scale"]:>8}{result["events"]:>10}{result["events_per_second"]:>12.0f}'
+              f'{result["us_per_event"]:>10.2f}{result["peak_rss_mb"]:>9.1f}'
+              f'{breakdown["calendar"]:>10.2f}{breakdown["dispatch"]:>10.2f}{breakdown["logging"]:>10.2f}')
+
+    if args.save is not None:
+        with open(args.save, 'w') as file:
+            json.dump(suite, file, indent=2)
+    if baseline is not None:
+        regressions = compare(suite, baseline, args.tolerance)
+        for message in regressions:
+            print(f'regression {message}')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,13 @@
 import numpy as np
 from cmath import inf
 
+from . import event_trace as et
+from .resources import Resource
+from .online_stats import OnlineStatistics
+from . import queue_history as qh
+from . import routing
+from .topology import Topology
+
 class Model:
     ''' Discrete event system model
     '''
@@ -16,26 +23,86 @@ class Model:
         self.nodes = nodes
         self.terminals = terminals
         self.trains = trains
+        self.topology = Topology(nodes, terminals)
+        self.routing = None
+        self.trace = None
         self.verbose = True
-        self.log_queue = [[1e-10, 0]]
+        self.total_queue_time = 0
+        self.history = None
+        self.stats = OnlineStatistics()
+        # candidate count from which get_next_terminal is evaluated with NumPy
+        self.vectorize_threshold = 8
+        # dispatch policy (see dispatch.py), None applies the built-in rules
+        self.policy = None
+        # random service and transit times (see stochastic.py), None keeps the nominal times
+        self.randomness = None
+
+    @property
+    def verbose(self):
+        ''' True if events are printed as they happen
+        '''
+        return isinstance(self.trace, et.text_trace)
+
+    @verbose.setter
+    def verbose(self, verbose):
+        if verbose:
+            self.trace = et.text_trace(self.nodes)
+        elif self.verbose:
+            self.trace = None
 
     def clear(self):
         ''' Clear model at the beginning of a simulation.
+
+        Queues are registers holding the time each terminal or node is free
+        again. Their history is only kept when a QueueHistory is set in
+        self.history.
         '''
-        self.terminal_queues = [[0] for _ in self.terminals]
-        self.node_queues = [[0] for _ in self.nodes]
-        self.terminal_queues_forecast = [[0] for _ in self.terminals]
-        self.node_queues_forecast = [[0] for _ in self.nodes]
-        
-        self.log_loaded = [[] for _ in self.terminals]
-        self.log_unloaded = [[] for _ in self.terminals]
-
-        for index, terminal in enumerate(self.terminals):
-            terminal_log = {self.terminals.index(destiny): [[1e-10, 0]] for destiny in self.terminals if destiny != terminal}
-            if terminal.can_load:
-                self.log_loaded[index] = terminal_log
-            if terminal.can_unload:
-                self.log_unloaded[index] = terminal_log
+        self.terminal_queues = [0 for _ in self.terminals]
+        self.node_queues = [0 for _ in self.nodes]
+        self.terminal_queues_forecast = np.zeros(len(self.terminals))
+        self.node_queues_forecast = [0 for _ in self.nodes]
+        if self.history is not None:
+            self.history.clear()
+        self.pending_events = [None for _ in self.trains]
+        # demands still to be achieved, kept up to date on every delivery
+        self.unmet_demands = self.count_unmet_demands()
+
+        # multi-berth terminals and finite track segments, None if there are none
+        self.berths = None
+        self.forecast_berths = None
+        if any(terminal.berths > 1 for terminal in self.terminals):
+            self.berths = [Resource(terminal.berths) if terminal.berths > 1 else None
+                           for terminal in self.terminals]
+            self.forecast_berths = [Resource(terminal.berths) if terminal.berths > 1 else None
+                                    for terminal in self.terminals]
+        # a segment is shared by both directions of a pair of nodes
+        self.segments = {}
+        for origin, node in enumerate(self.nodes):
+            for dist_map in node.distance_map:
+                if dist_map.tracks is not None:
+                    destiny = self.topology.node_index[dist_map.destiny]
+                    key = (min(origin, destiny), max(origin, destiny))
+                    if key not in self.segments:
+                        self.segments[key] = Resource(dist_map.tracks)
+        self.set_service_times()
+
+        # the delivery log starts with an empty delivery per loading route
+        routes = sum(len(self.terminals) - 1 for terminal in self.terminals if terminal.can_load)
+        self.stats.reset(routes)
+        self.total_queue_time = 0
+        if self.policy is not None:
+            self.policy.bind(self)
+        if self.randomness is not None:
+            self.randomness.bind(self)
+
+    def set_service_times(self):
+        ''' Reads the terminal loading and unloading times into the arrays of
+        the terminal selection (inf where a terminal does not serve)
+        '''
+        self.loading_times = np.array([inf if terminal.loading_time is None else terminal.loading_time
+                                       for terminal in self.terminals], dtype=float)
+        self.unloading_times = np.array([inf if terminal.unloading_time is None else terminal.unloading_time
+                                         for terminal in self.terminals], dtype=float)
     
     @staticmethod
     def initialize_logs(self, logs):
@@ -49,14 +116,88 @@ class Model:
         Args:
             Simulator (:obj:Simulator): Simulator
         '''
-        for train_index, train in enumerate(self.trains):
-            origin = self.nodes.index(train.origin)
-            to_load = not train.is_loaded
-            destiny = self.get_next_terminal(simulator.time, self.nodes[origin].related_terminals, 
-                                             train.current_demand, to_load)
-            train.destiny = self.terminals[destiny]
-            data = [origin, destiny, train, train_index]
-            simulator.add_event(simulator.time, self.from_port2terminal, data)
+        # consecutive trains leaving the same node with the same load are dispatched together
+        train_index = 0
+        while train_index < len(self.trains):
+            origin = self.topology.node_index[self.trains[train_index].origin]
+            to_load = not self.trains[train_index].is_loaded
+            group = [train_index]
+            while (group[-1] + 1 < len(self.trains)
+                   and self.trains[group[-1] + 1].origin is self.trains[train_index].origin
+                   and self.trains[group[-1] + 1].is_loaded != to_load):
+                group.append(group[-1] + 1)
+            destinies = self.get_next_terminals(simulator.time, origin,
+                                                [self.trains[index].current_demand for index in group], to_load)
+            for index, destiny in zip(group, destinies):
+                train = self.trains[index]
+                train.destiny = self.terminals[destiny]
+                data = [origin, destiny, train, index]
+                self.pending_events[data[3]] = simulator.add_event(simulator.time, self.from_port2terminal, data)
+            train_index = group[-1] + 1
+
+    def cancel_train_event(self, train_index):
+        ''' Withdraw the pending event of a train
+
+        Args:
+            train_index (int): index of the train
+        '''
+        if self.pending_events[train_index] is not None:
+            self.pending_events[train_index].cancel()
+
+    def reschedule_train_event(self, train_index, time):
+        ''' Move the pending event of a train to a new fire time
+
+        Args:
+            train_index (int): index of the train
+            time (float): new fire time
+        '''
+        self.pending_events[train_index].reschedule(time)
+
+    def delay_train(self, train_index, delay):
+        ''' Delay a train (e.g. a breakdown) and the trains queued behind it
+
+        The pending event of the train moves by `delay`. A train in service
+        at a single-berth terminal holds the terminal register, and a train
+        travelling to a node holds the arrival register of the node: the
+        trains admitted behind it were timed from that register, so their
+        events move by the same delay, and so does the register. The
+        forecast of the terminal a train is bound to moves as well. The
+        bookings of multi-berth terminals and finite track segments are not
+        moved: a train in service at a multi-berth terminal is delayed alone.
+
+        Args:
+            train_index (int): index of the train
+            delay (float): delay (hours)
+        '''
+        handle = self.pending_events[train_index]
+        if handle is None or handle.cancelled or delay <= 0:
+            return
+        name = handle.callback.__name__
+        destiny = handle.data[1]
+        old_time = handle.time
+
+        queued = []
+        if name == 'from_port2port':
+            queued = [index for index, other in enumerate(self.pending_events)
+                      if index != train_index and other is not None and not other.cancelled
+                      and other.callback.__name__ == name and other.data[1] == destiny and other.time > old_time]
+            if self.node_queues[destiny] >= old_time:
+                self.node_queues[destiny] += delay
+        elif name in ('on_finish_loading', 'on_finish_unloading', 'from_port2terminal'):
+            single_berth = self.berths is None or self.berths[destiny] is None
+            if name != 'from_port2terminal' and single_berth:
+                queued = [index for index, other in enumerate(self.pending_events)
+                          if index != train_index and other is not None and not other.cancelled
+                          and other.callback.__name__ in ('on_finish_loading', 'on_finish_unloading')
+                          and other.data[1] == destiny and other.time > old_time]
+                if self.terminal_queues[destiny] >= old_time:
+                    self.terminal_queues[destiny] += delay
+            if single_berth and self.terminal_queues_forecast[destiny] >= old_time:
+                self.terminal_queues_forecast[destiny] += delay
+                if self.policy is not None:
+                    self.policy.on_forecast(destiny)
+        for index in [train_index] + queued:
+            self.reschedule_train_event(index, self.pending_events[index].time + delay)
 
     def queue_time(self):
         ''' Queue time of railroad system.
@@ -65,46 +206,37 @@ class Model:
             (float): queue time.
         '''
         
-        log = np.array(self.log_queue)
-        return np.sum(log[:, 1])
+        return self.total_queue_time
 
-    def evaluate_produtivity(self):
-        time = np.array([])
-        production = np.array([])
-        for load in self.log_loaded:
-            if load:
-                for key in load.keys():
-                    log = np.array(load[key])
-                    t = log[:, 0]
-                    p = log[:, 1]
-                    time = np.append(time, t)
-                    production = np.append(production, p)
-        productivity = np.cumsum(production)/time
-        productivity = productivity[:-1]
-        
-        return productivity, production, time
+    def count_unmet_demands(self):
+        """ Counts the demands not achieved yet
 
-    @staticmethod
-    def get_formatted_time(time):
-        """ Formats the time to a 24 hours interval
+        Returns:
+            (int): number of demands
+        """
+        return sum(not demand.achieved_demand for terminal in self.terminals for demand in terminal.demands)
 
-        Args:
-            time (int): current simulation time
+    def evaluate_produtivity(self):
+        ''' Productivity of the railroad system, from the delivered loads.
+
+        Reads the running statistics, the arrays are not copied.
 
         Returns:
-            time (int): updated time
-        """
-        while time > 24:
-            time -= 24
-        return time
+            productivity (np.array): cumulative production over time at each delivery
+            production (np.array): delivered load
+            time (np.array): delivery time
+        '''
+        return self.stats.productivity_log()
+
+    get_formatted_time = staticmethod(et.get_formatted_time)
 
-    def get_next_terminal(self, time, terminals, demand, to_load):
+    def get_next_terminal(self, time, node, demand, to_load):
         """ Gets the next terminal by evaluating the transit-time, 
         the queue and the demand of the possible destiny
         
         Args:
             time (int): current simulation time
-            terminals (list): list of possible destiny terminals
+            node (int): index of the node whose related terminals are the possible destinies
             demand (list): current train demand [origin, destiny]
             to_load (bool): True if the train is empty and will load
         
@@ -112,19 +244,84 @@ class Model:
             next_terminal_index (int): index of the destiny terminal
         
         """
-        total_time = inf
-        next_terminal_index = self.terminals.index(terminals[0])
-        for terminal in terminals:
-            terminal_queue_time = max(time, self.terminal_queues_forecast[self.terminals.index(terminal)][-1]) 
-            terminal_queue_time += terminal.loading_time if to_load else terminal.unloading_time
-            if terminal_queue_time < total_time:
-                current_demand = terminal.get_demand(demand[0], demand[1])
-                if current_demand is None or not current_demand.achieved_demand:
-                    total_time = terminal_queue_time
-                    next_terminal_index = self.terminals.index(terminal)
-        self.terminal_queues_forecast[next_terminal_index].append(total_time)
+        candidates = self.topology.related_terminals[node]
+        if self.policy is not None:
+            next_terminal_index, total_time = self.policy.choose_terminal(time, node, demand, to_load)
+        elif len(candidates) >= self.vectorize_threshold:
+            return self.get_next_terminals(time, node, [demand], to_load)[0]
+        else:
+            service_times = self.loading_times if to_load else self.unloading_times
+            total_time = inf
+            next_terminal_index = candidates[0]
+            for index in candidates:
+                terminal_queue_time = max(time, self.terminal_queues_forecast[index]) + service_times[index]
+                if terminal_queue_time < total_time:
+                    current_demand = self.terminals[index].get_demand(demand[0], demand[1])
+                    if current_demand is None or not current_demand.achieved_demand:
+                        total_time = terminal_queue_time
+                        next_terminal_index = index
+        self.set_forecast(next_terminal_index, total_time)
+        if self.history is not None:
+            self.history.record(time, qh.TERMINAL_FORECAST, next_terminal_index, total_time)
         return next_terminal_index
 
+    def get_next_terminals(self, time, node, demands, to_load):
+        """ Vectorized get_next_terminal for trains leaving the same node at the same time
+
+        The expected finish time of every candidate is evaluated once with
+        NumPy. Trains are assigned in order, each one picking the first
+        candidate with the smallest time whose demand is not achieved, as
+        the strict < rule of get_next_terminal does.
+
+        Args:
+            time (int): current simulation time
+            node (int): index of the node whose related terminals are the possible destinies
+            demands (list): current demand [origin, destiny] of every train
+            to_load (bool): True if the trains are empty and will load
+
+        Returns:
+            next_terminal_indexes (list): index of the destiny terminal of every train
+        """
+        if self.policy is not None:
+            return [self.get_next_terminal(time, node, demand, to_load) for demand in demands]
+        candidates = self.topology.candidates(node)
+        service_times = (self.loading_times if to_load else self.unloading_times)[candidates]
+        times = np.maximum(time, self.terminal_queues_forecast[candidates]) + service_times
+        next_terminal_indexes = []
+        for demand in demands:
+            allowed = times
+            for index, current_demand in self.topology.demand_holders.get((demand[0], demand[1]), ()):
+                if current_demand.achieved_demand:
+                    if allowed is times:
+                        allowed = times.copy()
+                    allowed[candidates == index] = inf
+            position = int(allowed.argmin())
+            total_time = allowed[position]
+            if not total_time < inf:
+                position, total_time = 0, inf
+            next_terminal_index = int(candidates[position])
+            self.set_forecast(next_terminal_index, total_time)
+            if self.history is not None:
+                self.history.record(time, qh.TERMINAL_FORECAST, next_terminal_index, total_time)
+            times[position] = max(time, self.terminal_queues_forecast[next_terminal_index]) + service_times[position]
+            next_terminal_indexes.append(next_terminal_index)
+        return next_terminal_indexes
+
+    def set_forecast(self, index, total_time):
+        """ Books a terminal forecast: the register holds the first forecast free berth
+
+        Args:
+            index (int): terminal index
+            total_time (float): expected finish time of the assigned train
+        """
+        if self.forecast_berths is None or self.forecast_berths[index] is None:
+            self.terminal_queues_forecast[index] = total_time
+        else:
+            self.forecast_berths[index].replace(total_time)
+            self.terminal_queues_forecast[index] = self.forecast_berths[index].next_free()
+        if self.policy is not None:
+            self.policy.on_forecast(index)
+
     def get_closest_node(self, train, time):
         """ Calculates the closest destiny node to the current origin
 
@@ -135,19 +332,112 @@ class Model:
             destiny_index (int): index of the closest destiny
             transit_time (int): transit time (in hours) from the current origin to destiny
         """
-        
-        transit_time = inf
+        if self.policy is not None:
+            return self.policy.choose_node(train, time)
+        return self.get_next_node(train, time)
+
+    def get_next_node(self, train, time):
+        """ Built-in node choice: the next hop towards the routing target if
+        routing is enabled, the nearest node otherwise
+
+        Args:
+            train (:obj:Train): current train
+            time (int): current simulation time
+
+        Returns:
+            destiny_index (int): index of the destiny node
+            transit_time (int): transit time (in hours) from the current origin to destiny
+        """
         train_speed = train.speed_loaded if train.is_loaded else train.speed_empty
-        origin = self.nodes.index(train.origin)
-        for dist_map in train.origin.distance_map:
-            aux_transit_time = dist_map.distance/train_speed
-            if aux_transit_time < transit_time:
-                transit_time = aux_transit_time
-                destiny_index = self.nodes.index(dist_map.destiny)
-                
-        transit_time += self.node_queues[destiny_index][-1] if transit_time > time else 0
+        origin = self.topology.node_index[train.origin]
+        target = self.get_route_target(train, origin) if self.routing is not None else None
+        if target is None or target == origin:
+            destiny_index = self.topology.nearest_node[origin]
+            transit_time = self.topology.nearest_distance[origin]/train_speed
+        else:
+            destiny_index = int(self.routing.next_hop[origin, target])
+            transit_time = self.routing.distance[origin, destiny_index]/train_speed
+
+        transit_time += self.node_queues[destiny_index] if transit_time > time else 0
         return destiny_index, int(transit_time)
 
+    def enable_routing(self, method='auto', cache_dir=None):
+        """ Builds (or loads from cache_dir) the all-pairs routing table
+
+        Once enabled, get_closest_node sends a train one hop along the
+        shortest route to the yard of its closest open demand (see
+        get_route_target) instead of to the nearest node.
+
+        Args:
+            method (str): shortest path algorithm, see routing.build_routing
+            cache_dir (str): directory of the cached routing tables
+        """
+        self.routing = routing.build_routing(self.topology, method, cache_dir)
+        node_index = self.topology.node_index
+        terminal_index = self.topology.terminal_index
+        # yard related to every terminal
+        self.route_yards = [node_index[terminal.related_nodes[0]] for terminal in self.terminals]
+        # demands to unload, by origin terminal, and demands to load, with the yard serving them
+        self.route_unloading = {}
+        self.route_loading = []
+        for terminal in self.terminals:
+            for demand in terminal.demands:
+                if demand.origin is demand.destiny:
+                    continue
+                origin = terminal_index[demand.origin]
+                destiny = terminal_index[demand.destiny]
+                self.route_unloading.setdefault(origin, []).append((demand, self.route_yards[destiny]))
+                self.route_loading.append((demand, self.route_yards[origin]))
+
+    def get_route_target(self, train, origin):
+        """ Yard of the closest terminal with an open demand for the train
+
+        A loaded train targets the closest terminal with an unmet demand from
+        the terminal it loaded at, an empty train the closest loading terminal
+        with an unmet demand.
+
+        Args:
+            train (:obj:Train): current train
+            origin (int): index of the yard of the train
+
+        Returns:
+            (int): yard index, None if every demand is met or unreachable
+        """
+        if train.is_loaded:
+            demand_origin = train.current_demand[0]
+            if demand_origin is None:
+                return None
+            open_demands = self.route_unloading.get(self.topology.terminal_index[demand_origin], ())
+        else:
+            open_demands = self.route_loading
+        distance = self.routing.distance[origin]
+        best, target = inf, None
+        for demand, yard in open_demands:
+            if not demand.achieved_demand and distance[yard] < best:
+                best, target = distance[yard], yard
+        return target
+
+    def get_next_hop(self, train, destiny_index):
+        """ Next yard on the shortest route from the train origin to a yard
+
+        Args:
+            train (:obj:Train): current train
+            destiny_index (int): index of the target yard
+
+        Returns:
+            next_index (int): index of the next yard
+            transit_time (int): transit time (in hours) to the next yard
+
+        Raises:
+            ValueError: if the yard cannot be reached from the train origin
+        """
+        train_speed = train.speed_loaded if train.is_loaded else train.speed_empty
+        origin = self.topology.node_index[train.origin]
+        next_index = int(self.routing.next_hop[origin, destiny_index])
+        if next_index < 0:
+            raise ValueError(f'yard {destiny_index} cannot be reached from yard {origin}')
+        return next_index, int(self.routing.distance[origin, next_index]/train_speed)
+
     def from_port2terminal(self, simulator, data):
         """ Dispatches the train from the Port to the next terminal
         
@@ -155,25 +445,36 @@ class Model:
             simulator (:obj:Simulator): Simulator
             data (list): [origin_index, destiny_index, :obj:Train, train_index]
         """
-        if self.verbose:
-            formatted_time = self.get_formatted_time(simulator.time)
-            print(f'{formatted_time:02.0f}:00 - Train {data[2].train_id} departured from {self.nodes[data[0]].node_name} to Terminal {data[1]}')
-
         destiny = data[1]
         train = data[2]
+        terminal = self.terminals[destiny]
+        service_time = terminal.unloading_time if train.is_loaded else terminal.loading_time
+        if self.randomness is not None:
+            service_time = self.randomness.service_time(destiny, train.is_loaded, service_time)
+        berths = self.berths[destiny] if self.berths is not None else None
+        if berths is not None:
+            queue_wait = berths.request(simulator.time, service_time) - simulator.time
+            time = simulator.time + queue_wait + service_time
+        else:
+            queue_wait = max(simulator.time, self.terminal_queues[destiny]) - simulator.time
+            time = max(simulator.time, self.terminal_queues[destiny]) + service_time
+        if self.trace is not None:
+            self.trace.record(simulator.time, et.FROM_PORT2TERMINAL, train.train_id, data[0], destiny, queue_wait)
+
         train.origin = self.nodes[data[0]] # old destiny becomes origin
-        train.destiny = self.terminals[destiny]
+        train.destiny = terminal
         
-        # Triggers an event to finish loading train if the train is empty
-        if not train.is_loaded:
-            time = max(simulator.time, self.terminal_queues[destiny][-1]) + train.destiny.loading_time
-            simulator.add_event(time, self.on_finish_loading, data)
-        # Triggers an event to finish unloading train if the train is loaded
+        # Triggers an event to finish unloading the train if it is loaded, loading it otherwise
+        if train.is_loaded:
+            self.pending_events[data[3]] = simulator.add_event(time, self.on_finish_unloading, data)
         else:
-            time = max(simulator.time, self.terminal_queues[destiny][-1]) + train.destiny.unloading_time
-            simulator.add_event(time, self.on_finish_unloading, data)
-        self.log_queue.append([simulator.time, max(simulator.time, self.terminal_queues[destiny][-1]) - simulator.time])
-        self.terminal_queues[destiny].append(time)
+            self.pending_events[data[3]] = simulator.add_event(time, self.on_finish_loading, data)
+        self.total_queue_time += queue_wait
+        self.stats.record_queue_wait(simulator.time, queue_wait)
+        self.terminal_queues[destiny] = time if berths is None else berths.next_free()
+        if self.history is not None:
+            self.history.record(simulator.time, qh.TERMINAL_WAIT, destiny, queue_wait)
+            self.history.record(simulator.time, qh.TERMINAL_QUEUE, destiny, time)
 
     def from_terminal2port(self, simulator, data):
         """ Dispatches the train from the current Terminal to the next Port
@@ -182,22 +483,37 @@ class Model:
             simulator (:obj:Simulator): Simulator
             data (list): [origin_index, destiny_index, :obj:Train, train_index]
         """
-        if self.verbose:
-            formatted_time = self.get_formatted_time(simulator.time)
-            print(f'{formatted_time:02.0f}:00 - Train {data[2].train_id} arrived at {self.nodes[data[1]].node_name} from Terminal {data[0]}')
-
         train = data[2]
+        origin = data[0]
         new_origin = data[1]
         train.origin = self.nodes[new_origin]
         destiny, transit_time = self.get_closest_node(train, simulator.time)
+        if self.randomness is not None:
+            transit_time = self.randomness.transit_time(data[3], transit_time)
         data[0] = new_origin
         data[1] = destiny
         train.destiny = self.nodes[destiny]
 
-        time = max(simulator.time, self.node_queues[destiny][-1]) + transit_time
-        self.log_queue.append([simulator.time, max(simulator.time, self.node_queues[destiny][-1]) - simulator.time])
-        self.node_queues[destiny].append(time)
-        simulator.add_event(time, self.from_port2port, data)
+        # a finite track segment is requested once the arrival register of the
+        # destiny node is free: tracks only add waits to the unlimited case
+        segment = self.segments.get((min(new_origin, destiny), max(new_origin, destiny))) if self.segments else None
+        if segment is not None:
+            start = segment.request(max(simulator.time, self.node_queues[destiny]), transit_time)
+            queue_wait = start - simulator.time
+            time = start + transit_time
+        else:
+            queue_wait = max(simulator.time, self.node_queues[destiny]) - simulator.time
+            time = max(simulator.time, self.node_queues[destiny]) + transit_time
+        if self.trace is not None:
+            self.trace.record(simulator.time, et.FROM_TERMINAL2PORT, train.train_id, origin, new_origin, queue_wait)
+
+        self.total_queue_time += queue_wait
+        self.stats.record_queue_wait(simulator.time, queue_wait)
+        self.node_queues[destiny] = time
+        if self.history is not None:
+            self.history.record(simulator.time, qh.NODE_WAIT, destiny, queue_wait)
+            self.history.record(simulator.time, qh.NODE_QUEUE, destiny, time)
+        self.pending_events[data[3]] = simulator.add_event(time, self.from_port2port, data)
 
     def from_port2port(self, simulator, data):
         """ Dispatches the train from the current Port to the next Port
@@ -206,24 +522,25 @@ class Model:
             simulator (:obj:Simulator): Simulator
             data (list): [origin_index, destiny_index, :obj:Train, train_index]
         """
-        if self.verbose:
-            formatted_time = self.get_formatted_time(simulator.time)
-            print(f'{formatted_time:02.0f}:00 - Train {data[2].train_id} arrived at {self.nodes[data[1]].node_name} from {self.nodes[data[0]].node_name}')
-
+        origin = data[0]
         new_origin = data[1]
         data[0] = new_origin    # destiny becomes origin
         train = data[2]
         train.origin = self.nodes[new_origin]
         to_load = not train.is_loaded
-        destiny = self.get_next_terminal(simulator.time, train.destiny.related_terminals, 
-                                         train.current_demand, to_load)
+        destiny = self.get_next_terminal(simulator.time, new_origin, train.current_demand, to_load)
         # destiny = self.get_next_terminal(simulator.time, train.destiny.related_terminals, to_load)
         train.destiny = self.terminals[destiny]
         data[1] = destiny
-        time = max(simulator.time, self.terminal_queues[data[1]][-1])
-        self.terminal_queues[data[1]].append(time)
+        time = max(simulator.time, self.terminal_queues[destiny])
+        if self.berths is None or self.berths[destiny] is None:
+            self.terminal_queues[destiny] = time
+        if self.history is not None:
+            self.history.record(simulator.time, qh.TERMINAL_QUEUE, destiny, time)
+        if self.trace is not None:
+            self.trace.record(simulator.time, et.FROM_PORT2PORT, train.train_id, origin, new_origin, time - simulator.time)
         
-        simulator.add_event(time, self.from_port2terminal, data)
+        self.pending_events[data[3]] = simulator.add_event(time, self.from_port2terminal, data)
 
 
     def on_finish_loading(self, simulator, data):
@@ -233,10 +550,6 @@ class Model:
             simulator (:obj:Simulator): Simulator
             data (list): [origin_index, destiny_index, :obj:Train, train_index]
         '''
-        if self.verbose:
-            formatted_time = self.get_formatted_time(simulator.time)
-            print(f'{formatted_time:02.0f}:00 - Train {data[2].train_id} finished loading and departured from Terminal {data[0]} to {self.nodes[data[1]].node_name}')
-
         train = data[2]    
         destiny = data[1]
         
@@ -245,10 +558,14 @@ class Model:
         train.origin = self.terminals[data[0]]
         train.destiny = self.nodes[destiny]
         train.set_demand_origin(self.terminals[data[0]])
-        time = max(simulator.time, self.node_queues[destiny][-1])
-        self.node_queues[destiny].append(time)
+        time = max(simulator.time, self.node_queues[destiny])
+        self.node_queues[destiny] = time
+        if self.history is not None:
+            self.history.record(simulator.time, qh.NODE_QUEUE, destiny, time)
+        if self.trace is not None:
+            self.trace.record(simulator.time, et.ON_FINISH_LOADING, train.train_id, data[0], destiny, time - simulator.time)
         data[0] = data[1]   # old destiny becomes origin
-        simulator.add_event(time, self.from_terminal2port, data)
+        self.pending_events[data[3]] = simulator.add_event(time, self.from_terminal2port, data)
 
     def on_finish_unloading(self, simulator, data):
         ''' Finish unloading the train at the Terminal
@@ -257,10 +574,6 @@ class Model:
             simulator (:obj:Simulator): Simulator
             data (list): [origin_index, destiny_index, :obj:Train, train_index]
         '''
-        if self.verbose:
-            formatted_time = self.get_formatted_time(simulator.time)
-            print(f'{formatted_time:02.0f}:00 - Train {data[2].train_id} finished unloading at Terminal {data[1]}')
-
         train = data[2]    
         new_origin = data[1]
         new_destiny = data[0]
@@ -270,14 +583,25 @@ class Model:
             demand_origin = train.current_demand[0]
             demand_destiny = train.current_demand[1]
             current_demand = train.destiny.get_demand(demand_origin, demand_destiny)
+            achieved = current_demand.achieved_demand
             current_demand.update_current_demand(train.load)
+            if current_demand.achieved_demand and not achieved:
+                self.unmet_demands -= 1
+            if self.policy is not None:
+                self.policy.on_delivery(current_demand, train.load)
+            if demand_origin.can_load and demand_origin is not demand_destiny:
+                self.stats.record_delivery(simulator.time, train.load)
         
         train.origin = self.terminals[new_origin]
         train.destiny = self.nodes[new_destiny]
         train.is_loaded = False
         train.update_load(0)
         
-        time = max(simulator.time, self.node_queues[new_destiny][-1])
-        self.node_queues[new_destiny].append(time)
+        time = max(simulator.time, self.node_queues[new_destiny])
+        self.node_queues[new_destiny] = time
+        if self.history is not None:
+            self.history.record(simulator.time, qh.NODE_QUEUE, new_destiny, time)
+        if self.trace is not None:
+            self.trace.record(simulator.time, et.ON_FINISH_UNLOADING, train.train_id, new_destiny, new_origin, time - simulator.time)
         data[0], data[1] = data[1], data[0]   # swap origin and destiny
-        simulator.add_event(time, self.from_terminal2port, data)
\ No newline at end of file
+        self.pending_events[data[3]] = simulator.add_event(time, self.from_terminal2port, data)
\ No newline at end of file
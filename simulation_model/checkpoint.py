@@ -0,0 +1,184 @@
+""" Checkpoints of a running simulation.
+
+A checkpoint holds the dynamic state only: simulator time and calendar
+(callbacks stored by name, trains by index), queues, running statistics,
+train state, demand progress, the dispatch policy state and the records
+of the queue history and trace sink. It is restored into a model built
+from the same scenario, so warm-up runs can be shared by many what-if
+scenarios, e.g.
+
+    save_checkpoint('warmup.ckpt', simulator, model)   # after simulate(model, warmup)
+    ...
+    load_checkpoint('warmup.ckpt', simulator, model)   # fresh Simulator/Model
+    simulator.simulate(model, horizon, resume=True)
+"""
+import gzip
+import pickle
+
+CHECKPOINT_VERSION = 6
+
+
+def encode_place(model, place):
+    """ Encodes a node/terminal reference as (kind, index)
+    """
+    if place is None:
+        return None
+    if place in model.topology.node_index:
+        return ('node', model.topology.node_index[place])
+    return ('terminal', model.topology.terminal_index[place])
+
+
+def decode_place(model, place):
+    """ Decodes a (kind, index) reference
+    """
+    if place is None:
+        return None
+    kind, index = place
+    return model.nodes[index] if kind == 'node' else model.terminals[index]
+
+
+def encode_train(model, train):
+    """ Dynamic state of a train as plain data
+    """
+    return {
+        'load': train.load,
+        'is_loaded': train.is_loaded,
+        'origin': encode_place(model, train.origin),
+        'destiny': encode_place(model, train.destiny),
+        'current_demand': [encode_place(model, terminal) for terminal in train.current_demand],
+        'arrival_time': train.arrival_time,
+        'is_finished': train.is_finished,
+    }
+
+
+def decode_train(model, train, state):
+    """ Restores the state returned by encode_train into a train
+    """
+    train.load = state['load']
+    train.is_loaded = state['is_loaded']
+    train.origin = decode_place(model, state['origin'])
+    train.destiny = decode_place(model, state['destiny'])
+    train.current_demand = [decode_place(model, terminal) for terminal in state['current_demand']]
+    train.arrival_time = state['arrival_time']
+    train.is_finished = state['is_finished']
+
+
+def snapshot(simulator, model):
+    """ Dynamic state of a simulation as plain data
+
+    Args:
+        simulator (:obj:Simulator): Simulator
+        model (:obj:Model): model being simulated
+
+    Returns:
+        (dict): simulation state
+    """
+    train_index = {train: index for index, train in enumerate(model.trains)}
+    calendar = [(time, callback.__name__, [data[0], data[1], train_index[data[2]], data[3]])
+                for time, callback, data in simulator.calendar.events()]
+    trains = [encode_train(model, train) for train in model.trains]
+    demands = [[(demand.current_demand, demand.achieved_demand) for demand in terminal.demands]
+               for terminal in model.terminals]
+    return {
+        'version': CHECKPOINT_VERSION,
+        'time': simulator.time,
+        'day': simulator.day,
+        'calendar': calendar,
+        'terminal_queues': model.terminal_queues,
+        'node_queues': model.node_queues,
+        'terminal_queues_forecast': model.terminal_queues_forecast,
+        'node_queues_forecast': model.node_queues_forecast,
+        'total_queue_time': model.total_queue_time,
+        'stats': model.stats,
+        'berths': model.berths,
+        'forecast_berths': model.forecast_berths,
+        'segments': model.segments,
+        'randomness': model.randomness.state() if model.randomness is not None else None,
+        'trains': trains,
+        'demands': demands,
+        'policy': model.policy.state() if model.policy is not None else None,
+        'history': model.history.state() if model.history is not None else None,
+        'trace': model.trace.state() if model.trace is not None else None,
+    }
+
+
+def restore(simulator, model, state):
+    """ Restores a simulation state into a simulator and a model
+
+    The model must be built from the same scenario (same nodes, terminals,
+    trains and demands, in the same order); parameters such as loading
+    times or speeds may differ.
+
+    Args:
+        simulator (:obj:Simulator): Simulator, its calendar is replaced
+        model (:obj:Model): model, its dynamic state is replaced
+        state (dict): state returned by snapshot
+    """
+    if state['version'] != CHECKPOINT_VERSION:
+        raise ValueError(f'unsupported checkpoint version {state["version"]}')
+    if len(state['trains']) != len(model.trains) or len(state['demands']) != len(model.terminals):
+        raise ValueError('checkpoint does not match the model scenario')
+
+    state = pickle.loads(pickle.dumps(state))  # restored lists must not be shared with the state
+    for key in ('terminal_queues', 'node_queues', 'terminal_queues_forecast', 'node_queues_forecast',
+                'total_queue_time', 'stats', 'berths', 'forecast_berths', 'segments'):
+        setattr(model, key, state[key])
+    model.set_service_times()
+
+    for train, train_state in zip(model.trains, state['trains']):
+        decode_train(model, train, train_state)
+
+    for terminal, demand_states in zip(model.terminals, state['demands']):
+        for demand, (current_demand, achieved_demand) in zip(terminal.demands, demand_states):
+            demand.current_demand = current_demand
+            demand.achieved_demand = achieved_demand
+    model.unmet_demands = model.count_unmet_demands()
+    if model.policy is not None:
+        model.policy.bind(model)
+    if state['policy'] is not None:
+        if model.policy is None:
+            raise ValueError('the checkpoint has a dispatch policy state, set model.policy before restoring')
+        model.policy.set_state(state['policy'])
+
+    if model.history is not None and state['history'] is not None:
+        model.history.set_state(state['history'])
+    if model.trace is not None and state['trace'] is not None:
+        model.trace.set_state(state['trace'])
+    if state['randomness'] is not None:
+        if model.randomness is None:
+            raise ValueError('the checkpoint has random times, set model.randomness before restoring')
+        model.randomness.set_state(state['randomness'])
+
+    simulator.time = state['time']
+    simulator.day = state['day']
+    simulator.calendar = type(simulator.calendar)()
+    events = [(time, getattr(model, name), [data[0], data[1], model.trains[data[2]], data[3]])
+              for time, name, data in state['calendar']]
+    handles = simulator.calendar.push_many(events)
+    model.pending_events = [None for _ in model.trains]
+    for (_, _, data), handle in zip(events, handles):
+        model.pending_events[data[3]] = handle
+
+
+def save_checkpoint(path, simulator, model):
+    """ Writes the simulation state to a gzip compressed file
+
+    Args:
+        path (str): checkpoint file path
+        simulator (:obj:Simulator): Simulator
+        model (:obj:Model): model being simulated
+    """
+    with gzip.open(path, 'wb') as file:
+        pickle.dump(snapshot(simulator, model), file, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load_checkpoint(path, simulator, model):
+    """ Restores the simulation state saved by save_checkpoint
+
+    Args:
+        path (str): checkpoint file path
+        simulator (:obj:Simulator): Simulator, its calendar is replaced
+        model (:obj:Model): model built from the same scenario
+    """
+    with gzip.open(path, 'rb') as file:
+        restore(simulator, model, pickle.load(file))
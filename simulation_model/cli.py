@@ -0,0 +1,305 @@
+""" Command-line entry point.
+
+Usage:
+    python -m simulation_model run SCENARIO [SCENARIO ...] [--seeds S ...] [--horizon H] [--output out.csv]
+    python -m simulation_model sweep SCENARIO --max-trains N [--speeds V ...] [--output out.npz]
+    python -m simulation_model replicate SCENARIO [--replications R] [--workers W] [--output out.csv]
+    python -m simulation_model realtime SCENARIO [--seconds-per-hour S] [--breakdown-probability P]
+
+`run` simulates every scenario for every seed in one process (or pool),
+so batches of short runs pay the interpreter and NumPy start-up once.
+Without seeds the nominal scenario is simulated; a seed perturbs the
+times and speeds as replications do. Results are written as CSV or NPZ
+according to the output extension, or printed as CSV.
+
+Only the standard library is imported up front; the model, NumPy and the
+process pool are imported by the command that needs them.
+
+With --results-cache, runs already simulated for an identical scenario,
+horizon and code version are loaded instead of simulated again (see
+results_cache.py).
+"""
+import argparse
+import csv
+import os
+import sys
+
+
+def scenario_horizon(scenario, horizon):
+    """ Simulation horizon: the command-line value, else the scenario one
+
+    Args:
+        scenario (:obj:Scenario): compiled scenario
+        horizon (float): command-line horizon, None if not given
+
+    Returns:
+        (float): horizon
+    """
+    if horizon is not None:
+        return horizon
+    if 'horizon' not in scenario.simulation:
+        raise SystemExit(f'error: {scenario.name or "scenario"} has no horizon, use --horizon')
+    return scenario.simulation['horizon']
+
+
+def conditions(stop):
+    """ Termination conditions of a stop specification, see run_point
+    """
+    if not stop:
+        return None
+    from . import termination
+    until = []
+    if stop.get('demands'):
+        until.append(termination.AllDemandsMet())
+    if stop.get('steady_state'):
+        until.append(termination.SteadyState(stop['steady_state']))
+    if stop.get('wall_clock'):
+        until.append(termination.WallClock(stop['wall_clock']))
+    return until or None
+
+
+def results_cache(args):
+    """ Results cache of the command-line options, None if not enabled
+    """
+    if args.results_cache is None:
+        return None
+    from .results_cache import ResultsCache
+    return ResultsCache(args.results_cache, max_bytes=int(args.results_cache_size * (1 << 20)))
+
+
+def run_point(path, seed, horizon, spread=0.2, calendar='heap', cache_dir=None, profile=None, stop=None,
+              results=None):
+    """ Simulates one scenario, perturbed by a seed
+
+    Args:
+        path (str): scenario file
+        seed (int): random seed of the perturbation, None for the nominal scenario
+        horizon (float): simulation horizon, None for the scenario horizon
+        spread (float): relative perturbation, see replication.perturb
+        calendar (str): event calendar backend
+        cache_dir (str): directory of the compiled scenarios
+        profile (str): directory of the profiling reports, None runs uninstrumented
+        stop (dict): early termination, keys demands (bool), steady_state
+            (CI relative width) and wall_clock (seconds), see termination
+        results (:obj:ResultsCache): results cache, None to always simulate;
+            profiled and wall-clock bounded runs are never cached
+
+    Returns:
+        (tuple): scenario, seed, horizon, end time, stop reason, productivity,
+            queue_time, seconds
+    """
+    import time as clock
+
+    import numpy as np
+
+    from .build_model import Model
+    from .discrete_simulator import Simulator
+    from .replication import perturb
+    from .scenario import load_scenario
+
+    start = clock.perf_counter()
+    scenario = load_scenario(path, cache_dir)
+    horizon = scenario_horizon(scenario, horizon)
+    nodes, terminals, trains = scenario.build()
+    if seed is not None and spread:
+        perturb(terminals, trains, np.random.default_rng(seed), spread)
+    model = Model(nodes, terminals, trains)
+    model.verbose = False
+    simulator = Simulator(calendar=calendar)
+    name = scenario.name or os.path.basename(path)
+    if profile is not None:
+        from .profiling import Profiler
+        simulator.profiler = Profiler(sample_every=100)
+    if results is None or profile is not None or (stop or {}).get('wall_clock'):
+        simulator.simulate(model, horizon, until=conditions(stop))
+    else:
+        results.simulate(simulator, model, horizon, until=conditions(stop), options={'stop': stop})
+    if profile is not None:
+        label = name if seed is None else f'{name}-{seed}'
+        os.makedirs(profile, exist_ok=True)
+        simulator.profiler.save_json(os.path.join(profile, f'{label}.json'))
+        print(f'{label}: {simulator.profiler.summary()}', file=sys.stderr)
+    productivity, _, _ = model.evaluate_produtivity()
+    return (name, -1 if seed is None else seed, horizon, simulator.time, simulator.stop_reason,
+            productivity[-1] if len(productivity) else float('nan'), model.queue_time(),
+            clock.perf_counter() - start)
+
+
+def write_results(path, columns):
+    """ Writes result columns as CSV (or NPZ by extension), to stdout if no path
+
+    Args:
+        path (str): output file, None prints CSV
+        columns (dict): column name to sequence, all of the same length
+    """
+    if path is not None and path.endswith('.npz'):
+        import numpy as np
+        np.savez_compressed(path, **{name: np.asarray(values) for name, values in columns.items()})
+        return
+    file = open(path, 'w', newline='') if path is not None else sys.stdout
+    try:
+        writer = csv.writer(file)
+        writer.writerow(columns)
+        writer.writerows(zip(*columns.values()))
+    finally:
+        if path is not None:
+            file.close()
+
+
+def command_run(args):
+    """ Simulates every scenario for every seed
+    """
+    seeds = args.seeds or [None]
+    points = [(path, seed) for path in args.scenarios for seed in seeds]
+    stop = {'demands': args.until_demands_met, 'steady_state': args.steady_state, 'wall_clock': args.wall_clock}
+    options = (args.horizon, args.spread, args.calendar, args.cache_dir, args.profile, stop, results_cache(args))
+    if args.workers == 1 or len(points) == 1:
+        results = [run_point(path, seed, *options) for path, seed in points]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(args.workers) as pool:
+            results = list(pool.map(run_point, *zip(*points), *([option] * len(points) for option in options)))
+    names = ('scenario', 'seed', 'horizon', 'time', 'stop_reason', 'productivity', 'queue_time', 'seconds')
+    write_results(args.output, dict(zip(names, zip(*results))))
+
+
+def command_sweep(args):
+    """ Sweeps the fleet size of a scenario
+    """
+    from .scenario import load_scenario
+    from .sweep import fleet_sweep, lockstep_sweep
+
+    scenario = load_scenario(args.scenario, args.cache_dir)
+    nodes, terminals, trains = scenario.build()
+    if args.lockstep:
+        rows = lockstep_sweep(nodes, terminals, trains, args.max_trains, scenario_horizon(scenario, args.horizon),
+                              speeds=args.speeds, loading_times=args.loading_times)
+        write_results(args.output, {name: rows[name] for name in rows.dtype.names})
+        return
+    rows = fleet_sweep(nodes, terminals, trains, args.max_trains, scenario_horizon(scenario, args.horizon),
+                       speeds=args.speeds, loading_times=args.loading_times, workers=args.workers,
+                       calendar=args.calendar, early_stop=not args.no_early_stop, cache=results_cache(args))
+    write_results(args.output, {name: rows[name] for name in rows.dtype.names})
+
+
+def command_replicate(args):
+    """ Runs replications of a scenario and reports their summary
+    """
+    from .replication import replicate
+    from .scenario import load_scenario
+
+    scenario = load_scenario(args.scenario, args.cache_dir)
+    nodes, terminals, trains = scenario.build()
+    results = replicate(nodes, terminals, trains, scenario_horizon(scenario, args.horizon),
+                        replications=args.replications, seeds=args.seeds, spread=args.spread,
+                        workers=args.workers, calendar=args.calendar, confidence=args.confidence,
+                        cache=results_cache(args))
+    write_results(args.output, {name: results[name] for name in ('seeds', 'productivity', 'queue_time')})
+    for metric, summary in results['summary'].items():
+        low, high = summary['ci']
+        print(f'{metric}: mean {summary["mean"]:.2f} ci [{low:.2f}, {high:.2f}] std {summary["std"]:.2f}',
+              file=sys.stderr)
+
+
+def command_realtime(args):
+    """ Runs a scenario paced in real time against the local dispatcher,
+    streaming the state updates as JSON lines
+    """
+    import asyncio
+    import json
+
+    from .discrete_simulator import Simulator
+    from .realtime import LocalDispatcher, RealTimeRunner
+    from .scenario import load_scenario
+
+    scenario = load_scenario(args.scenario, args.cache_dir)
+    model = scenario.model()
+    model.verbose = False
+    runner = RealTimeRunner(Simulator(calendar=args.calendar), model, seconds_per_hour=args.seconds_per_hour)
+    dispatcher = LocalDispatcher(runner, runner.subscribe(), args.breakdown_probability, args.repair_time,
+                                 seed=args.seed)
+    updates = runner.subscribe(args.buffer)
+
+    async def stream():
+        async for update in updates:
+            print(json.dumps(update), flush=True)
+
+    async def session():
+        await asyncio.gather(runner.run(scenario_horizon(scenario, args.horizon)), dispatcher.run(), stream())
+
+    asyncio.run(session())
+    print(f'{runner.events} events, {runner.external_events} external, {updates.dropped} updates dropped, '
+          f'stopped by {runner.simulator.stop_reason}', file=sys.stderr)
+
+
+def parser():
+    """ Builds the command-line parser
+    """
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--horizon', type=float, help='simulation horizon (h), defaults to the scenario one')
+    common.add_argument('--calendar', default='heap', choices=('list', 'heap', 'bucket'),
+                        help='event calendar backend')
+    common.add_argument('--workers', type=int, default=None, help='worker processes (1 runs in process)')
+    common.add_argument('--cache-dir', default=None, help='directory of the compiled scenario cache')
+    common.add_argument('--results-cache', metavar='DIR', default=None,
+                        help='directory of the simulation results cache, disabled by default')
+    common.add_argument('--results-cache-size', type=float, metavar='MB', default=1024,
+                        help='size bound of the results cache (MB)')
+    common.add_argument('--output', default=None, help='.csv or .npz result file, CSV on stdout by default')
+
+    main_parser = argparse.ArgumentParser(prog='python -m simulation_model', description='Railroad simulator')
+    commands = main_parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', parents=[common], help='simulate scenarios for a batch of seeds')
+    run.add_argument('scenarios', nargs='+', help='scenario files (.json, .yaml, .toml)')
+    run.add_argument('--seeds', type=int, nargs='+', help='perturbation seeds, nominal run if omitted')
+    run.add_argument('--spread', type=float, default=0.2, help='relative perturbation of seeded runs')
+    run.add_argument('--until-demands-met', action='store_true', help='stop once every demand is achieved')
+    run.add_argument('--steady-state', type=float, metavar='WIDTH',
+                     help='stop once the daily production CI is narrower than WIDTH times its mean')
+    run.add_argument('--wall-clock', type=float, metavar='SECONDS', help='wall-clock budget of each run')
+    run.add_argument('--profile', metavar='DIR', help='profile the event loop, JSON reports written to DIR')
+    run.set_defaults(function=command_run, workers=1)
+
+    sweep = commands.add_parser('sweep', parents=[common], help='sweep the fleet size of a scenario')
+    sweep.add_argument('scenario', help='scenario file')
+    sweep.add_argument('--max-trains', type=int, required=True, help='largest fleet size')
+    sweep.add_argument('--speeds', type=float, nargs='+', help='loaded speeds to sweep')
+    sweep.add_argument('--loading-times', type=float, nargs='+', help='loading times to sweep')
+    sweep.add_argument('--no-early-stop', action='store_true', help='simulate every fleet size')
+    sweep.add_argument('--lockstep', action='store_true',
+                       help='simulate every fleet size in one vectorized pass on a single core')
+    sweep.set_defaults(function=command_sweep)
+
+    replicate = commands.add_parser('replicate', parents=[common], help='Monte Carlo replications of a scenario')
+    replicate.add_argument('scenario', help='scenario file')
+    replicate.add_argument('--replications', type=int, default=100, help='number of replications')
+    replicate.add_argument('--seeds', type=int, nargs='+', help='replication seeds (overrides --replications)')
+    replicate.add_argument('--spread', type=float, default=0.2, help='relative perturbation of times and speeds')
+    replicate.add_argument('--confidence', type=float, default=0.95, help='confidence level of the mean')
+    replicate.set_defaults(function=command_replicate)
+
+    realtime = commands.add_parser('realtime', parents=[common],
+                                   help='simulate in real time with external breakdowns, streaming JSON updates')
+    realtime.add_argument('scenario', help='scenario file')
+    realtime.add_argument('--seconds-per-hour', type=float, default=None,
+                          help='wall seconds per simulated hour, as fast as possible if omitted')
+    realtime.add_argument('--breakdown-probability', type=float, default=0.05,
+                          help='breakdown chance of a train leaving a terminal')
+    realtime.add_argument('--repair-time', type=float, default=6, help='repair time of a breakdown (h)')
+    realtime.add_argument('--seed', type=int, default=0, help='seed of the dispatcher breakdowns')
+    realtime.add_argument('--buffer', type=int, default=1024, help='updates buffered before dropping the oldest')
+    realtime.set_defaults(function=command_realtime)
+    return main_parser
+
+
+def main(argv=None):
+    """ Runs a command
+
+    Args:
+        argv (list): command-line arguments, defaults to sys.argv
+    """
+    args = parser().parse_args(argv)
+    if args.workers is not None and args.workers < 1:
+        raise SystemExit('error: --workers must be at least 1')
+    args.function(args)
@@ -1,6 +1,8 @@
 class Demand:
     ''' Demand of a route
     '''
+    __slots__ = ('origin', 'destiny', 'total_demand', 'current_demand', 'achieved_demand')
+
     def __init__(self, origin, destiny, value):
         """ Constructs a demand
         
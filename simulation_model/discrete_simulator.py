@@ -1,18 +1,26 @@
-import event_calendar as ec
+from . import event_calendar as ec
+from . import termination
 
 
 class Simulator:
     ''' Discrete event system simulator.
     '''
 
-    def __init__(self):
+    def __init__(self, calendar='heap'):
         ''' Construct an event system simulator.
+
+        Args:
+            calendar (str): event calendar backend, 'heap' (default),
+                'bucket' (calendar queue keyed by the hour) or 'list'
+                (sorted list, the original implementation).
         '''
 
         # setup
         self.time = 0
         self.day = 0
-        self.calendar = ec.event_calendar()
+        self.calendar = ec.calendars[calendar]()
+        self.profiler = None  # profiling.Profiler, instruments the event loop
+        self.stop_reason = None
 
     def add_event(self, t, f, data):
         ''' Add event to calendar.
@@ -21,22 +29,52 @@ class Simulator:
             t (float): fire time.
             f (function): callback function.
             data: custom callback data.
+
+        Returns:
+            (:obj:event_handle): handle to cancel or reschedule the event.
         '''
-        self.calendar.push(t, f, data)
+        return self.calendar.push(t, f, data)
 
-    def simulate(self, model, t=24 * 3600):
+    def simulate(self, model, t=24 * 3600, resume=False, until=None):
         ''' Simulate discret event system.
 
         Args:
             model (:obj:model): discrete event system model.
             t (float): time horizon.
+            resume (bool): continue from the current time and calendar
+                (e.g. a restored checkpoint) instead of starting over.
+            until: termination condition(s) checked after every event,
+                see termination; the run stops at the first that holds.
+                The reason is left in stop_reason ('horizon', 'empty' or
+                the condition name).
         '''
 
         # discrete event simulator
-        print('\n######## Beginnig simulation\n')
-        model.clear()
-        model.starting_events(self)
-        while (not self.calendar.is_empty()) and (self.time <= t):
-            self.time, f, data = self.calendar.pop()  # get next event
-            f(self, data)  # callback function
-        print('\n######## End of simulation\n')
+        if model.verbose:
+            print('\n######## Beginnig simulation\n')
+        if not resume:
+            model.clear()
+            model.starting_events(self)
+        stop = termination.any_of(until) if until is not None else None
+        if stop is not None:
+            stop.start(self, model)
+        if self.profiler is not None:
+            self.profiler.run(self, model, t, stop)
+        elif stop is None:
+            while (not self.calendar.is_empty()) and (self.time <= t):
+                self.time, f, data = self.calendar.pop()  # get next event
+                f(self, data)  # callback function
+        else:
+            while (not self.calendar.is_empty()) and (self.time <= t):
+                self.time, f, data = self.calendar.pop()
+                f(self, data)
+                if stop(self, model):
+                    break
+        if stop is not None and stop.reason is not None:
+            self.stop_reason = stop.reason
+        else:
+            self.stop_reason = 'horizon' if self.time > t else 'empty'
+        if model.trace is not None:
+            model.trace.flush()
+        if model.verbose:
+            print('\n######## End of simulation\n')
@@ -0,0 +1,434 @@
+""" Dispatch policies choosing the destiny terminal and node of a train.
+
+A policy is attached with `model.policy = Policy()`. Without a policy the
+model applies its built-in shortest expected wait rule. `bind` is called
+at the beginning of every simulation (and when a checkpoint is restored)
+to precompute the policy state; the state that changes during a run is
+saved in checkpoints through `state` and `set_state`.
+
+Decision costs are given for k candidate terminals of a node.
+"""
+import heapq
+from cmath import inf
+
+import numpy as np
+
+
+class DispatchPolicy:
+    ''' Base dispatch policy: built-in node choice, shortest expected wait terminal.
+
+    The terminal scores are evaluated for every candidate in one NumPy pass,
+    O(k) per decision. Subclasses change the score or the whole choice.
+    '''
+
+    def bind(self, model):
+        """ Precomputes the policy state at the beginning of a simulation
+
+        Args:
+            model (:obj:Model): model being simulated
+        """
+        self.model = model
+
+    def state(self):
+        """ State changed by the decisions, for checkpoints
+
+        Returns:
+            (dict): policy state, None if the policy keeps none
+        """
+        return None
+
+    def set_state(self, state):
+        """ Restores the state returned by state, after bind
+        """
+
+    def expected_times(self, time, candidates, to_load):
+        """ Expected finish time of the service at every candidate terminal
+
+        Args:
+            time (int): current simulation time
+            candidates (np.array): candidate terminal ids
+            to_load (bool): True if the train is empty and will load
+
+        Returns:
+            (np.array): expected finish times
+        """
+        model = self.model
+        service_times = (model.loading_times if to_load else model.unloading_times)[candidates]
+        return np.maximum(time, model.terminal_queues_forecast[candidates]) + service_times
+
+    def allowed(self, times, candidates, demand):
+        """ Masks the candidates whose demand is already achieved
+
+        Args:
+            times (np.array): candidate scores, copied before masking
+            candidates (np.array): candidate terminal ids
+            demand (list): current train demand [origin, destiny]
+
+        Returns:
+            (np.array): scores, inf for the masked candidates
+        """
+        masked = times
+        for index, current_demand in self.model.topology.demand_holders.get((demand[0], demand[1]), ()):
+            if current_demand.achieved_demand:
+                if masked is times:
+                    masked = times.copy()
+                masked[candidates == index] = inf
+        return masked
+
+    def is_achieved(self, index, demand):
+        """ Checks if a terminal holds the train demand and it is already achieved
+
+        Args:
+            index (int): terminal index
+            demand (list): current train demand [origin, destiny]
+
+        Returns:
+            (bool): True if the terminal must be skipped
+        """
+        current_demand = self.model.terminals[index].get_demand(demand[0], demand[1])
+        return current_demand is not None and current_demand.achieved_demand
+
+    def choose_terminal(self, time, node, demand, to_load):
+        """ Chooses the destiny terminal
+
+        Args:
+            time (int): current simulation time
+            node (int): index of the node whose related terminals are the candidates
+            demand (list): current train demand [origin, destiny]
+            to_load (bool): True if the train is empty and will load
+
+        Returns:
+            next_terminal_index (int): index of the destiny terminal
+            total_time (float): expected finish time at the terminal
+        """
+        candidates = self.model.topology.candidates(node)
+        times = self.expected_times(time, candidates, to_load)
+        return self.pick(times, self.allowed(self.score(times, candidates, to_load), candidates, demand), candidates)
+
+    def score(self, times, candidates, to_load):
+        """ Candidate scores, the smallest one is chosen (expected finish time by default)
+        """
+        return times
+
+    @staticmethod
+    def pick(times, scores, candidates):
+        """ First candidate with the smallest finite score, or the first candidate
+        """
+        position = int(scores.argmin())
+        if not scores[position] < inf:
+            return int(candidates[0]), inf
+        return int(candidates[position]), times[position]
+
+    def choose_node(self, train, time):
+        """ Chooses the next node of a train leaving a terminal (Model.get_next_node)
+
+        Args:
+            train (:obj:Train): current train
+            time (int): current simulation time
+
+        Returns:
+            destiny_index (int): index of the destiny node
+            transit_time (int): transit time (in hours) to the destiny node
+        """
+        return self.model.get_next_node(train, time)
+
+    def on_forecast(self, index):
+        """ Called when the model updates the forecast register of a terminal
+
+        Args:
+            index (int): terminal index
+        """
+
+    def on_delivery(self, demand, load):
+        """ Called when a train delivers a load to a demand
+
+        Args:
+            demand (:obj:Demand): updated demand
+            load (float): delivered load
+        """
+
+
+class CandidateHeaps:
+    ''' Candidates of a node for one service, ordered by expected finish time.
+
+    The finish time max(time, forecast) + service depends on the current
+    time only while a terminal is free (forecast <= time). Free candidates
+    are kept in a heap keyed by service time, busy ones in a heap keyed by
+    forecast + service, and a release heap keyed by forecast moves busy
+    candidates to the free heap as time passes. Ties are broken by the
+    candidate position, as the strict < rule of the model. Entries carry
+    the version of their terminal forecast and are discarded lazily once a
+    newer version is pushed. Updated forecasts are only marked as pending
+    and pushed by the next call to best.
+    '''
+
+    def __init__(self, candidates, service_times):
+        """ Constructs empty heaps
+
+        Args:
+            candidates (list): candidate terminal ids
+            service_times (list): service time of every candidate
+        """
+        self.candidates = candidates
+        self.service_times = service_times
+        self.time = -inf
+        self.free = []
+        self.busy = []
+        self.release = []
+        # candidate position -> terminal index of the forecasts updated since the last decision
+        self.pending = {}
+
+    def build(self, time, forecast, version):
+        """ Rebuilds the heaps from the current forecasts, O(k)
+
+        Args:
+            time (float): current simulation time
+            forecast (np.array): forecast register of every terminal
+            version (list): forecast version of every terminal
+        """
+        self.time = time
+        self.free, self.busy, self.release = [], [], []
+        self.pending.clear()
+        for position, index in enumerate(self.candidates):
+            self.push(position, index, forecast[index], version[index])
+
+    def push(self, position, index, forecast, version):
+        """ Adds the entries of a candidate forecast, O(log k)
+        """
+        service_time = self.service_times[position]
+        if forecast <= self.time:
+            heapq.heappush(self.free, (service_time, position, index, version))
+        else:
+            heapq.heappush(self.busy, (forecast + service_time, position, index, version))
+            heapq.heappush(self.release, (forecast, position, index, version))
+
+    def best(self, time, forecast, version, skip):
+        """ Candidate with the earliest expected finish time
+
+        Args:
+            time (float): current simulation time, not earlier than the last call
+            forecast (np.array): forecast register of every terminal
+            version (list): forecast version of every terminal
+            skip (function): skip(index) is True for a candidate that cannot be chosen
+
+        Returns:
+            (tuple): (terminal index, expected finish time), None if no
+                candidate finishes in finite time
+        """
+        if len(self.free) + len(self.busy) + len(self.release) > 6 * len(self.candidates) + 8:
+            self.build(max(time, self.time), forecast, version)
+        for position, index in self.pending.items():
+            self.push(position, index, forecast[index], version[index])
+        self.pending.clear()
+        self.time = time
+        while self.release and self.release[0][0] <= time:
+            _, position, index, entry_version = heapq.heappop(self.release)
+            if version[index] == entry_version:
+                heapq.heappush(self.free, (self.service_times[position], position, index, entry_version))
+
+        held = []
+        result = None
+        while True:
+            while self.free and version[self.free[0][2]] != self.free[0][3]:
+                heapq.heappop(self.free)
+            while self.busy and (version[self.busy[0][2]] != self.busy[0][3] or forecast[self.busy[0][2]] <= time):
+                heapq.heappop(self.busy)
+            free = (time + self.free[0][0], self.free[0][1]) if self.free else (inf, inf)
+            busy = (self.busy[0][0], self.busy[0][1]) if self.busy else (inf, inf)
+            if not min(free, busy)[0] < inf:
+                break
+            heap = self.free if free < busy else self.busy
+            index = heap[0][2]
+            if skip(index):
+                held.append((heap, heapq.heappop(heap)))
+                continue
+            result = (index, min(free, busy)[0])
+            break
+        for heap, entry in held:
+            heapq.heappush(heap, entry)
+        return result
+
+
+class ShortestExpectedWait(DispatchPolicy):
+    ''' The model built-in rule: earliest expected finish time, O(log k) per decision.
+
+    Every (node, service) pair keeps its candidates in CandidateHeaps, built
+    on first use. A forecast update marks the terminal as pending in the
+    heaps of every node it is related to, O(1) each. A decision pushes its
+    pending terminals, then pops the entries made stale by time or by newer
+    forecasts (amortized over the pushes) and the candidates whose demand
+    is achieved, which are pushed back.
+    '''
+
+    def bind(self, model):
+        super().bind(model)
+        self.version = [0 for _ in model.terminals]
+        # heaps (and candidate positions) every terminal is a candidate of
+        self.members = [[] for _ in model.terminals]
+        self.heaps = {}
+
+    def choose_terminal(self, time, node, demand, to_load):
+        model = self.model
+        heaps = self.heaps.get((node, to_load))
+        if heaps is None:
+            candidates = model.topology.related_terminals[node]
+            service_times = (model.loading_times if to_load else model.unloading_times)[candidates].tolist()
+            heaps = self.heaps[node, to_load] = CandidateHeaps(candidates, service_times)
+            for position, index in enumerate(candidates):
+                self.members[index].append((heaps, position))
+            heaps.build(time, model.terminal_queues_forecast, self.version)
+        elif time < heaps.time:
+            heaps.build(time, model.terminal_queues_forecast, self.version)
+        best = heaps.best(time, model.terminal_queues_forecast, self.version,
+                          lambda index: self.is_achieved(index, demand))
+        if best is None:
+            return model.topology.related_terminals[node][0], inf
+        return best
+
+    def on_forecast(self, index):
+        self.version[index] += 1
+        for heaps, position in self.members[index]:
+            heaps.pending[position] = index
+
+
+class DemandDeficitWeighted(DispatchPolicy):
+    ''' Expected finish time discounted by the remaining demand of the terminal.
+
+    The score of a terminal is time / (1 + weight * deficit), where deficit
+    is the fraction of the demand still to be delivered to it (unloading)
+    or from it (loading). Deficits are updated on every delivery. The ratio
+    reorders free candidates as time passes, so every decision scores the k
+    candidates, O(k).
+    '''
+
+    def __init__(self, weight=1.0):
+        """ Constructs the policy
+
+        Args:
+            weight (float): weight of the deficit
+        """
+        self.weight = weight
+
+    def bind(self, model):
+        super().bind(model)
+        size = len(model.terminals)
+        self.total = {True: np.zeros(size), False: np.zeros(size)}
+        self.remaining = {True: np.zeros(size), False: np.zeros(size)}
+        for terminal in model.terminals:
+            for demand in terminal.demands:
+                for to_load, end in ((True, demand.origin), (False, demand.destiny)):
+                    index = model.topology.terminal_index[end]
+                    self.total[to_load][index] += demand.total_demand
+                    self.remaining[to_load][index] += max(demand.total_demand - demand.current_demand, 0)
+
+    def state(self):
+        return {'remaining': {to_load: remaining.copy() for to_load, remaining in self.remaining.items()}}
+
+    def set_state(self, state):
+        self.remaining = {to_load: remaining.copy() for to_load, remaining in state['remaining'].items()}
+
+    def score(self, times, candidates, to_load):
+        total = self.total[to_load][candidates]
+        deficit = np.divide(self.remaining[to_load][candidates], total, out=np.zeros(len(candidates)), where=total > 0)
+        return times / (1 + self.weight * deficit)
+
+    def on_delivery(self, demand, load):
+        topology = self.model.topology
+        before = max(demand.total_demand - demand.current_demand + load, 0)
+        delivered = before - max(demand.total_demand - demand.current_demand, 0)
+        self.remaining[True][topology.terminal_index[demand.origin]] -= delivered
+        self.remaining[False][topology.terminal_index[demand.destiny]] -= delivered
+
+
+class RoundRobin(DispatchPolicy):
+    ''' Cycles over the candidate terminals of every node, skipping achieved demands.
+
+    The cursor of every node is kept by node index. A decision is O(1),
+    plus one step per skipped candidate (O(k) when every demand is met).
+    '''
+
+    def bind(self, model):
+        super().bind(model)
+        self.next_position = {}
+
+    def state(self):
+        return {'next_position': dict(self.next_position)}
+
+    def set_state(self, state):
+        self.next_position = dict(state['next_position'])
+
+    def choose_terminal(self, time, node, demand, to_load):
+        model = self.model
+        candidates = model.topology.related_terminals[node]
+        service_times = model.loading_times if to_load else model.unloading_times
+        start = self.next_position.get(node, 0)
+        for offset in range(len(candidates)):
+            position = (start + offset) % len(candidates)
+            index = candidates[position]
+            total_time = max(time, model.terminal_queues_forecast[index]) + service_times[index]
+            if total_time < inf and not self.is_achieved(index, demand):
+                self.next_position[node] = position + 1
+                return index, total_time
+        return candidates[0], inf
+
+
+class Lookahead(DispatchPolicy):
+    ''' Earliest expected departure from the yard after the terminal.
+
+    Scores a terminal by its expected finish time, delayed by the queue of
+    the yard the train leaves through, plus the transit to the nearest
+    yard from there at the mean fleet speed of the next leg. The yard
+    queues change with every departure, so every decision reads the k
+    candidate yards, O(k).
+    '''
+
+    def bind(self, model):
+        super().bind(model)
+        size = len(model.terminals)
+        # the model leaves terminal i through node i
+        self.yards = np.arange(size) % len(model.nodes)
+        distance = np.array(model.topology.nearest_distance, dtype=float)[self.yards]
+        speed_loaded = np.mean([train.speed_loaded for train in model.trains]) if model.trains else 1
+        speed_empty = np.mean([train.speed_empty for train in model.trains]) if model.trains else 1
+        # after loading the train leaves loaded, after unloading empty
+        self.onward = {True: distance / speed_loaded, False: distance / speed_empty}
+
+    def score(self, times, candidates, to_load):
+        node_queues = self.model.node_queues
+        queues = np.array([node_queues[yard] for yard in self.yards[candidates].tolist()], dtype=float)
+        return np.maximum(times, queues) + self.onward[to_load][candidates]
+
+
+class ShortestRoute(ShortestExpectedWait):
+    ''' Shortest expected wait terminal, next hop towards the closest open demand.
+
+    Enables the model routing on bind if it is missing (see
+    Model.enable_routing), so trains leaving a terminal head one hop along
+    the shortest route to the yard of their closest open demand, with the
+    queue of that yard. The node choice is O(d) for d open demands of the
+    train, the terminal choice O(log k) as in ShortestExpectedWait.
+    '''
+
+    def __init__(self, method='auto', cache_dir=None):
+        """ Constructs the policy
+
+        Args:
+            method (str): shortest path algorithm, see routing.build_routing
+            cache_dir (str): directory of the cached routing tables
+        """
+        self.method = method
+        self.cache_dir = cache_dir
+
+    def bind(self, model):
+        super().bind(model)
+        if model.routing is None:
+            model.enable_routing(self.method, self.cache_dir)
+
+
+policies = {
+    'shortest_wait': ShortestExpectedWait,
+    'deficit': DemandDeficitWeighted,
+    'round_robin': RoundRobin,
+    'lookahead': Lookahead,
+    'shortest_route': ShortestRoute,
+}
@@ -1,8 +1,19 @@
 class DistanceMap:
-    def __init__(self, origin, destiny):
+    ''' Link from a node to a neighbour node.
+
+    Every departure towards a node waits for its arrival register (the
+    previous train sent to the node arrives first). `tracks` limits the
+    trains on the segment between both nodes, shared by both directions,
+    on top of that rule: None adds no track constraint, and a finite value
+    only adds waits, so enough tracks give the same results as None.
+    '''
+    __slots__ = ('origin', 'destiny', 'distance', 'tracks')
+
+    def __init__(self, origin, destiny, tracks=None):
         self.origin = origin
         self.destiny = destiny
         self.distance = None
+        self.tracks = tracks  # None for no track constraint
 
     def set_distance(self, distance):
         self.distance = distance
@@ -1,5 +1,57 @@
+import bisect
+import heapq
+import itertools
 import math
 
+class event_handle:
+    ''' Handle of a scheduled event, used to cancel or reschedule it
+    '''
+    def __init__(self, calendar, entry):
+        ''' Constructs an event handle
+        Args:
+            calendar: calendar holding the event
+            entry (list): calendar entry of the event
+        '''
+        self.calendar = calendar
+        self.entry = entry
+
+    @property
+    def time(self):
+        ''' Fire time of the event
+        '''
+        return self.entry[0]
+
+    @property
+    def callback(self):
+        ''' Callback function of the event, None if cancelled or fired
+        '''
+        return self.entry[-2]
+
+    @property
+    def data(self):
+        ''' Custom callback data of the event
+        '''
+        return self.entry[-1]
+
+    @property
+    def cancelled(self):
+        ''' True if the event was cancelled or already fired
+        '''
+        return self.entry[-2] is None
+
+    def cancel(self):
+        ''' Withdraw the event from the calendar
+        '''
+        self.calendar.cancel(self)
+
+    def reschedule(self, time):
+        ''' Move the event to a new fire time
+        Args:
+            time (float): new fire time
+        '''
+        self.calendar.reschedule(self, time)
+
+
 class event_calendar:
     ''' Class for handling en event calendar
     '''
@@ -7,6 +59,7 @@ class event_calendar:
         ''' Constructs an event calendar
         '''
         self.calendar = []
+        self.size = 0
 
     def push(self, time, callback, data):
         ''' Add events to calendar
@@ -14,6 +67,8 @@ class event_calendar:
             time (float): fire time
             callback (function): callback function
             data: custom callback data
+        Returns:
+            (:obj:event_handle): handle of the event
         '''
 
         # Busca binária
@@ -24,7 +79,40 @@ class event_calendar:
                 i[0] = medium_index + 1
             else:
                 i[1] = medium_index
-        self.calendar.insert(i[0], (time, callback, data))
+        entry = [time, callback, data]
+        self.calendar.insert(i[0], entry)
+        self.size += 1
+        return event_handle(self, entry)
+
+    def push_many(self, events):
+        ''' Add several events to calendar
+        Args:
+            events (iterable): (time, callback, data) tuples
+        Returns:
+            (list): handles of the events
+        '''
+        return [self.push(time, callback, data) for time, callback, data in events]
+
+    def cancel(self, handle):
+        ''' Cancel an event. The entry is only marked and skipped when popped.
+        Args:
+            handle (:obj:event_handle): handle of the event
+        '''
+        if not handle.cancelled:
+            handle.entry[1] = None
+            self.size -= 1
+
+    def reschedule(self, handle, time):
+        ''' Move an event to a new fire time
+        Args:
+            handle (:obj:event_handle): handle of the event
+            time (float): new fire time
+        '''
+        if handle.cancelled:
+            raise ValueError('cannot reschedule a cancelled or fired event')
+        _, callback, data = handle.entry
+        self.cancel(handle)
+        handle.entry = self.push(time, callback, data).entry
 
     def pop(self):
         ''' Get the nearest time event
@@ -32,12 +120,324 @@ class event_calendar:
             (float): fire time
             (function): callback function
             (object) callback data
+        Raises:
+            IndexError: if no event is pending
         '''
-        return self.calendar.pop(0)
+        while self.calendar and self.calendar[0][1] is None:
+            self.calendar.pop(0)
+        if not self.calendar:
+            raise IndexError('pop from an empty event calendar')
+        entry = self.calendar.pop(0)
+        time, callback, data = entry
+        entry[1] = None
+        self.size -= 1
+        return time, callback, data
+
+    def peek(self):
+        ''' Get the nearest time event without removing it
+        Returns:
+            (tuple): (fire time, callback function, callback data), None if the calendar is empty
+        '''
+        while self.calendar and self.calendar[0][1] is None:
+            self.calendar.pop(0)
+        if not self.calendar:
+            return None
+        return tuple(self.calendar[0])
+
+    def events(self):
+        ''' Pending events in firing order, without removing them
+        Returns:
+            (list): (fire time, callback function, callback data) tuples
+        '''
+        return [tuple(entry) for entry in self.calendar if entry[1] is not None]
 
     def is_empty(self):
         ''' Check whether calendar is empty
         Returns:
             (bool): true if calendar is empty
         '''
-        return len(self.calendar) == 0
\ No newline at end of file
+        return self.size == 0
+
+    def __len__(self):
+        return self.size
+
+
+class heap_event_calendar:
+    ''' Event calendar backed by a binary heap.
+
+    Push and pop are O(log n). Events with the same fire time are popped
+    in insertion order, as in :obj:event_calendar. Cancelled events stay
+    in the heap and are discarded when they reach the top.
+    '''
+    def __init__(self):
+        ''' Constructs a heap event calendar
+        '''
+        self.calendar = []
+        self.counter = itertools.count()
+        self.size = 0
+
+    def push(self, time, callback, data):
+        ''' Add events to calendar
+        Args:
+            time (float): fire time
+            callback (function): callback function
+            data: custom callback data
+        Returns:
+            (:obj:event_handle): handle of the event
+        '''
+        entry = [time, next(self.counter), callback, data]
+        heapq.heappush(self.calendar, entry)
+        self.size += 1
+        return event_handle(self, entry)
+
+    def push_many(self, events):
+        ''' Add several events to calendar, heapifying once
+        Args:
+            events (iterable): (time, callback, data) tuples
+        Returns:
+            (list): handles of the events
+        '''
+        entries = [[time, next(self.counter), callback, data] for time, callback, data in events]
+        self.calendar.extend(entries)
+        heapq.heapify(self.calendar)
+        self.size += len(entries)
+        return [event_handle(self, entry) for entry in entries]
+
+    def cancel(self, handle):
+        ''' Cancel an event. The entry is only marked and skipped when popped.
+        Args:
+            handle (:obj:event_handle): handle of the event
+        '''
+        if not handle.cancelled:
+            handle.entry[2] = None
+            self.size -= 1
+
+    def reschedule(self, handle, time):
+        ''' Move an event to a new fire time
+        Args:
+            handle (:obj:event_handle): handle of the event
+            time (float): new fire time
+        '''
+        if handle.cancelled:
+            raise ValueError('cannot reschedule a cancelled or fired event')
+        _, _, callback, data = handle.entry
+        self.cancel(handle)
+        handle.entry = self.push(time, callback, data).entry
+
+    def pop(self):
+        ''' Get the nearest time event
+        Returns:
+            (float): fire time
+            (function): callback function
+            (object) callback data
+        Raises:
+            IndexError: if no event is pending
+        '''
+        while self.calendar and self.calendar[0][2] is None:
+            heapq.heappop(self.calendar)
+        if not self.calendar:
+            raise IndexError('pop from an empty event calendar')
+        entry = heapq.heappop(self.calendar)
+        time, _, callback, data = entry
+        entry[2] = None
+        self.size -= 1
+        return time, callback, data
+
+    def peek(self):
+        ''' Get the nearest time event without removing it
+        Returns:
+            (tuple): (fire time, callback function, callback data), None if the calendar is empty
+        '''
+        while self.calendar and self.calendar[0][2] is None:
+            heapq.heappop(self.calendar)
+        if not self.calendar:
+            return None
+        time, _, callback, data = self.calendar[0]
+        return time, callback, data
+
+    def events(self):
+        ''' Pending events in firing order, without removing them
+        Returns:
+            (list): (fire time, callback function, callback data) tuples
+        '''
+        entries = sorted(entry for entry in self.calendar if entry[2] is not None)
+        return [(time, callback, data) for time, _, callback, data in entries]
+
+    def is_empty(self):
+        ''' Check whether calendar is empty
+        Returns:
+            (bool): true if calendar is empty
+        '''
+        return self.size == 0
+
+    def __len__(self):
+        return self.size
+
+
+class bucket_event_calendar:
+    ''' Calendar queue with one bucket per integer hour.
+
+    Events are grouped by the floor of their fire time. A heap orders the
+    bucket keys only, so scheduling into an existing bucket is an O(1)
+    append, and every bucket is sorted at most once, when it is reached.
+    Most model events fire on whole hours, which keeps the number of keys
+    small compared to the number of events. Ties keep insertion order.
+    '''
+    def __init__(self):
+        ''' Constructs a bucket event calendar
+        '''
+        self.buckets = {}
+        self.keys = []
+        self.unsorted = set()
+        self.current = []
+        self.current_key = None
+        self.position = 0
+        self.counter = itertools.count()
+        self.size = 0
+
+    def push(self, time, callback, data):
+        ''' Add events to calendar
+        Args:
+            time (float): fire time
+            callback (function): callback function
+            data: custom callback data
+        Returns:
+            (:obj:event_handle): handle of the event
+        '''
+        entry = [time, next(self.counter), callback, data]
+        self.insert(entry)
+        self.size += 1
+        return event_handle(self, entry)
+
+    def insert(self, entry):
+        ''' Put an entry in its bucket
+        Args:
+            entry (list): [time, sequence, callback, data]
+        '''
+        key = math.floor(entry[0])
+        if self.position < len(self.current):
+            if key == self.current_key:
+                if entry[0] >= self.current[-1][0]:
+                    self.current.append(entry)
+                else:
+                    bisect.insort(self.current, entry, self.position)
+                return
+            if key < self.current_key:
+                # an earlier bucket appeared, park the rest of the current one
+                self.buckets[self.current_key] = self.current[self.position:]
+                heapq.heappush(self.keys, self.current_key)
+                self.current, self.current_key, self.position = [], None, 0
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            self.buckets[key] = [entry]
+            heapq.heappush(self.keys, key)
+        else:
+            if entry[0] < bucket[-1][0]:
+                self.unsorted.add(key)
+            bucket.append(entry)
+
+    def push_many(self, events):
+        ''' Add several events to calendar
+        Args:
+            events (iterable): (time, callback, data) tuples
+        Returns:
+            (list): handles of the events
+        '''
+        return [self.push(time, callback, data) for time, callback, data in events]
+
+    def cancel(self, handle):
+        ''' Cancel an event. The entry is only marked and skipped when popped.
+        Args:
+            handle (:obj:event_handle): handle of the event
+        '''
+        if not handle.cancelled:
+            handle.entry[2] = None
+            self.size -= 1
+
+    def reschedule(self, handle, time):
+        ''' Move an event to a new fire time
+        Args:
+            handle (:obj:event_handle): handle of the event
+            time (float): new fire time
+        '''
+        if handle.cancelled:
+            raise ValueError('cannot reschedule a cancelled or fired event')
+        _, _, callback, data = handle.entry
+        self.cancel(handle)
+        handle.entry = self.push(time, callback, data).entry
+
+    def next_entry(self):
+        ''' Move to the nearest live entry, opening the next bucket if needed
+        Returns:
+            (list): [time, sequence, callback, data], None if no event is pending
+        '''
+        while True:
+            while self.position < len(self.current):
+                entry = self.current[self.position]
+                if entry[2] is not None:
+                    return entry
+                self.position += 1
+            if not self.keys:
+                return None
+            key = heapq.heappop(self.keys)
+            bucket = self.buckets.pop(key)
+            if key in self.unsorted:
+                self.unsorted.discard(key)
+                bucket.sort()
+            self.current, self.current_key, self.position = bucket, key, 0
+
+    def pop(self):
+        ''' Get the nearest time event
+        Returns:
+            (float): fire time
+            (function): callback function
+            (object) callback data
+        Raises:
+            IndexError: if no event is pending
+        '''
+        entry = self.next_entry()
+        if entry is None:
+            raise IndexError('pop from an empty event calendar')
+        self.position += 1
+        time, _, callback, data = entry
+        entry[2] = None
+        self.size -= 1
+        return time, callback, data
+
+    def peek(self):
+        ''' Get the nearest time event without removing it
+        Returns:
+            (tuple): (fire time, callback function, callback data), None if the calendar is empty
+        '''
+        entry = self.next_entry()
+        if entry is None:
+            return None
+        time, _, callback, data = entry
+        return time, callback, data
+
+    def events(self):
+        ''' Pending events in firing order, without removing them
+        Returns:
+            (list): (fire time, callback function, callback data) tuples
+        '''
+        entries = self.current[self.position:]
+        for key in sorted(self.buckets):
+            entries.extend(sorted(self.buckets[key]))
+        return [(time, callback, data) for time, _, callback, data in entries if callback is not None]
+
+    def is_empty(self):
+        ''' Check whether calendar is empty
+        Returns:
+            (bool): true if calendar is empty
+        '''
+        return self.size == 0
+
+    def __len__(self):
+        return self.size
+
+
+calendars = {
+    'list': event_calendar,
+    'heap': heap_event_calendar,
+    'bucket': bucket_event_calendar,
+}
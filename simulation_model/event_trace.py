@@ -0,0 +1,256 @@
+""" Structured event tracing of the model callbacks.
+
+Every callback of :obj:Model reports one fixed-width record
+(time, event, train, origin, destiny, queue_wait) to the model trace sink,
+where origin and destiny are the callback data indexes before the event.
+With no sink (the default when verbose is off) nothing is recorded.
+Simulator.simulate flushes the sink when a run ends. The recorded events
+are part of a checkpoint (see state/set_state), so a resumed run keeps the
+trace of the run it continues.
+"""
+import sys
+
+import numpy as np
+
+FROM_PORT2TERMINAL = 0
+FROM_TERMINAL2PORT = 1
+FROM_PORT2PORT = 2
+ON_FINISH_LOADING = 3
+ON_FINISH_UNLOADING = 4
+
+event_names = (
+    'from_port2terminal',
+    'from_terminal2port',
+    'from_port2port',
+    'on_finish_loading',
+    'on_finish_unloading',
+)
+
+trace_dtype = np.dtype([
+    ('time', np.float64),
+    ('event', np.uint8),
+    ('train', np.int32),
+    ('origin', np.int32),
+    ('destiny', np.int32),
+    ('queue_wait', np.float64),
+])
+
+
+def get_formatted_time(time):
+    """ Formats the time to a 24 hours interval
+
+    Args:
+        time (int): current simulation time
+
+    Returns:
+        time (int): updated time
+    """
+    while time > 24:
+        time -= 24
+    return time
+
+
+def render_record(record, nodes):
+    """ Renders a trace record as the verbose text line
+
+    Args:
+        record: trace record (time, event, train, origin, destiny, queue_wait)
+        nodes (list): list of nodes of the model
+
+    Returns:
+        (str): text line
+    """
+    time, event, train, origin, destiny, _ = record
+    prefix = f'{get_formatted_time(time):02.0f}:00 - Train {train}'
+    if event == FROM_PORT2TERMINAL:
+        return f'{prefix} departured from {nodes[origin].node_name} to Terminal {destiny}'
+    if event == FROM_TERMINAL2PORT:
+        return f'{prefix} arrived at {nodes[destiny].node_name} from Terminal {origin}'
+    if event == FROM_PORT2PORT:
+        return f'{prefix} arrived at {nodes[destiny].node_name} from {nodes[origin].node_name}'
+    if event == ON_FINISH_LOADING:
+        return f'{prefix} finished loading and departured from Terminal {origin} to {nodes[destiny].node_name}'
+    return f'{prefix} finished unloading at Terminal {destiny}'
+
+
+def render(records, nodes):
+    """ Renders trace records as text, offline
+
+    Args:
+        records (np.ndarray): trace records
+        nodes (list): list of nodes of the model
+
+    Returns:
+        (list): text lines
+    """
+    return [render_record(record, nodes) for record in records.tolist()]
+
+
+def load_trace(path):
+    """ Loads the records flushed to a binary trace file
+
+    Args:
+        path (str): trace file path
+
+    Returns:
+        (np.ndarray): trace records
+    """
+    return np.fromfile(path, dtype=trace_dtype)
+
+
+class text_trace:
+    ''' Trace sink printing every record as it happens (verbose mode)
+    '''
+    def __init__(self, nodes, stream=None):
+        ''' Constructs a text trace
+        Args:
+            nodes (list): list of nodes of the model
+            stream: text stream, defaults to stdout
+        '''
+        self.nodes = nodes
+        self.stream = stream
+
+    def record(self, time, event, train, origin, destiny, queue_wait):
+        ''' Prints a record
+        '''
+        print(render_record((time, event, train, origin, destiny, queue_wait), self.nodes),
+              file=self.stream or sys.stdout)
+
+    def flush(self):
+        ''' Flushes the stream
+        '''
+        (self.stream or sys.stdout).flush()
+
+    def state(self):
+        ''' Nothing to save, the records are already printed
+        Returns:
+            None
+        '''
+        return None
+
+    def set_state(self, state):
+        ''' Restored records are not printed again
+        Args:
+            state (dict): state returned by a sink state()
+        '''
+
+
+class array_trace:
+    ''' Trace sink storing records in a preallocated structured array.
+
+    When the buffer is full it is flushed to `path` in bulk if one is given,
+    otherwise it doubles in size.
+    '''
+    def __init__(self, capacity=1 << 16, path=None):
+        ''' Constructs an array trace
+        Args:
+            capacity (int): number of records of the buffer
+            path (str): binary file the records are flushed to
+        '''
+        self.buffer = np.empty(capacity, dtype=trace_dtype)
+        self.size = 0
+        self.path = path
+        if path is not None:
+            open(path, 'wb').close()
+
+    def record(self, time, event, train, origin, destiny, queue_wait):
+        ''' Stores a record
+        '''
+        if self.size == len(self.buffer):
+            if self.path is not None:
+                self.flush()
+            else:
+                self.buffer = np.resize(self.buffer, 2 * len(self.buffer))
+        self.buffer[self.size] = (time, event, train, origin, destiny, queue_wait)
+        self.size += 1
+
+    def flush(self):
+        ''' Appends the buffered records to the trace file, if a path is set
+        '''
+        if self.path is None:
+            return
+        with open(self.path, 'ab') as file:
+            self.buffer[:self.size].tofile(file)
+        self.size = 0
+
+    def records(self):
+        ''' Recorded events (all of them, or the ones not flushed yet if a path is set)
+        Returns:
+            (np.ndarray): trace records
+        '''
+        return self.buffer[:self.size].copy()
+
+    def state(self):
+        ''' Every record so far, flushed or buffered
+        Returns:
+            (dict): records and total number of records
+        '''
+        records = self.buffer[:self.size]
+        if self.path is not None:
+            records = np.concatenate((load_trace(self.path), records))
+        return {'records': records.copy(), 'count': len(records)}
+
+    def set_state(self, state):
+        ''' Replaces the records by the ones of a saved state
+        Args:
+            state (dict): state returned by a sink state()
+        '''
+        records = state['records']
+        if self.path is not None:
+            with open(self.path, 'wb') as file:
+                records.tofile(file)
+            self.size = 0
+            return
+        if len(records) > len(self.buffer):
+            self.buffer = np.empty(len(records), dtype=trace_dtype)
+        self.buffer[:len(records)] = records
+        self.size = len(records)
+
+
+class ring_trace:
+    ''' Trace sink keeping only the latest `capacity` records
+    '''
+    def __init__(self, capacity=1 << 16):
+        ''' Constructs a ring trace
+        Args:
+            capacity (int): number of kept records
+        '''
+        self.buffer = np.empty(capacity, dtype=trace_dtype)
+        self.count = 0
+
+    def record(self, time, event, train, origin, destiny, queue_wait):
+        ''' Stores a record, overwriting the oldest one when full
+        '''
+        self.buffer[self.count % len(self.buffer)] = (time, event, train, origin, destiny, queue_wait)
+        self.count += 1
+
+    def flush(self):
+        ''' Nothing to write, the records stay in memory
+        '''
+
+    def records(self):
+        ''' Kept records, oldest first
+        Returns:
+            (np.ndarray): trace records
+        '''
+        if self.count <= len(self.buffer):
+            return self.buffer[:self.count].copy()
+        start = self.count % len(self.buffer)
+        return np.concatenate((self.buffer[start:], self.buffer[:start]))
+
+    def state(self):
+        ''' Kept records and total number of records
+        Returns:
+            (dict): records and total number of records
+        '''
+        return {'records': self.records(), 'count': self.count}
+
+    def set_state(self, state):
+        ''' Replaces the records by the latest ones of a saved state
+        Args:
+            state (dict): state returned by a sink state()
+        '''
+        records = state['records'][-len(self.buffer):]
+        self.count = state['count'] - len(records)
+        for record in records.tolist():
+            self.record(*record)
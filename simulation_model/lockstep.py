@@ -0,0 +1,385 @@
+""" Lockstep engine: K variants of one scenario simulated in a single pass.
+
+The variants share the topology and differ in loading/unloading times,
+train speeds and fleet size. Their state lives in (K, ...) NumPy arrays:
+queue registers, forecasts, train positions and loads, demand progress
+and, since every train has exactly one pending event, the calendar
+itself (fire time, callback and push sequence of every train). Each step
+pops the next event of every running variant and applies each callback
+to all the variants that fired it at once, with the dispatch decisions
+of get_next_terminal and get_closest_node evaluated over the batch.
+
+Every variant follows the event order of its own sequential run (ties
+fire in push order, as the Simulator calendars do), so the results are
+the ones Model gives for the default configuration: single berths,
+unlimited tracks and no dispatch policy, random times or termination
+conditions.
+"""
+import numpy as np
+
+from . import event_trace as et
+
+
+def grow(array, size):
+    """ Doubles the columns of a (K, n) array until it holds size columns
+    """
+    if size <= array.shape[1]:
+        return array
+    columns = array.shape[1]
+    while columns < size:
+        columns *= 2
+    grown = np.zeros((array.shape[0], columns), dtype=array.dtype)
+    grown[:, :array.shape[1]] = array
+    return grown
+
+
+class Lockstep:
+    ''' Batch of scenario variants advanced together
+    '''
+
+    def __init__(self, nodes, terminals, trains, variants):
+        """ Constructs the batch
+
+        Args:
+            nodes (list): list of nodes
+            terminals (list): list of terminals
+            trains (list): template trains, cycled to build every fleet
+                (see sweep.build_fleet)
+            variants (list): one dict per variant, with the optional keys
+                loading_time / unloading_time (value for every loading /
+                unloading terminal, or a sequence with one value per
+                terminal), speed (loaded speed of every train, the empty
+                speed keeps the template ratio) and trains (fleet size,
+                defaults to the number of templates)
+        """
+        if any(terminal.berths > 1 for terminal in terminals):
+            raise ValueError('the lockstep engine does not model multi-berth terminals')
+        if any(dist_map.tracks is not None for node in nodes for dist_map in node.distance_map):
+            raise ValueError('the lockstep engine does not model finite track segments')
+        from .topology import Topology
+
+        self.nodes = nodes
+        self.terminals = terminals
+        self.templates = trains
+        self.variants = variants
+        self.topology = topology = Topology(nodes, terminals)
+        size = len(variants)
+        terminal_count = len(terminals)
+
+        self.fleet = np.array([variant.get('trains', len(trains)) for variant in variants], dtype=np.int64)
+        fleet = int(self.fleet.max())
+        template_index = np.arange(fleet) % len(trains)
+        self.active_trains = np.arange(fleet)[None, :] < self.fleet[:, None]
+
+        def terminal_times(key, nominal, applies):
+            times = np.tile(np.array([np.inf if value is None else value for value in nominal], dtype=float),
+                            (size, 1))
+            for row, variant in enumerate(variants):
+                value = variant.get(key)
+                if value is None:
+                    continue
+                if np.ndim(value):
+                    times[row] = value
+                else:
+                    times[row, applies] = value
+            return times
+
+        self.loading_times = terminal_times('loading_time', [terminal.loading_time for terminal in terminals],
+                                            np.array([terminal.can_load for terminal in terminals]))
+        self.unloading_times = terminal_times('unloading_time', [terminal.unloading_time for terminal in terminals],
+                                              np.array([terminal.can_unload for terminal in terminals]))
+
+        template_loaded = np.array([train.speed_loaded for train in trains], dtype=float)[template_index]
+        template_empty = np.array([train.speed_empty for train in trains], dtype=float)[template_index]
+        speeds = np.array([np.nan if variant.get('speed') is None else variant['speed'] for variant in variants])
+        self.speed_loaded = np.where(np.isnan(speeds)[:, None], template_loaded[None, :], speeds[:, None])
+        self.speed_empty = template_empty[None, :] * self.speed_loaded / template_loaded[None, :]
+
+        # padded candidate terminals of every node, -1 past the end
+        related = topology.related_terminals
+        self.candidates = np.full((len(nodes), max(1, max(map(len, related), default=1))), -1, dtype=np.int64)
+        for index, candidates in enumerate(related):
+            self.candidates[index, :len(candidates)] = candidates
+        self.nearest_node = np.array(topology.nearest_node, dtype=np.int64)
+        self.nearest_distance = np.array(topology.nearest_distance, dtype=float)
+        self.can_load = np.array([terminal.can_load for terminal in terminals])
+
+        # demands, looked up by (origin, destiny, holder) codes, origin/destiny -1 when unset
+        demands = []
+        demand_index = {}
+        for terminal in terminals:
+            for demand in terminal.demands:
+                if id(demand) not in demand_index:
+                    demand_index[id(demand)] = len(demands)
+                    demands.append(demand)
+        self.demands = demands
+        codes = {}
+        for holder, terminal in enumerate(terminals):
+            for (origin, destiny), demand in terminal.demand_map.items():
+                code = self.demand_code(topology.terminal_index[origin], topology.terminal_index[destiny], holder)
+                codes.setdefault(code, demand_index[id(demand)])
+        self.demand_codes = np.array(sorted(codes), dtype=np.int64)
+        self.demand_ids = np.array([codes[code] for code in self.demand_codes.tolist()], dtype=np.int64)
+        self.total_demand = np.array([demand.total_demand for demand in demands], dtype=float)
+        self.initial_demand = np.array([demand.current_demand for demand in demands], dtype=float)
+
+        def place(terminal):
+            return -1 if terminal is None else topology.terminal_index[terminal]
+
+        templates = [(topology.node_index[train.origin], train.load, train.is_loaded,
+                      place(train.current_demand[0]), place(train.current_demand[1])) for train in trains]
+        self.initial_trains = [templates[index] for index in template_index.tolist()]
+        self.routes = sum(terminal_count - 1 for terminal in terminals if terminal.can_load)
+
+    def demand_code(self, origin, destiny, holder):
+        """ Lookup code of the demand (origin, destiny) held by a terminal (works on arrays)
+        """
+        size = len(self.terminals)
+        return ((origin + 1) * (size + 1) + (destiny + 1)) * size + holder
+
+    def clear(self):
+        """ Sets every variant at the beginning of a simulation
+        """
+        size, fleet = self.active_trains.shape
+        self.time = np.zeros(size)
+        self.terminal_queues = np.zeros((size, len(self.terminals)))
+        self.node_queues = np.zeros((size, len(self.nodes)))
+        self.terminal_queues_forecast = np.zeros((size, len(self.terminals)))
+        self.total_queue_time = np.zeros(size)
+
+        origin, load, is_loaded, demand_origin, demand_destiny = (np.array(column) for column in
+                                                                 zip(*self.initial_trains))
+        self.data = np.zeros((size, fleet, 2), dtype=np.int64)
+        self.data[:, :, 0] = origin
+        self.load = np.tile(load.astype(float), (size, 1))
+        self.is_loaded = np.tile(is_loaded.astype(bool), (size, 1))
+        self.demand_origin = np.tile(demand_origin.astype(np.int64), (size, 1))
+        self.demand_destiny = np.tile(demand_destiny.astype(np.int64), (size, 1))
+        self.current_demand = np.tile(self.initial_demand, (size, 1))
+        self.achieved_demand = self.current_demand >= self.total_demand
+
+        self.event_time = np.full((size, fleet), np.inf)
+        self.event_type = np.zeros((size, fleet), dtype=np.int64)
+        self.event_sequence = np.zeros((size, fleet), dtype=np.int64)
+        self.pushes = np.zeros(size, dtype=np.int64)
+
+        # delivery log, headed by an empty delivery per loading route (see OnlineStatistics.reset)
+        self.deliveries = np.full(size, self.routes, dtype=np.int64)
+        self.delivery_time = np.zeros((size, max(self.routes, 64)))
+        self.delivery_time[:, :self.routes] = 1e-10
+        self.delivery_load = np.zeros_like(self.delivery_time)
+        self.total_production = np.zeros(size)
+
+    def schedule(self, rows, trains, time, event):
+        """ Sets the pending event of trains, in push order
+        """
+        self.event_time[rows, trains] = time
+        self.event_type[rows, trains] = event
+        self.event_sequence[rows, trains] = self.pushes[rows]
+        self.pushes[rows] += 1
+
+    def next_terminals(self, rows, trains, nodes, time):
+        """ get_next_terminal for one train of every row
+
+        Args:
+            rows (np.array): variant indexes
+            trains (np.array): train indexes
+            nodes (np.array): node whose related terminals are the candidates
+            time (np.array): simulation time of every row
+
+        Returns:
+            (np.array): destiny terminal of every train
+        """
+        candidates = self.candidates[nodes]
+        valid = candidates >= 0
+        safe = np.where(valid, candidates, 0)
+        to_load = ~self.is_loaded[rows, trains]
+        column = rows[:, None]
+        service_times = np.where(to_load[:, None], self.loading_times[column, safe], self.unloading_times[column, safe])
+        times = np.maximum(time[:, None], self.terminal_queues_forecast[column, safe]) + service_times
+
+        codes = self.demand_code(self.demand_origin[rows, trains], self.demand_destiny[rows, trains], 0)[:, None] + safe
+        position = np.minimum(np.searchsorted(self.demand_codes, codes), max(len(self.demand_codes) - 1, 0))
+        found = (self.demand_codes[position] == codes) if len(self.demand_codes) else np.zeros_like(valid)
+        ids = np.where(found, self.demand_ids[position] if len(self.demand_ids) else 0, 0)
+        blocked = found & self.achieved_demand[column, ids]
+
+        allowed = np.where(valid & ~blocked, times, np.inf)
+        choice = allowed.argmin(axis=1)
+        total_time = allowed[np.arange(len(rows)), choice]
+        unreachable = ~(total_time < np.inf)
+        choice[unreachable] = 0
+        destiny = candidates[np.arange(len(rows)), choice]
+        self.terminal_queues_forecast[rows, destiny] = total_time
+        return destiny
+
+    def starting_events(self):
+        """ Dispatches every train from its origin, in train order
+        """
+        size, fleet = self.active_trains.shape
+        for train in range(fleet):
+            rows = np.flatnonzero(self.active_trains[:, train])
+            trains = np.full(len(rows), train)
+            origin = self.data[rows, trains, 0]
+            self.data[rows, trains, 1] = self.next_terminals(rows, trains, origin, self.time[rows])
+            self.schedule(rows, trains, self.time[rows], et.FROM_PORT2TERMINAL)
+
+    def from_port2terminal(self, rows, trains, now):
+        destiny = self.data[rows, trains, 1]
+        loaded = self.is_loaded[rows, trains]
+        service_time = np.where(loaded, self.unloading_times[rows, destiny], self.loading_times[rows, destiny])
+        start = np.maximum(now, self.terminal_queues[rows, destiny])
+        time = start + service_time
+        self.total_queue_time[rows] += start - now
+        self.terminal_queues[rows, destiny] = time
+        self.schedule(rows, trains, time, np.where(loaded, et.ON_FINISH_UNLOADING, et.ON_FINISH_LOADING))
+
+    def from_terminal2port(self, rows, trains, now):
+        new_origin = self.data[rows, trains, 1]
+        speed = np.where(self.is_loaded[rows, trains], self.speed_loaded[rows, trains], self.speed_empty[rows, trains])
+        destiny = self.nearest_node[new_origin]
+        transit_time = self.nearest_distance[new_origin] / speed
+        transit_time = np.trunc(np.where(transit_time > now, transit_time + self.node_queues[rows, destiny],
+                                         transit_time))
+        self.data[rows, trains, 0] = new_origin
+        self.data[rows, trains, 1] = destiny
+        start = np.maximum(now, self.node_queues[rows, destiny])
+        time = start + transit_time
+        self.total_queue_time[rows] += start - now
+        self.node_queues[rows, destiny] = time
+        self.schedule(rows, trains, time, et.FROM_PORT2PORT)
+
+    def from_port2port(self, rows, trains, now):
+        node = self.data[rows, trains, 1]
+        self.data[rows, trains, 0] = node
+        destiny = self.next_terminals(rows, trains, node, now)
+        self.data[rows, trains, 1] = destiny
+        time = np.maximum(now, self.terminal_queues[rows, destiny])
+        self.terminal_queues[rows, destiny] = time
+        self.schedule(rows, trains, time, et.FROM_PORT2TERMINAL)
+
+    def on_finish_loading(self, rows, trains, now):
+        destiny = self.data[rows, trains, 1]
+        self.is_loaded[rows, trains] = True
+        self.load[rows, trains] = 1e3
+        self.demand_origin[rows, trains] = self.data[rows, trains, 0]
+        time = np.maximum(now, self.node_queues[rows, destiny])
+        self.node_queues[rows, destiny] = time
+        self.data[rows, trains, 0] = destiny
+        self.schedule(rows, trains, time, et.FROM_TERMINAL2PORT)
+
+    def on_finish_unloading(self, rows, trains, now):
+        terminal = self.data[rows, trains, 1]
+        node = self.data[rows, trains, 0]
+        self.demand_destiny[rows, trains] = terminal
+        origin = self.demand_origin[rows, trains]
+        load = self.load[rows, trains]
+
+        delivering = origin >= 0
+        if delivering.any():
+            codes = self.demand_code(origin, terminal, terminal)
+            position = np.minimum(np.searchsorted(self.demand_codes, codes), len(self.demand_codes) - 1)
+            delivering &= self.demand_codes[position] == codes
+            delivered = rows[delivering]
+            ids = self.demand_ids[position[delivering]]
+            self.current_demand[delivered, ids] += load[delivering]
+            self.achieved_demand[delivered, ids] = self.current_demand[delivered, ids] >= self.total_demand[ids]
+
+            logged = delivering & self.can_load[np.maximum(origin, 0)] & (origin != terminal)
+            logged_rows = rows[logged]
+            if len(logged_rows):
+                index = self.deliveries[logged_rows]
+                self.delivery_time = grow(self.delivery_time, int(index.max()) + 1)
+                self.delivery_load = grow(self.delivery_load, self.delivery_time.shape[1])
+                self.delivery_time[logged_rows, index] = now[logged]
+                self.delivery_load[logged_rows, index] = load[logged]
+                self.total_production[logged_rows] += load[logged]
+                self.deliveries[logged_rows] += 1
+
+        self.is_loaded[rows, trains] = False
+        self.load[rows, trains] = 0
+        time = np.maximum(now, self.node_queues[rows, node])
+        self.node_queues[rows, node] = time
+        self.data[rows, trains, 0] = terminal
+        self.data[rows, trains, 1] = node
+        self.schedule(rows, trains, time, et.FROM_TERMINAL2PORT)
+
+    def simulate(self, t):
+        """ Simulates every variant up to the time horizon
+
+        As Simulator.simulate, a variant stops once its calendar is empty
+        or after firing the first event past the horizon.
+
+        Args:
+            t (float): time horizon
+        """
+        self.clear()
+        self.starting_events()
+        callbacks = {
+            et.FROM_PORT2TERMINAL: self.from_port2terminal,
+            et.FROM_TERMINAL2PORT: self.from_terminal2port,
+            et.FROM_PORT2PORT: self.from_port2port,
+            et.ON_FINISH_LOADING: self.on_finish_loading,
+            et.ON_FINISH_UNLOADING: self.on_finish_unloading,
+        }
+        sequence_limit = np.iinfo(np.int64).max
+        event_time = self.event_time
+        while True:
+            next_time = event_time.min(axis=1)
+            running = next_time < np.inf
+            if not running.any():
+                break
+            trains = event_time.argmin(axis=1)
+            # simultaneous events fire in push order
+            ties = event_time == next_time[:, None]
+            tied = np.flatnonzero(running & (ties.sum(axis=1) > 1))
+            if len(tied):
+                trains[tied] = np.where(ties[tied], self.event_sequence[tied], sequence_limit).argmin(axis=1)
+            running = np.flatnonzero(running)
+            trains = trains[running]
+            next_time = next_time[running]
+            self.time[running] = next_time
+            events = self.event_type[running, trains]
+            for event, callback in callbacks.items():
+                selected = events == event
+                if selected.any():
+                    callback(running[selected], trains[selected], next_time[selected])
+            # a variant stops after the first event past the horizon
+            finished = running[next_time > t]
+            if len(finished):
+                event_time[finished] = np.inf
+
+    def queue_time(self):
+        """ Total queue time of every variant
+
+        Returns:
+            (np.array): (K,) queue times
+        """
+        return self.total_queue_time
+
+    def evaluate_produtivity(self, variant):
+        """ Productivity log of a variant, as Model.evaluate_produtivity
+
+        Args:
+            variant (int): variant index
+
+        Returns:
+            productivity (np.array): cumulative production over time at each delivery
+            production (np.array): delivered load
+            time (np.array): delivery time
+        """
+        size = self.deliveries[variant]
+        time = self.delivery_time[variant, :size]
+        production = self.delivery_load[variant, :size]
+        return np.cumsum(production) / time, production, time
+
+    def final_productivity(self):
+        """ Productivity at the last delivery of every variant (0 without deliveries)
+
+        Returns:
+            (np.array): (K,) productivities
+        """
+        rows = np.arange(len(self.time))
+        last = np.maximum(self.deliveries - 1, 0)
+        time = self.delivery_time[rows, last]
+        return np.where(self.deliveries > 0, self.total_production / np.where(time > 0, time, 1), 0)
@@ -1,13 +1,15 @@
-from distance_map import DistanceMap
+from .distance_map import DistanceMap
 
 class Node:
+    __slots__ = ('node_id', 'node_name', 'distance_map', 'related_terminals', 'related_nodes')
+
     def __init__(self, node_id, node_name):
         self.node_id = node_id
         self.node_name = node_name
         self.distance_map = []
 
-    def set_distance_map(self, destiny, distance):
-        dist_map = DistanceMap(self, destiny)
+    def set_distance_map(self, destiny, distance, tracks=None):
+        dist_map = DistanceMap(self, destiny, tracks)
         dist_map.set_distance(distance)
         self.distance_map.append(dist_map)
     
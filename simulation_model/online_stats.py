@@ -0,0 +1,146 @@
+""" Streaming productivity and queue-time statistics.
+
+Every delivery and queue wait updates the statistics in O(1) (amortized),
+so they can be queried at any simulated time during a run.
+"""
+import math
+
+import numpy as np
+
+
+def grow(array, size):
+    """ Resizes a buffer to hold at least `size` items, doubling its length
+
+    Args:
+        array (np.array): buffer
+        size (int): required length
+
+    Returns:
+        (np.array): the buffer, or a larger zero-padded copy
+    """
+    if size <= len(array):
+        return array
+    larger = np.zeros(max(size, 2 * len(array)), dtype=array.dtype)
+    larger[:len(array)] = array
+    return larger
+
+
+class OnlineStatistics:
+    ''' Running statistics of a simulation run
+    '''
+
+    def __init__(self, bin_width=24, capacity=1 << 10):
+        """ Constructs the statistics
+
+        Args:
+            bin_width (float): width (in hours) of the histogram time bins
+            capacity (int): initial number of deliveries of the buffers
+        """
+        self.bin_width = bin_width
+        self.capacity = capacity
+        self.reset()
+
+    def reset(self, initial_deliveries=0):
+        """ Clears the statistics at the beginning of a run
+
+        Args:
+            initial_deliveries (int): number of empty deliveries at time 1e-10
+                heading the delivery log
+        """
+        size = max(self.capacity, initial_deliveries)
+        self.time = np.zeros(size)
+        self.production = np.zeros(size)
+        self.productivity = np.zeros(size)
+        self.time[:initial_deliveries] = 1e-10
+        self.deliveries = initial_deliveries
+        self.total_production = 0
+
+        self.queue_count = 0
+        self.total_queue_time = 0
+        self.queue_mean = 0
+        self.queue_m2 = 0
+        self.production_bins = np.zeros(16)
+        self.queue_time_bins = np.zeros(16)
+
+    def record_delivery(self, time, load):
+        """ Records a train unloading its load
+
+        Args:
+            time (float): simulation time
+            load (float): delivered load
+        """
+        index = self.deliveries
+        if index == len(self.time):
+            self.time = grow(self.time, index + 1)
+            self.production = grow(self.production, index + 1)
+            self.productivity = grow(self.productivity, index + 1)
+        self.total_production += load
+        self.time[index] = time
+        self.production[index] = load
+        self.productivity[index] = self.total_production/time
+        self.deliveries = index + 1
+
+        time_bin = int(time // self.bin_width)
+        self.production_bins = grow(self.production_bins, time_bin + 1)
+        self.production_bins[time_bin] += load
+
+    def record_queue_wait(self, time, wait):
+        """ Records the queue wait of a train (Welford update)
+
+        Args:
+            time (float): simulation time
+            wait (float): queue wait
+        """
+        self.queue_count += 1
+        self.total_queue_time += wait
+        delta = wait - self.queue_mean
+        self.queue_mean += delta / self.queue_count
+        self.queue_m2 += delta * (wait - self.queue_mean)
+
+        time_bin = int(time // self.bin_width)
+        self.queue_time_bins = grow(self.queue_time_bins, time_bin + 1)
+        self.queue_time_bins[time_bin] += wait
+
+    def evaluate_produtivity(self, time=None):
+        """ Productivity so far
+
+        Args:
+            time (float): current simulation time, defaults to the last delivery
+
+        Returns:
+            (float): cumulative production over time
+        """
+        if time is None:
+            time = self.time[self.deliveries - 1] if self.deliveries else 0
+        return self.total_production/time if time > 0 else 0
+
+    def productivity_log(self):
+        """ Productivity at each delivery, without copying
+
+        Returns:
+            productivity (np.array): cumulative production over time at each delivery
+            production (np.array): delivered load
+            time (np.array): delivery time
+        """
+        size = self.deliveries
+        return self.productivity[:size], self.production[:size], self.time[:size]
+
+    def queue_wait_variance(self):
+        """ Sample variance of the queue waits
+
+        Returns:
+            (float): variance, nan with less than two waits
+        """
+        return self.queue_m2 / (self.queue_count - 1) if self.queue_count > 1 else math.nan
+
+    def histograms(self):
+        """ Production and queue time per time bin
+
+        Returns:
+            edges (np.array): start time of the bins
+            production (np.array): delivered load per bin
+            queue_time (np.array): queue wait per bin
+        """
+        size = max(len(np.trim_zeros(self.production_bins, 'b')), len(np.trim_zeros(self.queue_time_bins, 'b')))
+        edges = self.bin_width * np.arange(size)
+        return edges, self.production_bins[:size].copy(), self.queue_time_bins[:size].copy()
@@ -0,0 +1,541 @@
+""" Parallel simulation of a model split into independent partitions of yards.
+
+Every partition is a logical process run by its own worker process. It
+owns the yards of the partition and the terminals related to them. A
+departing train books the arrival register of its destiny yard at once,
+and a terminal choice reads the forecasts of the terminals of its yard,
+so two partitions sharing a register would have to synchronize at every
+departure. Partitions are therefore independent: every register is read
+and written by a single partition, and trains never cross partitions.
+check_partitions rejects the assignments that break this rule, and
+partition builds assignments from the independent groups of yards.
+
+The parallel run reproduces the unmodified sequential run exactly:
+
+    assignment = partition(model, 4)
+    ParallelSimulator(assignment=assignment).simulate(model, horizon)
+    # same results as Simulator().simulate(model, horizon)
+
+The workers advance in synchronous windows of simulated time. Events of
+a partition are ordered by flat keys (time, rank of the event that
+scheduled it, starting order). The rank of an event is its position in
+the sequential run: events of a window are numbered provisionally by
+their partition, and the coordinator merges the windows of all the
+partitions into their global order. The keys sort like the (time,
+insertion) order of the sequential calendar, so the statistics are
+replayed in the sequential order and the first event past the horizon is
+chosen globally.
+"""
+import heapq
+import math
+import multiprocessing
+import pickle
+import sys
+
+from .build_model import Model
+from .checkpoint import decode_train, encode_train
+
+# events run by the partition of the yard data[1], the others by the partition of the terminal data[1]
+NODE_EVENTS = ('from_terminal2port', 'from_port2port')
+
+# pickling recursion depth per terminal: demands link the terminals into a deep object graph
+RECURSION_PER_TERMINAL = 20
+
+# seconds between the liveness checks of a worker the coordinator is waiting for
+POLL_INTERVAL = 1.0
+
+# recorded statistics calls
+DELIVERY = 0
+QUEUE_WAIT = 1
+
+
+def coupled_yards(model):
+    """ Pairs of yards sharing a queue register or a terminal
+
+    A terminal related to several yards couples them. A loaded train
+    leaves loading terminal t from yard t, whose register the terminal
+    books. A train leaving a yard books the arrival register of the
+    nearest yard, where it goes.
+
+    Args:
+        model (:obj:Model): model
+
+    Yields:
+        (tuple): yard, coupled yard and the reason, as text
+    """
+    topology = model.topology
+    holders = {}
+    for index, related in enumerate(topology.related_terminals):
+        for terminal in related:
+            holder = holders.setdefault(terminal, index)
+            yield index, holder, f'terminal {terminal} is related to yards {holder} and {index}'
+    for terminal, holder in holders.items():
+        if model.terminals[terminal].can_load and terminal < len(model.nodes):
+            yield terminal, holder, f'loaded trains leave terminal {terminal} from yard {terminal}'
+    for origin, destiny in enumerate(topology.nearest_node):
+        if destiny >= 0:
+            yield origin, destiny, f'trains leaving yard {origin} book the arrival register of yard {destiny}'
+
+
+def partition(model, partitions):
+    """ Splits the yards of a model into partitions
+
+    Coupled yards (see coupled_yards) form independent groups, which are
+    packed into `partitions` partitions balancing the trains starting in
+    them (largest group first, into the partition with the fewest trains).
+    Fewer partitions are returned when the groups are fewer.
+
+    Args:
+        model (:obj:Model): model
+        partitions (int): number of partitions
+
+    Returns:
+        (list): partition of every yard
+    """
+    parent = list(range(len(model.nodes)))
+
+    def find(index):
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    for first, second, _ in coupled_yards(model):
+        first, second = find(first), find(second)
+        if first != second:
+            parent[max(first, second)] = min(first, second)
+
+    weights = {}
+    for index in range(len(model.nodes)):
+        weights.setdefault(find(index), 0)
+    node_index = model.topology.node_index
+    for train in model.trains:
+        weights[find(node_index[train.origin])] += 1
+
+    loads = [0 for _ in range(min(partitions, len(weights)))]
+    numbers = {}
+    for group in sorted(weights, key=lambda group: (-weights[group], group)):
+        number = loads.index(min(loads))
+        numbers[group] = number
+        loads[number] += weights[group]
+    return [numbers[find(index)] for index in range(len(model.nodes))]
+
+
+def check_partitions(model, assignment):
+    """ Checks that the partitions of a model are independent
+
+    Args:
+        model (:obj:Model): model
+        assignment (list): partition of every yard
+
+    Returns:
+        (list): partition of every terminal
+
+    Raises:
+        ValueError: if the model or the assignment cannot be run in parallel
+    """
+    if model.policy is not None or model.randomness is not None or model.routing is not None:
+        raise ValueError('partitioned models need the built-in dispatch rules and nominal times')
+    if model.trace is not None or model.history is not None:
+        raise ValueError('partitioned models cannot record a trace (see verbose) or a queue history')
+    if len(assignment) != len(model.nodes):
+        raise ValueError(f'{len(assignment)} partitions given for {len(model.nodes)} yards')
+    for first, second, reason in coupled_yards(model):
+        if assignment[first] != assignment[second]:
+            raise ValueError(f'yards {first} and {second} are in partitions {assignment[first]} and '
+                             f'{assignment[second]}, but {reason}')
+
+    terminal_partitions = [assignment[terminal] if terminal < len(assignment) else 0
+                           for terminal in range(len(model.terminals))]
+    for index, related in enumerate(model.topology.related_terminals):
+        for terminal in related:
+            terminal_partitions[terminal] = assignment[index]
+    return terminal_partitions
+
+
+class RecordedStatistics:
+    ''' Statistics calls of a partition, replayed in event order after the run
+    '''
+
+    def __init__(self, process):
+        """ Constructs the record
+
+        Args:
+            process (:obj:Partition): partition whose running event ranks the calls
+        """
+        self.process = process
+        self.log = []
+
+    def reset(self, initial_deliveries=0):
+        self.log = []
+
+    def record_delivery(self, time, load):
+        self.log.append((self.process.rank, len(self.log), DELIVERY, time, load))
+
+    def record_queue_wait(self, time, wait):
+        self.log.append((self.process.rank, len(self.log), QUEUE_WAIT, time, wait))
+
+
+class Partition:
+    ''' Logical process simulating the yards and terminals of a partition
+
+    Stands in for the Simulator of the model. Every partition computes the
+    starting events of all the trains and keeps its own.
+    '''
+
+    def __init__(self, index, model, node_partitions, terminal_partitions):
+        """ Constructs the logical process
+
+        Args:
+            index (int): partition number
+            model (:obj:Model): model, a private copy of the worker
+            node_partitions (list): partition of every yard
+            terminal_partitions (list): partition of every terminal
+        """
+        self.index = index
+        self.model = model
+        self.node_partitions = node_partitions
+        self.terminal_partitions = terminal_partitions
+        self.time = 0
+        self.calendar = []
+        self.rank = None  # rank of the running event, None while starting
+        self.starts = 0
+        self.base = 0  # rank of the first event of the window
+        self.executed = []  # keys of the events run in the window
+        self.logged = 0  # statistics calls before the window
+        self.events = 0
+
+    def owner(self, callback, data):
+        """ Partition running an event
+        """
+        if callback.__name__ in NODE_EVENTS:
+            return self.node_partitions[data[1]]
+        return self.terminal_partitions[data[1]]
+
+    def add_event(self, t, f, data):
+        """ Schedules an event, see Simulator.add_event
+
+        Returns:
+            None, partitioned events cannot be cancelled
+
+        Raises:
+            RuntimeError: if a running event schedules an event of another partition
+        """
+        if self.rank is None:
+            key = (t, -1, self.starts)
+            self.starts += 1
+        else:
+            key = (t, self.rank, 0)  # an event schedules a single event
+        owner = self.owner(f, data)
+        if owner == self.index:
+            heapq.heappush(self.calendar, (key, f, data))  # keys are unique, data is never compared
+        elif self.rank is not None:
+            raise RuntimeError(f'train {data[3]} crosses from partition {self.index} to partition {owner}')
+
+    def step(self):
+        """ Runs the next event, ranked provisionally after the events of the window
+        """
+        key, f, data = heapq.heappop(self.calendar)
+        self.rank = self.base + len(self.executed)
+        self.executed.append(key)
+        self.time = key[0]
+        f(self, data)
+        self.events += 1
+
+    def renumber(self, ranks, base):
+        """ Replaces the provisional ranks of the last window by the global ones
+
+        The ranks keep the order of the events of the partition, so the
+        calendar remains a heap.
+
+        Args:
+            ranks (list): global rank of every event run in the window
+            base (int): rank of the first event of the next window
+        """
+        first = self.base
+
+        def rank(value):
+            return ranks[value - first] if value >= first else value
+
+        if ranks:
+            self.calendar = [((t, rank(parent), start), f, data) for (t, parent, start), f, data in self.calendar]
+            log = self.model.stats.log
+            log[self.logged:] = [(rank(entry[0]),) + entry[1:] for entry in log[self.logged:]]
+        self.logged = len(self.model.stats.log)
+        self.executed = []
+        self.base = base
+
+    def advance(self, bound, horizon):
+        """ Runs the events earlier than bound, up to the horizon
+        """
+        calendar = self.calendar
+        while calendar and calendar[0][0][0] < bound and calendar[0][0][0] <= horizon:
+            self.step()
+
+    def next_time(self):
+        return self.calendar[0][0][0] if self.calendar else math.inf
+
+    def results(self):
+        """ State owned by the partition, as plain data
+        """
+        model = self.model
+        terminals = [index for index, number in enumerate(self.terminal_partitions) if number == self.index]
+        nodes = [index for index, number in enumerate(self.node_partitions) if number == self.index]
+        return {
+            'time': self.time,
+            'events': self.events,
+            'stats': model.stats.log,
+            'terminals': {index: (model.terminal_queues[index], model.terminal_queues_forecast[index],
+                                  model.berths[index] if model.berths is not None else None,
+                                  model.forecast_berths[index] if model.forecast_berths is not None else None,
+                                  [(demand.current_demand, demand.achieved_demand)
+                                   for demand in model.terminals[index].demands])
+                          for index in terminals},
+            'nodes': {index: (model.node_queues[index], model.node_queues_forecast[index]) for index in nodes},
+            'segments': {key: segment for key, segment in model.segments.items()
+                         if self.node_partitions[key[0]] == self.index},
+            'trains': {data[3]: encode_train(model, data[2]) for _, _, data in self.calendar},
+        }
+
+
+def recursion_limit(terminals):
+    """ Recursion limit needed to pickle a model with a number of terminals
+    """
+    return max(sys.getrecursionlimit(), RECURSION_PER_TERMINAL * terminals)
+
+
+def run_partition(connection, topology, index, assignment, limit):
+    """ Worker process of a partition, driven by ParallelSimulator
+
+    Args:
+        connection (:obj:multiprocessing.connection.Connection): pipe to the coordinator
+        topology (bytes): pickled (nodes, terminals, trains)
+        index (int): partition number
+        assignment (list): partition of every yard
+        limit (int): recursion limit needed to unpickle the topology
+    """
+    sys.setrecursionlimit(limit)
+    nodes, terminals, trains = pickle.loads(topology)
+    model = Model(nodes, terminals, trains)
+    model.verbose = False
+    process = Partition(index, model, assignment, check_partitions(model, assignment))
+    model.stats = RecordedStatistics(process)
+    model.clear()
+    model.starting_events(process)
+    connection.send(process.next_time())
+    while True:
+        command, *args = connection.recv()
+        if command == 'advance':
+            bound, horizon, ranks, base = args
+            process.renumber(ranks, base)
+            process.advance(bound, horizon)
+            connection.send((process.next_time(), process.executed))
+        elif command == 'peek':
+            process.renumber(*args)
+            connection.send(process.calendar[0][0] if process.calendar else None)
+        elif command == 'step':
+            process.step()
+            connection.send(None)
+        elif command == 'finish':
+            connection.send(process.results())
+            break
+    connection.close()
+
+
+def global_ranks(windows, base):
+    """ Merges the events run by the partitions in a window into the sequential order
+
+    Partitions are independent, so an event of the window scheduled in the
+    window was scheduled by an earlier event of its own partition.
+
+    Args:
+        windows (list): keys of the events run by every partition, in their order
+        base (int): rank of the first event of the window
+
+    Returns:
+        (list): global rank of the events of every partition
+    """
+    ranks = [[] for _ in windows]
+    heap = []
+
+    def push(index, position):
+        if position < len(windows[index]):
+            t, parent, start = windows[index][position]
+            if parent >= base:
+                parent = ranks[index][parent - base]
+            heapq.heappush(heap, ((t, parent, start), index, position))
+
+    for index in range(len(windows)):
+        push(index, 0)
+    rank = base
+    while heap:
+        _, index, position = heapq.heappop(heap)
+        ranks[index].append(rank)
+        rank += 1
+        push(index, position + 1)
+    return ranks
+
+
+class ParallelSimulator:
+    ''' Parallel simulator, one worker process per independent partition
+    '''
+
+    def __init__(self, partitions=2, assignment=None, window=24 * 30):
+        """ Constructs the simulator
+
+        Args:
+            partitions (int): number of partitions, see partition
+            assignment (list): partition of every yard, overrides partitions
+            window (float): simulated hours run by the workers between
+                merges of their event order
+        """
+        self.partitions = partitions
+        self.assignment = assignment
+        self.window = window
+        self.time = 0
+        self.stop_reason = None
+        self.rounds = 0
+        self.events = 0
+
+    def simulate(self, model, t=24 * 3600):
+        ''' Simulates a model up to the time horizon, see Simulator.simulate
+
+        The final state (statistics, queues, demands and trains) is written
+        back into the model; the pending events are not, so the run cannot
+        be resumed. Termination conditions are not supported.
+
+        Args:
+            model (:obj:Model): model
+            t (float): time horizon
+        '''
+        assignment = self.assignment if self.assignment is not None else partition(model, self.partitions)
+        check_partitions(model, assignment)
+        parts = max(assignment) + 1
+        limit = recursion_limit(len(model.terminals))
+        previous = sys.getrecursionlimit()
+        sys.setrecursionlimit(limit)
+        try:
+            topology = pickle.dumps((model.nodes, model.terminals, model.trains))
+        finally:
+            sys.setrecursionlimit(previous)
+
+        connections = []
+        processes = []
+        for index in range(parts):
+            connection, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=run_partition, args=(child, topology, index, assignment, limit),
+                                              daemon=True)
+            process.start()
+            child.close()
+            connections.append(connection)
+            processes.append(process)
+        try:
+            results = self.coordinate(connections, processes, t)
+        except BaseException:
+            for process in processes:
+                process.terminate()
+            raise
+        finally:
+            for process in processes:
+                process.join()
+        self.write_back(model, results)
+
+    @staticmethod
+    def receive(connection, process, index):
+        """ Waits for the reply of a worker
+
+        Args:
+            connection (:obj:multiprocessing.connection.Connection): pipe to the worker
+            process (:obj:multiprocessing.Process): worker process
+            index (int): partition number
+
+        Raises:
+            RuntimeError: if the worker exits without replying
+        """
+        while not connection.poll(POLL_INTERVAL):
+            if process.exitcode is not None and not connection.poll():
+                raise RuntimeError(f'the worker of partition {index} exited with code {process.exitcode}')
+        try:
+            return connection.recv()
+        except EOFError:
+            process.join(POLL_INTERVAL)
+            raise RuntimeError(f'the worker of partition {index} exited with code {process.exitcode}') from None
+
+    def coordinate(self, connections, processes, t):
+        """ Drives the workers through the synchronous windows
+
+        Args:
+            connections (list): pipe to every worker
+            processes (list): worker processes, checked while waiting for them
+            t (float): time horizon
+
+        Returns:
+            (list): results of every partition
+        """
+        def replies():
+            return [self.receive(connection, process, index)
+                    for index, (connection, process) in enumerate(zip(connections, processes))]
+
+        next_times = replies()
+        ranks = [[] for _ in connections]
+        base = 0
+        self.rounds = 0
+        while min(next_times) <= t:
+            bound = min(next_times) + self.window
+            for connection, own_ranks in zip(connections, ranks):
+                connection.send(('advance', bound, t, own_ranks, base))
+            windows = replies()
+            next_times = [next_time for next_time, _ in windows]
+            ranks = global_ranks([executed for _, executed in windows], base)
+            base += sum(len(own_ranks) for own_ranks in ranks)
+            self.rounds += 1
+
+        # the sequential loop also runs the first event past the horizon
+        for connection, own_ranks in zip(connections, ranks):
+            connection.send(('peek', own_ranks, base))
+        keys = [(key, index) for index, key in enumerate(replies()) if key is not None]
+        if keys:
+            key, index = min(keys)
+            connections[index].send(('step',))
+            self.receive(connections[index], processes[index], index)
+
+        for connection in connections:
+            connection.send(('finish',))
+        results = replies()
+        if keys:
+            self.time = key[0]
+            self.stop_reason = 'horizon'
+        else:
+            self.time = max(result['time'] for result in results)
+            self.stop_reason = 'empty'
+        self.events = sum(result['events'] for result in results)
+        return results
+
+    @staticmethod
+    def write_back(model, results):
+        """ Writes the final state of the partitions into the model
+        """
+        model.clear()
+        for _, _, kind, time, value in sorted(entry for result in results for entry in result['stats']):
+            if kind == DELIVERY:
+                model.stats.record_delivery(time, value)
+            else:
+                model.total_queue_time += value
+                model.stats.record_queue_wait(time, value)
+        for result in results:
+            for index, (queue, forecast, berths, forecast_berths, demands) in result['terminals'].items():
+                model.terminal_queues[index] = queue
+                model.terminal_queues_forecast[index] = forecast
+                if model.berths is not None:
+                    model.berths[index] = berths
+                    model.forecast_berths[index] = forecast_berths
+                for demand, (current_demand, achieved_demand) in zip(model.terminals[index].demands, demands):
+                    demand.current_demand = current_demand
+                    demand.achieved_demand = achieved_demand
+            for index, (queue, forecast) in result['nodes'].items():
+                model.node_queues[index] = queue
+                model.node_queues_forecast[index] = forecast
+            model.segments.update(result['segments'])
+            for index, state in result['trains'].items():
+                decode_train(model, model.trains[index], state)
+        model.unmet_demands = model.count_unmet_demands()
@@ -0,0 +1,52 @@
+""" Analytical performance bounds of a railroad.
+"""
+
+
+def get_performance_metrics(terminals, train_speed_loaded):
+    """ Calculates the max cycle time and max loading time on the railroad
+
+    The cycle time of a terminal is its loading and unloading time plus a
+    round trip to its farthest neighbouring node at the loaded speed.
+
+    Args:
+        terminals (list): list of terminals
+        train_speed_loaded (float): speed of a loaded train
+
+    Returns:
+        loading_time (int): max loading time
+        cycle_time (int): max cycle time
+    """
+    cycle_time = 0
+    max_loading_time = 0
+    for terminal in terminals:
+        unloading_time = terminal.unloading_time if terminal.unloading_time is not None else 0
+        loading_time = terminal.loading_time if terminal.loading_time is not None else 0
+        time = 0
+        for node in terminal.related_nodes:
+            for dist_map in node.distance_map:
+                aux_time = 2*dist_map.distance/train_speed_loaded
+                if aux_time > time:
+                    time = aux_time
+        aux_cycle = unloading_time + loading_time + time
+        if aux_cycle > cycle_time:
+            cycle_time = aux_cycle
+        if loading_time > max_loading_time:
+            max_loading_time = loading_time
+    return max_loading_time, cycle_time
+
+
+def analytical_productivity(number_of_trains, terminals, train_speed_loaded, train_load=1e3):
+    """ Analytical productivity bound for a fleet size
+
+    Args:
+        number_of_trains (int): fleet size
+        terminals (list): list of terminals
+        train_speed_loaded (float): speed of a loaded train
+        train_load (float): load of a train
+
+    Returns:
+        (float): min(n, max_number_of_trains) * train_load / cycle_time
+    """
+    max_loading_time, cycle_time = get_performance_metrics(terminals, train_speed_loaded)
+    max_number_of_trains = cycle_time/max_loading_time
+    return min(number_of_trains, max_number_of_trains) * train_load / cycle_time
@@ -0,0 +1,146 @@
+""" Opt-in instrumentation of the simulation loop.
+
+A Profiler attached to a Simulator replaces its event loop by one that
+counts and times every callback, samples the calendar length and calls
+sampling hooks. Simulators without a profiler run the plain loop.
+
+    simulator = Simulator()
+    simulator.profiler = Profiler(sample_every=100)
+    simulator.simulate(model, horizon)
+    print(simulator.profiler.summary())
+    simulator.profiler.save_json('profile.json')
+"""
+import cProfile
+import io
+import json
+import pstats
+import time as clock
+
+
+class Profiler:
+    ''' Per-callback counters and timers of a simulation run
+    '''
+
+    def __init__(self, sample_every=1, cprofile=False, hooks=()):
+        """ Constructs a profiler
+
+        Args:
+            sample_every (int): events between calendar length samples
+            cprofile (bool): also run cProfile over the event loop
+            hooks (tuple): functions hook(simulator, model) called at every sample
+        """
+        self.sample_every = sample_every
+        self.hooks = list(hooks)
+        self.profile = cProfile.Profile() if cprofile else None
+        self.clear()
+
+    def clear(self):
+        """ Clears the counters
+        """
+        self.callbacks = {}  # name: [calls, seconds]
+        self.events = 0
+        self.wall_time = 0
+        self.queue_samples = []  # (simulation time, calendar length)
+
+    def run(self, simulator, model, t, until=None):
+        """ Instrumented event loop, see Simulator.simulate
+
+        Args:
+            simulator (:obj:Simulator): simulator
+            model (:obj:model): discrete event system model
+            t (float): time horizon
+            until (:obj:termination.Condition): termination condition, None for none
+        """
+        calendar = simulator.calendar
+        callbacks = self.callbacks
+        perf_counter = clock.perf_counter
+        sample_every = self.sample_every
+        events = self.events
+
+        start = perf_counter()
+        if self.profile is not None:
+            self.profile.enable()
+        try:
+            while (not calendar.is_empty()) and (simulator.time <= t):
+                simulator.time, f, data = calendar.pop()
+                called = perf_counter()
+                f(simulator, data)
+                elapsed = perf_counter() - called
+                counter = callbacks.get(f.__name__)
+                if counter is None:
+                    counter = callbacks[f.__name__] = [0, 0.0]
+                counter[0] += 1
+                counter[1] += elapsed
+                events += 1
+                if events % sample_every == 0:
+                    self.queue_samples.append((simulator.time, len(calendar)))
+                    for hook in self.hooks:
+                        hook(simulator, model)
+                if until is not None and until(simulator, model):
+                    break
+        finally:
+            if self.profile is not None:
+                self.profile.disable()
+            self.events = events
+            self.wall_time += perf_counter() - start
+
+    def events_per_second(self):
+        """ Events processed per wall-clock second
+        """
+        return self.events / self.wall_time if self.wall_time > 0 else 0
+
+    def to_dict(self):
+        """ Machine-readable report
+
+        Returns:
+            (dict): events, wall time, events per second, per-callback calls,
+                seconds and mean microseconds, and calendar length samples
+        """
+        lengths = [length for _, length in self.queue_samples]
+        return {
+            'events': self.events,
+            'wall_time': self.wall_time,
+            'events_per_second': self.events_per_second(),
+            'callbacks': {name: {'calls': calls, 'seconds': seconds, 'mean_us': 1e6 * seconds / calls}
+                          for name, (calls, seconds) in self.callbacks.items()},
+            'queue_length': {
+                'max': max(lengths, default=0),
+                'mean': sum(lengths) / len(lengths) if lengths else 0,
+                'samples': self.queue_samples,
+            },
+        }
+
+    def save_json(self, path):
+        """ Writes the report as JSON
+
+        Args:
+            path (str): output file
+        """
+        with open(path, 'w') as file:
+            json.dump(self.to_dict(), file, indent=2)
+
+    def summary(self, top=20):
+        """ Text report, callbacks sorted by cumulative time
+
+        Args:
+            top (int): number of cProfile functions listed
+
+        Returns:
+            (str): report
+        """
+        report = self.to_dict()
+        callback_time = sum(seconds for _, seconds in self.callbacks.values())
+        lines = [f'{report["events"]} events in {report["wall_time"]:.3f} s '
+                 f'({report["events_per_second"]:.0f} events/s)',
+                 f'{"callback":<24}{"calls":>10}{"seconds":>12}{"mean us":>10}{"share":>8}']
+        for name, (calls, seconds) in sorted(self.callbacks.items(), key=lambda item: -item[1][1]):
+            share = seconds / callback_time if callback_time else 0
+            lines.append(f'{name:<24}{calls:>10}{seconds:>12.4f}{1e6 * seconds / calls:>10.2f}{share:>8.1%}')
+        lines.append(f'calendar and loop overhead {report["wall_time"] - callback_time:.4f} s, '
+                     f'queue length max {report["queue_length"]["max"]} '
+                     f'mean {report["queue_length"]["mean"]:.1f}')
+        if self.profile is not None:
+            stream = io.StringIO()
+            pstats.Stats(self.profile, stream=stream).sort_stats('cumulative').print_stats(top)
+            lines.append(stream.getvalue())
+        return '\n'.join(lines)
@@ -0,0 +1,117 @@
+""" Opt-in history of the model queue registers.
+
+The model only keeps the next free time of every terminal and node. When
+a QueueHistory is attached (model.history), every register update and
+queue wait is also recorded in a growable NumPy buffer. Waits at a
+terminal and at a node are separate kinds, so the index of every record
+refers to a single kind of resource.
+"""
+import numpy as np
+
+TERMINAL_QUEUE = 0
+NODE_QUEUE = 1
+TERMINAL_FORECAST = 2
+TERMINAL_WAIT = 3
+NODE_WAIT = 4
+
+history_dtype = np.dtype([
+    ('time', np.float64),
+    ('kind', np.uint8),
+    ('index', np.int32),
+    ('value', np.float64),
+])
+
+
+class QueueHistory:
+    ''' Growable record buffer of queue register updates
+    '''
+
+    def __init__(self, capacity=1 << 12):
+        """ Constructs a queue history
+
+        Args:
+            capacity (int): initial number of records
+        """
+        self.buffer = np.empty(capacity, dtype=history_dtype)
+        self.size = 0
+
+    def clear(self):
+        """ Forgets all records
+        """
+        self.size = 0
+
+    def record(self, time, kind, index, value):
+        """ Records an update
+
+        Args:
+            time (float): simulation time of the update
+            kind (int): TERMINAL_QUEUE, NODE_QUEUE, TERMINAL_FORECAST,
+                TERMINAL_WAIT or NODE_WAIT
+            index (int): terminal or node index
+            value (float): new register value (or queue wait)
+        """
+        if self.size == len(self.buffer):
+            self.buffer = np.resize(self.buffer, 2 * len(self.buffer))
+        self.buffer[self.size] = (time, kind, index, value)
+        self.size += 1
+
+    def records(self):
+        """ All records in update order
+
+        Returns:
+            (np.ndarray): history records
+        """
+        return self.buffer[:self.size]
+
+    def queue(self, kind, index):
+        """ Successive values of a register, starting from 0
+
+        Args:
+            kind (int): TERMINAL_QUEUE, NODE_QUEUE or TERMINAL_FORECAST
+            index (int): terminal or node index
+
+        Returns:
+            (np.array): register values
+        """
+        records = self.records()
+        values = records['value'][(records['kind'] == kind) & (records['index'] == index)]
+        return np.concatenate(([0.], values))
+
+    def queue_waits(self, kind=None, index=None):
+        """ Queue waits over time
+
+        Args:
+            kind (int): TERMINAL_WAIT or NODE_WAIT, defaults to both
+            index (int): terminal or node index, defaults to all of the kind
+
+        Returns:
+            (np.ndarray): (waits, 2) array of [time, queue wait]
+        """
+        records = self.records()
+        if kind is None:
+            mask = (records['kind'] == TERMINAL_WAIT) | (records['kind'] == NODE_WAIT)
+        else:
+            mask = records['kind'] == kind
+        if index is not None:
+            mask &= records['index'] == index
+        waits = records[mask]
+        return np.column_stack((waits['time'], waits['value']))
+
+    def state(self):
+        """ Records as plain data, for checkpoints
+
+        Returns:
+            (np.ndarray): history records
+        """
+        return self.records().copy()
+
+    def set_state(self, records):
+        """ Replaces the records by the ones of a saved state
+
+        Args:
+            records (np.ndarray): records returned by state()
+        """
+        if len(records) > len(self.buffer):
+            self.buffer = np.empty(len(records), dtype=history_dtype)
+        self.buffer[:len(records)] = records
+        self.size = len(records)
@@ -0,0 +1,265 @@
+""" Asyncio runner: paced or as-fast-as-possible simulation with external events.
+
+The runner executes the same event loop as Simulator.simulate inside a
+coroutine. It yields to the asyncio loop between events and, when paced,
+sleeps until the wall-clock time of the next event. External events
+(callables applied to the simulator and the model, e.g. breakdown or
+new_demand) are read from an asyncio queue while the simulation runs and
+apply at the current simulation time. Every fired event is published to
+the subscribers; their queues are bounded and drop the oldest update when
+full, so a slow consumer never stalls the simulation.
+
+    runner = RealTimeRunner(Simulator(), model, seconds_per_hour=0.01)
+    updates = runner.subscribe()
+    await asyncio.gather(runner.run(24 * 30), LocalDispatcher(runner, updates).run())
+"""
+import asyncio
+import random
+
+
+def breakdown(train_index, repair_time):
+    """ External event delaying a train and the trains queued behind it,
+    see Model.delay_train
+
+    Args:
+        train_index (int): index of the train
+        repair_time (float): delay (hours)
+
+    Returns:
+        (function): event(simulator, model)
+    """
+    def apply(simulator, model):
+        model.delay_train(train_index, repair_time)
+    return apply
+
+
+def new_demand(terminal_index, origin_index, value):
+    """ External event adding to the demand of a route
+
+    Args:
+        terminal_index (int): terminal holding the demand (its destiny)
+        origin_index (int): origin terminal of the demand
+        value (float): added demand
+
+    Returns:
+        (function): event(simulator, model)
+    """
+    def apply(simulator, model):
+        terminal = model.terminals[terminal_index]
+        demand = terminal.get_demand(model.terminals[origin_index], terminal)
+        if demand is None:
+            raise ValueError(f'no demand from terminal {origin_index} to terminal {terminal_index}')
+        achieved = demand.achieved_demand
+        demand.total_demand += value
+        demand.has_achieved_demand()
+        if achieved and not demand.achieved_demand:
+            model.unmet_demands += 1
+    return apply
+
+
+class Subscription:
+    ''' Bounded stream of state updates, dropping the oldest when full
+    '''
+
+    def __init__(self, maxsize=256):
+        """ Constructs a subscription
+
+        Args:
+            maxsize (int): updates kept for the consumer
+        """
+        self.queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+        self.closed = False
+
+    def publish(self, update):
+        """ Adds an update without waiting
+        """
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(update)
+
+    def close(self):
+        """ Ends the stream once the queued updates are consumed
+        """
+        self.closed = True
+        self.publish(None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        update = await self.queue.get()
+        if update is None:
+            raise StopAsyncIteration
+        return update
+
+
+class RealTimeRunner:
+    ''' Runs a simulation inside asyncio
+    '''
+
+    def __init__(self, simulator, model, seconds_per_hour=None, yield_every=64):
+        """ Constructs a runner
+
+        Args:
+            simulator (:obj:Simulator): simulator
+            model (:obj:Model): model
+            seconds_per_hour (float): wall seconds per simulated hour (3600
+                is real time), None runs as fast as possible
+            yield_every (int): events between yields to the asyncio loop
+                when running as fast as possible
+        """
+        self.simulator = simulator
+        self.model = model
+        self.seconds_per_hour = seconds_per_hour
+        self.yield_every = yield_every
+        self.inbox = asyncio.Queue()
+        self.subscriptions = []
+        self.events = 0
+        self.external_events = 0
+
+    def subscribe(self, maxsize=256):
+        """ Subscribes to the state updates
+
+        Updates are dicts with the simulation time, the callback name, the
+        train index, the callback data indexes after the event, and the
+        number of demands still unmet.
+
+        Args:
+            maxsize (int): updates kept for the consumer
+
+        Returns:
+            (:obj:Subscription): async iterator of updates
+        """
+        subscription = Subscription(maxsize)
+        self.subscriptions.append(subscription)
+        return subscription
+
+    def send(self, event):
+        """ Queues an external event, see breakdown and new_demand
+
+        Args:
+            event (function): event(simulator, model)
+        """
+        self.inbox.put_nowait(event)
+
+    def apply_external(self):
+        """ Applies the queued external events
+        """
+        while not self.inbox.empty():
+            self.inbox.get_nowait()(self.simulator, self.model)
+            self.external_events += 1
+
+    async def wait_until(self, time, start_wall, start_time):
+        """ Sleeps until the wall-clock time of a simulation time, applying
+        external events as they arrive
+
+        Returns:
+            (bool): True if the time was reached, False if an external event
+                arrived first (the calendar may have changed)
+        """
+        loop = asyncio.get_running_loop()
+        delay = start_wall + (time - start_time) * self.seconds_per_hour - loop.time()
+        if delay <= 0:
+            return True
+        try:
+            event = await asyncio.wait_for(self.inbox.get(), delay)
+        except asyncio.TimeoutError:
+            return True
+        event(self.simulator, self.model)
+        self.external_events += 1
+        return False
+
+    async def run(self, t=24 * 3600, resume=False):
+        """ Simulates up to the time horizon, see Simulator.simulate
+
+        The reason the run ended is left in simulator.stop_reason
+        ('horizon', 'empty' or 'cancelled' if the coroutine was cancelled).
+
+        Args:
+            t (float): time horizon
+            resume (bool): continue from the current time and calendar
+        """
+        simulator = self.simulator
+        model = self.model
+        calendar = simulator.calendar
+        if not resume:
+            model.clear()
+            model.starting_events(simulator)
+        loop = asyncio.get_running_loop()
+        start_wall = loop.time()
+        start_time = simulator.time
+        try:
+            while (not calendar.is_empty()) and (simulator.time <= t):
+                self.apply_external()
+                if self.seconds_per_hour is not None:
+                    if not await self.wait_until(calendar.peek()[0], start_wall, start_time):
+                        continue
+                elif self.events % self.yield_every == 0:
+                    await asyncio.sleep(0)
+                    self.apply_external()
+                if calendar.is_empty():
+                    break
+                simulator.time, f, data = calendar.pop()
+                f(simulator, data)
+                self.events += 1
+                if self.subscriptions:
+                    update = {'time': simulator.time, 'event': f.__name__, 'train': data[3],
+                              'origin': data[0], 'destiny': data[1], 'unmet_demands': model.unmet_demands}
+                    for subscription in self.subscriptions:
+                        subscription.publish(update)
+            simulator.stop_reason = 'horizon' if simulator.time > t else 'empty'
+        except asyncio.CancelledError:
+            simulator.stop_reason = 'cancelled'
+            raise
+        finally:
+            if model.trace is not None:
+                model.trace.flush()
+            for subscription in self.subscriptions:
+                subscription.close()
+
+
+class LocalDispatcher:
+    ''' In-process stand-in for an external dispatcher
+
+    Follows the state updates and answers some of them with external
+    events: a train leaving a terminal breaks down with a given
+    probability, and a demand grows whenever it is met.
+    '''
+
+    def __init__(self, runner, updates, breakdown_probability=0.05, repair_time=6, extra_demand=0, seed=0):
+        """ Constructs the dispatcher
+
+        Args:
+            runner (:obj:RealTimeRunner): runner receiving the external events
+            updates (:obj:Subscription): state updates of the runner
+            breakdown_probability (float): breakdown chance of a departing train
+            repair_time (float): repair time (hours)
+            extra_demand (float): demand added to a route once it is met
+            seed (int): random seed
+        """
+        self.runner = runner
+        self.updates = updates
+        self.breakdown_probability = breakdown_probability
+        self.repair_time = repair_time
+        self.extra_demand = extra_demand
+        self.rng = random.Random(seed)
+        self.sent = 0
+
+    async def run(self):
+        """ Consumes the updates until the simulation ends
+        """
+        unmet = None
+        async for update in self.updates:
+            if update['event'] == 'from_terminal2port' and self.rng.random() < self.breakdown_probability:
+                self.runner.send(breakdown(update['train'], self.repair_time))
+                self.sent += 1
+            if self.extra_demand and unmet is not None and update['unmet_demands'] < unmet:
+                for terminal_index, terminal in enumerate(self.runner.model.terminals):
+                    for demand in terminal.demands:
+                        if demand.achieved_demand and demand.destiny is terminal:
+                            origin_index = self.runner.model.topology.terminal_index[demand.origin]
+                            self.runner.send(new_demand(terminal_index, origin_index, self.extra_demand))
+                            self.sent += 1
+            unmet = update['unmet_demands']
@@ -0,0 +1,194 @@
+""" Monte Carlo replications of a railroad model on a process pool.
+"""
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+
+import numpy as np
+
+from .build_model import Model
+from .discrete_simulator import Simulator
+
+# pickled (nodes, terminals, trains) of the worker process
+worker_topology = None
+
+
+def set_worker_topology(topology):
+    """ Stores the pickled topology in the worker process
+
+    Args:
+        topology (bytes): pickled (nodes, terminals, trains)
+    """
+    global worker_topology
+    worker_topology = topology
+
+
+def perturb(terminals, trains, rng, spread=0.2):
+    """ Randomizes loading/unloading times and train speeds in place
+
+    Times are drawn uniformly within +-spread of their nominal value and
+    rounded to whole hours (at least 1). Speeds are drawn uniformly within
+    +-spread of their nominal value.
+
+    Args:
+        terminals (list): list of terminals
+        trains (list): list of trains
+        rng (:obj:numpy.random.Generator): random generator
+        spread (float): relative half-width of the uniform perturbation
+    """
+    def draw_time(value):
+        if value is None:
+            return None
+        return max(1, int(round(value * rng.uniform(1 - spread, 1 + spread))))
+
+    for terminal in terminals:
+        terminal.loading_time = draw_time(terminal.loading_time)
+        terminal.unloading_time = draw_time(terminal.unloading_time)
+    for train in trains:
+        train.speed_loaded *= rng.uniform(1 - spread, 1 + spread)
+        train.speed_empty *= rng.uniform(1 - spread, 1 + spread)
+
+
+def build_replica(seed, spread=0.2, topology=None):
+    """ Fresh copy of the topology, perturbed by the seed of a replication
+
+    Args:
+        seed (int): random seed of the replication
+        spread (float): relative perturbation, see perturb
+        topology (bytes): pickled (nodes, terminals, trains), defaults to
+            the worker topology
+
+    Returns:
+        (tuple): nodes, terminals and trains
+    """
+    nodes, terminals, trains = pickle.loads(topology if topology is not None else worker_topology)
+    if spread:
+        perturb(terminals, trains, np.random.default_rng(seed), spread)
+    return nodes, terminals, trains
+
+
+def metrics(productivity, queue_time):
+    """ Replication metrics of a productivity log
+
+    Returns:
+        productivity (float): final numerical productivity (nan if nothing was loaded)
+        queue_time (float): total queue time
+    """
+    return (productivity[-1] if len(productivity) else np.nan), queue_time
+
+
+def run_replication(seed, horizon, spread=0.2, calendar='heap', topology=None, cache=None, key=None):
+    """ Simulates one replication on a fresh copy of the topology
+
+    Args:
+        seed (int): random seed of the replication
+        horizon (float): simulation time horizon
+        spread (float): relative perturbation, see perturb
+        calendar (str): event calendar backend
+        topology (bytes): pickled (nodes, terminals, trains), defaults to
+            the worker topology
+        cache (:obj:ResultsCache): cache storing the results, None to skip
+        key (str): cache key of the replication
+
+    Returns:
+        productivity (float): final numerical productivity (nan if nothing was loaded)
+        queue_time (float): total queue time
+    """
+    model = Model(*build_replica(seed, spread, topology))
+    model.verbose = False
+    if cache is not None:
+        model.trace = cache.runner_trace()
+    simulator = Simulator(calendar=calendar)
+    simulator.simulate(model, horizon)
+    if cache is not None:
+        cache.put(key, simulator, model)
+    productivity, _, _ = model.evaluate_produtivity()
+    return metrics(productivity, model.queue_time())
+
+
+def summarize(samples, confidence=0.95, quantiles=(0.05, 0.5, 0.95)):
+    """ Summary statistics of replication samples
+
+    Args:
+        samples (np.ndarray): samples of a metric
+        confidence (float): confidence level of the mean interval
+        quantiles (tuple): quantile levels
+
+    Returns:
+        (dict): mean, std, ci (lower, upper) and quantiles as numpy values
+    """
+    samples = np.asarray(samples, dtype=float)
+    samples = samples[~np.isnan(samples)]
+    mean = samples.mean() if len(samples) else np.nan
+    std = samples.std(ddof=1) if len(samples) > 1 else np.nan
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    half_width = z * std / np.sqrt(len(samples)) if len(samples) > 1 else np.nan
+    return {
+        'mean': mean,
+        'std': std,
+        'ci': np.array([mean - half_width, mean + half_width]),
+        'quantiles': np.quantile(samples, quantiles) if len(samples) else np.full(len(quantiles), np.nan),
+    }
+
+
+def replicate(nodes, terminals, trains, horizon, replications=100, seeds=None, spread=0.2,
+              workers=None, calendar='heap', confidence=0.95, quantiles=(0.05, 0.5, 0.95), cache=None):
+    """ Runs independent replications of a model in parallel
+
+    The topology is pickled once and shipped to every worker, which
+    unpickles a fresh copy per replication instead of rebuilding it.
+    Replications found in the results cache are not simulated again.
+
+    Args:
+        nodes (list): list of nodes
+        terminals (list): list of terminals
+        trains (list): list of trains
+        horizon (float): simulation time horizon
+        replications (int): number of replications (ignored if seeds is given)
+        seeds (list): random seeds, one per replication
+        spread (float): relative perturbation of times and speeds, see perturb
+        workers (int): number of worker processes (defaults to all cores, 1 runs in process)
+        calendar (str): event calendar backend
+        confidence (float): confidence level of the mean interval
+        quantiles (tuple): quantile levels
+        cache (:obj:ResultsCache): results cache, None to simulate every replication
+
+    Returns:
+        (dict): seeds, per replication productivity and queue_time arrays,
+            and their summaries (see summarize)
+    """
+    seeds = np.arange(replications) if seeds is None else np.asarray(seeds)
+    topology = pickle.dumps((nodes, terminals, trains))
+    workers = workers or os.cpu_count()
+    results = [None for _ in seeds]
+    keys = [None for _ in seeds]
+    if cache is not None:
+        for index, seed in enumerate(seeds):
+            keys[index] = cache.runner_key(*build_replica(int(seed), spread, topology), horizon)
+            entry = cache.get(keys[index])
+            if entry is not None:
+                results[index] = metrics(entry['productivity'], entry['queue_time'].item())
+    missing = [index for index, result in enumerate(results) if result is None]
+    shipped = topology if workers == 1 else None  # workers hold their own copy
+    args = [(int(seeds[index]), horizon, spread, calendar, shipped, cache, keys[index]) for index in missing]
+
+    if workers == 1 or not args:
+        computed = [run_replication(*arg) for arg in args]
+    else:
+        with ProcessPoolExecutor(workers, initializer=set_worker_topology, initargs=(topology,)) as pool:
+            computed = list(pool.map(run_replication, *zip(*args),
+                                     chunksize=max(1, len(args) // (4 * workers))))
+    for index, result in zip(missing, computed):
+        results[index] = result
+
+    productivity, queue_time = (np.array(metric, dtype=float) for metric in zip(*results))
+    return {
+        'seeds': seeds,
+        'productivity': productivity,
+        'queue_time': queue_time,
+        'summary': {
+            'productivity': summarize(productivity, confidence, quantiles),
+            'queue_time': summarize(queue_time, confidence, quantiles),
+        },
+    }
@@ -0,0 +1,124 @@
+""" Finite-capacity resources: terminal berths and track segments.
+"""
+import heapq
+import itertools
+
+
+class Resource:
+    ''' Resource with `capacity` identical units (berths, tracks).
+
+    Units are kept in a heap of the times they are free again, so a
+    request with a known duration is served by the unit free first in
+    O(log k). Holders without a known duration use acquire/release, and
+    wait in a FIFO heap while every unit is busy.
+    '''
+
+    def __init__(self, capacity=1):
+        """ Constructs a resource
+
+        Args:
+            capacity (int): number of units
+        """
+        if capacity < 1:
+            raise ValueError('a resource needs at least one unit')
+        self.capacity = capacity
+        self.free_times = [0] * capacity
+        self.in_use = 0
+        self.waiting = []
+        self.counter = itertools.count()
+
+        self.requests = 0
+        self.total_wait = 0
+        self.max_wait = 0
+        self.busy_time = 0
+
+    def next_free(self):
+        """ Time the first unit is free again
+
+        Returns:
+            (float): free time
+        """
+        return self.free_times[0]
+
+    def request(self, time, duration):
+        """ Occupies the first free unit for a duration
+
+        Args:
+            time (float): request time
+            duration (float): occupation time
+
+        Returns:
+            (float): start time (request time plus the wait)
+        """
+        start = max(time, self.free_times[0])
+        heapq.heapreplace(self.free_times, start + duration)
+        self.record(start - time, duration)
+        return start
+
+    def replace(self, time):
+        """ Sets the free time of the first free unit (e.g. a forecast)
+
+        Args:
+            time (float): new free time of the unit
+        """
+        heapq.heapreplace(self.free_times, time)
+
+    def acquire(self, time, holder):
+        """ Requests a unit for a holder until it is released
+
+        Args:
+            time (float): request time
+            holder: object requesting the unit
+
+        Returns:
+            (bool): True if a unit was granted, False if the holder waits
+        """
+        if self.in_use < self.capacity:
+            self.in_use += 1
+            self.record(0, 0)
+            return True
+        heapq.heappush(self.waiting, (time, next(self.counter), holder))
+        return False
+
+    def release(self, time, held=0):
+        """ Releases a unit, handing it to the first waiting holder
+
+        Args:
+            time (float): release time
+            held (float): time the unit was held
+
+        Returns:
+            (tuple): (holder, wait) granted the unit, or None
+        """
+        self.busy_time += held
+        if self.waiting:
+            requested, _, holder = heapq.heappop(self.waiting)
+            self.record(time - requested, 0)
+            return holder, time - requested
+        self.in_use -= 1
+        return None
+
+    def record(self, wait, duration):
+        """ Updates the waiting and occupancy statistics
+        """
+        self.requests += 1
+        self.total_wait += wait
+        if wait > self.max_wait:
+            self.max_wait = wait
+        self.busy_time += duration
+
+    def utilization(self, horizon):
+        """ Fraction of the unit time that was busy
+
+        Args:
+            horizon (float): elapsed time
+
+        Returns:
+            (float): busy time over capacity * horizon
+        """
+        return self.busy_time / (self.capacity * horizon) if horizon > 0 else 0
+
+    def mean_wait(self):
+        """ Mean waiting time per request
+        """
+        return self.total_wait / self.requests if self.requests else 0
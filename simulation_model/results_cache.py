@@ -0,0 +1,344 @@
+""" Persistent cache of simulation results, keyed by scenario definition.
+
+The key hashes a canonical form of the scenario (terminals, yards,
+links, demands and trains, by index), the horizon, the run options and
+the code version (a digest of the package sources), so any change to the
+model code invalidates every entry. An entry is a compressed NPZ file
+with the productivity log, the queue time, the final demand values and
+the trace when the run recorded one. The kind of trace sink is part of
+the key, since it decides what a cached run restores.
+
+The cache is bounded in size: a hit refreshes the modification time of
+its entry, and the least recently used entries are removed once the
+total size goes over the bound. Entries are written to a temporary file
+and renamed, so worker processes can share a cache directory.
+
+    cache = ResultsCache('.results', max_bytes=1 << 30)
+    cache.simulate(Simulator(), model, horizon)   # simulates once, then loads
+"""
+import hashlib
+import json
+import os
+import tempfile
+import zipfile
+
+import numpy as np
+
+from . import event_trace as et
+
+# code version of the package, computed on first use
+source_digest = None
+
+
+def code_version():
+    """ Digest of the package sources
+
+    Returns:
+        (str): sha256 hex digest of every module of the package
+    """
+    global source_digest
+    if source_digest is None:
+        digest = hashlib.sha256()
+        directory = os.path.dirname(os.path.abspath(__file__))
+        for name in sorted(os.listdir(directory)):
+            if name.endswith('.py'):
+                with open(os.path.join(directory, name), 'rb') as file:
+                    digest.update(name.encode())
+                    digest.update(file.read())
+        source_digest = digest.hexdigest()
+    return source_digest
+
+
+def number(value):
+    """ Canonical number: ints and floats of equal value hash alike
+    """
+    return None if value is None else float(value)
+
+
+def definition(nodes, terminals, trains):
+    """ Canonical form of a scenario, with references replaced by indexes
+
+    Names are left out, they do not change the results.
+
+    Args:
+        nodes (list): list of nodes
+        terminals (list): list of terminals
+        trains (list): list of trains
+
+    Returns:
+        (dict): plain data definition
+    """
+    node_index = {}
+    for index, node in enumerate(nodes):
+        node_index.setdefault(node, index)
+    terminal_index = {}
+    for index, terminal in enumerate(terminals):
+        terminal_index.setdefault(terminal, index)
+
+    def place(item):
+        if item is None:
+            return None
+        if item in node_index:
+            return ['node', node_index[item]]
+        return ['terminal', terminal_index[item]]
+
+    return {
+        'nodes': [{
+            'links': [[node_index[dist_map.destiny], number(dist_map.distance), number(dist_map.tracks)]
+                      for dist_map in node.distance_map],
+            'terminals': [terminal_index[terminal] for terminal in getattr(node, 'related_terminals', [])],
+        } for node in nodes],
+        'terminals': [{
+            'loading_time': number(terminal.loading_time),
+            'unloading_time': number(terminal.unloading_time),
+            'berths': number(terminal.berths),
+            'nodes': [node_index[node] for node in getattr(terminal, 'related_nodes', [])],
+            'demands': [[terminal_index[demand.origin], terminal_index[demand.destiny],
+                         number(demand.total_demand), number(demand.current_demand)]
+                        for demand in terminal.demands],
+        } for terminal in terminals],
+        'trains': [{
+            'id': number(train.train_id),
+            'load': number(train.load),
+            'is_loaded': bool(train.is_loaded),
+            'speeds': [number(train.speed_loaded), number(train.speed_empty)],
+            'origin': place(train.origin),
+            'destiny': place(train.destiny),
+            'demand': [place(terminal) for terminal in train.current_demand],
+        } for train in trains],
+    }
+
+
+def sink(trace):
+    """ Kind of trace sink of a run, part of its key
+
+    Args:
+        trace: trace sink of the model, None if not tracing
+
+    Returns:
+        (list): sink class name, and capacity of a ring trace; None if not tracing
+    """
+    if trace is None:
+        return None
+    if isinstance(trace, et.ring_trace):
+        return [type(trace).__name__, len(trace.buffer)]
+    return [type(trace).__name__]
+
+
+def record(simulator, model):
+    """ Results of a finished run as arrays
+
+    Args:
+        simulator (:obj:Simulator): simulator of the run
+        model (:obj:Model): simulated model
+
+    Returns:
+        (dict): arrays of an entry
+    """
+    productivity, production, time = model.evaluate_produtivity()
+    arrays = {
+        'productivity': productivity,
+        'production': production,
+        'time': time,
+        'queue_time': np.array(model.queue_time()),
+        'demands': np.array([demand.current_demand for terminal in model.terminals for demand in terminal.demands]),
+        'end_time': np.array(simulator.time),
+        'stop_reason': np.array(simulator.stop_reason or ''),
+    }
+    state = model.trace.state() if model.trace is not None else None
+    if state is not None:
+        arrays['trace'] = state['records']
+        arrays['trace_count'] = np.array(state['count'])
+    return arrays
+
+
+class ResultsCache:
+    ''' Size-bounded directory of simulation results
+    '''
+
+    def __init__(self, directory, max_bytes=1 << 30, trace=True):
+        """ Constructs the cache, creating its directory
+
+        Args:
+            directory (str): cache directory
+            max_bytes (int): total size of the entries kept
+            trace (bool): runners record the trace of the runs they cache
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.trace = trace
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, nodes, terminals, trains, horizon, options=None):
+        """ Key of a run
+
+        Args:
+            nodes (list): list of nodes
+            terminals (list): list of terminals
+            trains (list): list of trains, as they start the run
+            horizon (float): simulation horizon
+            options (dict): plain data describing the other run options
+                that change the results (e.g. termination conditions)
+
+        Returns:
+            (str): hex digest
+        """
+        text = json.dumps([code_version(), definition(nodes, terminals, trains), number(horizon), options or {}],
+                          sort_keys=True, separators=(',', ':'), default=number)
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def runner_trace(self):
+        """ Trace sink of the runs stored by runners (see replication.replicate)
+
+        Returns:
+            (:obj:array_trace): new sink, None if the cache does not trace
+        """
+        return et.array_trace() if self.trace else None
+
+    def runner_key(self, nodes, terminals, trains, horizon):
+        """ Key of a run stored by a runner, traced by runner_trace
+        """
+        return self.key(nodes, terminals, trains, horizon, {'trace': ['array_trace'] if self.trace else None})
+
+    def path(self, key):
+        return os.path.join(self.directory, f'{key}.npz')
+
+    def get(self, key):
+        """ Entry of a key, refreshing its recency
+
+        Returns:
+            (dict): arrays of the entry (see record), None if not cached
+        """
+        path = self.path(key)
+        try:
+            with np.load(path) as data:
+                arrays = {name: data[name] for name in data.files}
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, zipfile.BadZipFile):
+            self.remove(path)  # truncated or corrupted entry
+            return None
+        return arrays
+
+    def __contains__(self, key):
+        return os.path.exists(self.path(key))
+
+    def put(self, key, simulator, model):
+        """ Stores the results of a finished run, then evicts the least recently used entries
+
+        Args:
+            key (str): key of the run, computed before it started
+            simulator (:obj:Simulator): simulator of the run
+            model (:obj:Model): simulated model
+        """
+        file = tempfile.NamedTemporaryFile(dir=self.directory, suffix='.tmp', delete=False)
+        try:
+            with file:
+                np.savez_compressed(file, **record(simulator, model))
+            os.replace(file.name, self.path(key))
+        except BaseException:
+            self.remove(file.name)
+            raise
+        self.evict()
+
+    @staticmethod
+    def remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def entries(self):
+        """ Entries, least recently used first
+
+        Returns:
+            (list): (modification time, size, path) tuples
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.npz'):
+                try:
+                    status = os.stat(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((status.st_mtime_ns, status.st_size, os.path.join(self.directory, name)))
+        return sorted(entries)
+
+    def size(self):
+        """ Total size of the entries (bytes)
+        """
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """ Removes the least recently used entries until the cache fits its bound
+        """
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self.remove(path)
+            total -= size
+
+    def clear(self):
+        """ Removes every entry
+        """
+        for _, _, path in self.entries():
+            self.remove(path)
+
+    def simulate(self, simulator, model, t=24 * 3600, until=None, options=None):
+        """ Simulator.simulate through the cache
+
+        On a hit the model gets the cached productivity log, queue time and
+        demand values, its trace sink the cached trace state (a text trace
+        prints nothing), and the simulator gets the end time and stop
+        reason; queue registers, train states and the calendar are not
+        restored. Models with a dispatch policy, random times or a queue
+        history are simulated without the cache.
+
+        Args:
+            simulator (:obj:Simulator): simulator
+            model (:obj:Model): model, before the run
+            t (float): time horizon
+            until: termination conditions, see Simulator.simulate
+            options (dict): plain data description of until, part of the key
+
+        Returns:
+            (bool): True if the results came from the cache
+        """
+        if model.policy is not None or model.randomness is not None or model.history is not None:
+            simulator.simulate(model, t, until=until)
+            return False
+        options = dict(options or {})
+        options['trace'] = sink(model.trace)
+        key = self.key(model.nodes, model.terminals, model.trains, t, options)
+        arrays = self.get(key)
+        if arrays is None:
+            simulator.simulate(model, t, until=until)
+            self.put(key, simulator, model)
+            return False
+        self.restore(simulator, model, arrays)
+        return True
+
+    @staticmethod
+    def restore(simulator, model, arrays):
+        """ Sets the results of an entry into a simulator and a model
+        """
+        model.clear()
+        stats = model.stats
+        start = stats.deliveries  # the empty deliveries heading the log
+        for time, load in zip(arrays['time'][start:].tolist(), arrays['production'][start:].tolist()):
+            stats.record_delivery(time, load)
+        queue_time = arrays['queue_time'].item()
+        model.total_queue_time = queue_time
+        stats.total_queue_time = queue_time
+        demands = [demand for terminal in model.terminals for demand in terminal.demands]
+        for demand, value in zip(demands, arrays['demands'].tolist()):
+            demand.current_demand = value
+            demand.has_achieved_demand()
+        model.unmet_demands = model.count_unmet_demands()
+        if model.trace is not None and 'trace' in arrays:
+            model.trace.set_state({'records': arrays['trace'], 'count': arrays['trace_count'].item()})
+        simulator.time = arrays['end_time'].item()
+        simulator.stop_reason = arrays['stop_reason'].item() or None
@@ -0,0 +1,171 @@
+""" All-pairs shortest paths and next-hop tables between yards.
+"""
+import hashlib
+import heapq
+import os
+
+import numpy as np
+
+
+def topology_hash(topology):
+    """ Hash of the yard graph of a compiled topology
+
+    Args:
+        topology (:obj:Topology): compiled topology
+
+    Returns:
+        (str): hex digest
+    """
+    digest = hashlib.sha256()
+    for array in (topology.adjacency_start, topology.adjacency, topology.distance):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+
+def distance_matrix(topology):
+    """ Direct distances between yards (inf if not linked, 0 on the diagonal)
+
+    Args:
+        topology (:obj:Topology): compiled topology
+
+    Returns:
+        distance (np.ndarray): (nodes, nodes) distances
+        next_hop (np.ndarray): (nodes, nodes) next yard, -1 if unreachable
+    """
+    size = len(topology.adjacency_start) - 1
+    distance = np.full((size, size), np.inf)
+    origins = np.repeat(np.arange(size), np.diff(topology.adjacency_start))
+    np.minimum.at(distance, (origins, topology.adjacency), topology.distance)
+    np.fill_diagonal(distance, 0)
+    next_hop = np.where(np.isfinite(distance), np.arange(size)[None, :], -1)
+    return distance, next_hop
+
+
+def floyd_warshall(topology):
+    """ All-pairs shortest paths, vectorized over the (nodes, nodes) matrix
+
+    Args:
+        topology (:obj:Topology): compiled topology
+
+    Returns:
+        distance (np.ndarray): (nodes, nodes) shortest distances
+        next_hop (np.ndarray): (nodes, nodes) first yard of the shortest path
+    """
+    distance, next_hop = distance_matrix(topology)
+    for k in range(len(distance)):
+        candidate = distance[:, k, None] + distance[None, k, :]
+        shorter = candidate < distance
+        distance = np.where(shorter, candidate, distance)
+        next_hop = np.where(shorter, next_hop[:, k, None], next_hop)
+    return distance, next_hop
+
+
+def dijkstra(topology):
+    """ All-pairs shortest paths, one Dijkstra search per source yard
+
+    Args:
+        topology (:obj:Topology): compiled topology
+
+    Returns:
+        distance (np.ndarray): (nodes, nodes) shortest distances
+        next_hop (np.ndarray): (nodes, nodes) first yard of the shortest path
+    """
+    size = len(topology.adjacency_start) - 1
+    start = topology.adjacency_start.tolist()
+    adjacency = topology.adjacency.tolist()
+    weights = topology.distance.tolist()
+    distance = np.full((size, size), np.inf)
+    next_hop = np.full((size, size), -1, dtype=np.int64)
+
+    for source in range(size):
+        best = [np.inf] * size
+        first = [-1] * size
+        best[source] = 0
+        first[source] = source
+        heap = [(0, source)]
+        while heap:
+            dist, node = heapq.heappop(heap)
+            if dist > best[node]:
+                continue
+            for edge in range(start[node], start[node + 1]):
+                neighbour = adjacency[edge]
+                candidate = dist + weights[edge]
+                if candidate < best[neighbour]:
+                    best[neighbour] = candidate
+                    first[neighbour] = neighbour if node == source else first[node]
+                    heapq.heappush(heap, (candidate, neighbour))
+        distance[source] = best
+        next_hop[source] = first
+    return distance, next_hop
+
+
+class RoutingTable:
+    ''' Shortest distances and next hops between every pair of yards.
+    '''
+
+    def __init__(self, distance, next_hop):
+        """ Constructs a routing table
+
+        Args:
+            distance (np.ndarray): (nodes, nodes) shortest distances
+            next_hop (np.ndarray): (nodes, nodes) first yard of the shortest path
+        """
+        self.distance = distance
+        self.next_hop = next_hop
+
+    def transit_times(self, speed):
+        """ Shortest transit times at a speed
+
+        Args:
+            speed (float): train speed
+
+        Returns:
+            (np.ndarray): (nodes, nodes) transit times
+        """
+        return self.distance / speed
+
+    def path(self, origin, destiny):
+        """ Yards of the shortest path
+
+        Args:
+            origin (int): origin yard id
+            destiny (int): destiny yard id
+
+        Returns:
+            (list): yard ids from origin to destiny, empty if unreachable
+        """
+        if self.next_hop[origin, destiny] < 0:
+            return []
+        path = [origin]
+        while path[-1] != destiny:
+            path.append(int(self.next_hop[path[-1], destiny]))
+        return path
+
+
+def build_routing(topology, method='auto', cache_dir=None):
+    """ Builds the routing table of a topology, loading it from the cache if present
+
+    Args:
+        topology (:obj:Topology): compiled topology
+        method (str): 'floyd_warshall', 'dijkstra' or 'auto' (Floyd-Warshall
+            up to 500 yards, Dijkstra above)
+        cache_dir (str): directory of the cached tables, None disables caching
+
+    Returns:
+        (:obj:RoutingTable): routing table
+    """
+    path = None
+    if cache_dir is not None:
+        path = os.path.join(cache_dir, f'routing-{topology_hash(topology)}.npz')
+        if os.path.exists(path):
+            with np.load(path) as cached:
+                return RoutingTable(cached['distance'], cached['next_hop'])
+
+    if method == 'auto':
+        method = 'floyd_warshall' if len(topology.adjacency_start) - 1 <= 500 else 'dijkstra'
+    distance, next_hop = {'floyd_warshall': floyd_warshall, 'dijkstra': dijkstra}[method](topology)
+
+    if path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        np.savez_compressed(path, distance=distance, next_hop=next_hop)
+    return RoutingTable(distance, next_hop)
@@ -0,0 +1,396 @@
+""" Scenario files (JSON, YAML or TOML) describing a railroad model.
+
+A scenario lists the terminals, the yards (nodes) with their links, the
+demands between terminals and the train fleets:
+
+    {
+        "name": "example",
+        "terminals": [{"id": 0, "loading_time": 7, "unloading_time": null, "berths": 1}],
+        "nodes": [{"id": 0, "name": "Patio A", "terminals": [0]}],
+        "links": [{"origin": 0, "destiny": 1, "distance": 800, "tracks": null, "both_ways": true}],
+        "demands": [{"origin": 0, "destiny": 1, "value": 14000}],
+        "trains": [{"count": 2, "load": 1e3, "speed_loaded": 40, "speed_empty": 47,
+                    "origin": 1, "demand_origin": 0}],
+        "simulation": {"horizon": 360}
+    }
+
+Terminals, nodes and demands refer to each other by id. The related
+nodes of a yard are the destinies of its links, in order, and the related
+nodes of a terminal are the yards listing it unless given as "nodes".
+The loaded scenario is compiled to flat arrays, which are cached in a
+binary file keyed by the hash of the scenario file.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from .build_model import Model
+from .demand import Demand
+from .node import Node
+from .terminal import Terminal
+from .train import Train
+
+SCENARIO_FORMAT = 1
+
+# train fields and their defaults
+TRAIN_DEFAULTS = {'count': 1, 'load': 0, 'demand_origin': None, 'demand_destiny': None}
+
+
+def read_config(path):
+    """ Reads a scenario file, the format is given by its extension
+
+    Args:
+        path (str): .json, .yaml, .yml or .toml file
+
+    Returns:
+        (dict): scenario configuration
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.json':
+        with open(path) as file:
+            return json.load(file)
+    if extension in ('.yaml', '.yml'):
+        try:
+            import yaml
+        except ImportError as error:
+            raise ImportError('YAML scenarios require PyYAML (pip install pyyaml)') from error
+        with open(path) as file:
+            return yaml.safe_load(file)
+    if extension == '.toml':
+        try:
+            import tomllib
+        except ImportError as error:
+            raise ImportError('TOML scenarios require Python 3.11 or newer') from error
+        with open(path, 'rb') as file:
+            return tomllib.load(file)
+    raise ValueError(f'unknown scenario format {extension!r}')
+
+
+def validate(config):
+    """ Checks a scenario configuration
+
+    Args:
+        config (dict): scenario configuration
+
+    Raises:
+        ValueError: listing every problem found
+    """
+    errors = []
+
+    def is_integer(value):
+        return isinstance(value, int) and not isinstance(value, bool)
+
+    def check_ids(section):
+        ids = [item.get('id') for item in config.get(section, [])]
+        if None in ids:
+            errors.append(f'{section}: every entry needs an id')
+        for index, value in enumerate(ids):
+            if value is not None and not is_integer(value):
+                errors.append(f'{section} {index} id: expected an integer, got {value!r}')
+        ids = [value for value in ids if is_integer(value)]
+        if len(set(ids)) != len(ids):
+            errors.append(f'{section}: duplicated ids')
+        return set(ids)
+
+    def check_reference(where, value, ids, kind):
+        if not is_integer(value) or value not in ids:
+            errors.append(f'{where}: unknown {kind} {value!r}')
+
+    def check_positive(where, value, optional=False, integer=False):
+        if value is None and optional:
+            return
+        if integer and (not is_integer(value) or value <= 0):
+            errors.append(f'{where}: expected a positive integer, got {value!r}')
+        elif not isinstance(value, (int, float)) or isinstance(value, bool) or value <= 0:
+            errors.append(f'{where}: expected a positive number, got {value!r}')
+
+    def check_non_negative(where, value):
+        if not isinstance(value, (int, float)) or isinstance(value, bool) or not value >= 0:
+            errors.append(f'{where}: expected a non-negative number, got {value!r}')
+
+    def check_list(where, value, mapping=False):
+        if not isinstance(value, list):
+            errors.append(f'{where}: expected a list, got {value!r}')
+        elif mapping:
+            for index, item in enumerate(value):
+                if not isinstance(item, dict):
+                    errors.append(f'{where} {index}: expected a mapping, got {item!r}')
+
+    if not isinstance(config, dict):
+        raise ValueError('a scenario must be a mapping')
+    # shape first: the checks below index the entries of every section
+    for section in ('terminals', 'nodes', 'links', 'demands', 'trains'):
+        check_list(section, config.get(section, []), mapping=True)
+    if not isinstance(config.get('simulation', {}), dict):
+        errors.append(f'simulation: expected a mapping, got {config["simulation"]!r}')
+    if not errors:
+        for terminal in config.get('terminals', []):
+            if 'nodes' in terminal:
+                check_list(f'terminal {terminal.get("id")!r} nodes', terminal['nodes'])
+        for node in config.get('nodes', []):
+            check_list(f'node {node.get("id")!r} terminals', node.get('terminals', []))
+    if errors:
+        raise ValueError('invalid scenario:\n  ' + '\n  '.join(errors))
+
+    for section in ('terminals', 'nodes', 'trains'):
+        if not config.get(section):
+            errors.append(f'{section}: at least one entry is required')
+    terminal_ids = check_ids('terminals')
+    node_ids = check_ids('nodes')
+
+    for terminal in config.get('terminals', []):
+        where = f'terminal {terminal.get("id")!r}'
+        check_positive(f'{where} loading_time', terminal.get('loading_time'), optional=True)
+        check_positive(f'{where} unloading_time', terminal.get('unloading_time'), optional=True)
+        check_positive(f'{where} berths', terminal.get('berths', 1), integer=True)
+        for node in terminal.get('nodes', []):
+            check_reference(where, node, node_ids, 'node')
+    for node in config.get('nodes', []):
+        for terminal in node.get('terminals', []):
+            check_reference(f'node {node.get("id")!r}', terminal, terminal_ids, 'terminal')
+    for index, link in enumerate(config.get('links', [])):
+        where = f'link {index}'
+        check_reference(where, link.get('origin'), node_ids, 'node')
+        check_reference(where, link.get('destiny'), node_ids, 'node')
+        check_positive(f'{where} distance', link.get('distance'))
+        check_positive(f'{where} tracks', link.get('tracks'), optional=True, integer=True)
+    for index, demand in enumerate(config.get('demands', [])):
+        where = f'demand {index}'
+        check_reference(where, demand.get('origin'), terminal_ids, 'terminal')
+        check_reference(where, demand.get('destiny'), terminal_ids, 'terminal')
+        check_positive(f'{where} value', demand.get('value'))
+    for index, train in enumerate(config.get('trains', [])):
+        where = f'train {index}'
+        check_positive(f'{where} count', train.get('count', 1), integer=True)
+        check_non_negative(f'{where} load', train.get('load', TRAIN_DEFAULTS['load']))
+        check_positive(f'{where} speed_loaded', train.get('speed_loaded'))
+        check_positive(f'{where} speed_empty', train.get('speed_empty'))
+        check_reference(where, train.get('origin'), node_ids, 'node')
+        for key in ('demand_origin', 'demand_destiny'):
+            if train.get(key) is not None:
+                check_reference(where, train[key], terminal_ids, 'terminal')
+
+    if errors:
+        raise ValueError('invalid scenario:\n  ' + '\n  '.join(errors))
+
+
+def csr(lists):
+    """ Flattens a list of index lists into (start, values) arrays
+    """
+    start = np.zeros(len(lists) + 1, dtype=np.int64)
+    start[1:] = np.cumsum([len(values) for values in lists])
+    values = np.fromiter((value for values in lists for value in values), dtype=np.int64, count=start[-1])
+    return start, values
+
+
+def compile_config(config):
+    """ Compiles a validated configuration into flat arrays
+
+    Args:
+        config (dict): scenario configuration
+
+    Returns:
+        (dict): arrays of the scenario
+    """
+    terminals = config['terminals']
+    nodes = config['nodes']
+    links = config.get('links', [])
+    terminal_index = {terminal['id']: index for index, terminal in enumerate(terminals)}
+    node_index = {node['id']: index for index, node in enumerate(nodes)}
+
+    node_terminals = [[terminal_index[terminal] for terminal in node.get('terminals', [])] for node in nodes]
+    terminal_nodes = [[] for _ in terminals]
+    for index, related in enumerate(node_terminals):
+        for terminal in related:
+            terminal_nodes[terminal].append(index)
+    for index, terminal in enumerate(terminals):
+        if 'nodes' in terminal:
+            terminal_nodes[index] = [node_index[node] for node in terminal['nodes']]
+
+    link_list = []
+    for link in links:
+        origin, destiny = node_index[link['origin']], node_index[link['destiny']]
+        tracks = -1 if link.get('tracks') is None else link['tracks']
+        link_list.append((origin, destiny, link['distance'], tracks))
+        if link.get('both_ways', True):
+            link_list.append((destiny, origin, link['distance'], tracks))
+    link_list.sort(key=lambda link: link[0])  # stable: keeps the link order of each yard
+    link_array = np.array(link_list, dtype=np.float64).reshape(-1, 4)
+
+    fleets = [dict(TRAIN_DEFAULTS, **train) for train in config['trains']]
+    counts = [int(fleet['count']) for fleet in fleets]
+
+    def repeat(key, convert=lambda value: value, missing=-1):
+        return np.repeat([missing if fleet[key] is None else convert(fleet[key]) for fleet in fleets], counts)
+
+    def time(value):
+        return np.nan if value is None else value
+
+    return {
+        'format': np.array(SCENARIO_FORMAT),
+        'name': np.array(str(config.get('name', ''))),
+        'simulation': np.array(json.dumps(config.get('simulation', {}))),
+        'terminal_id': np.array([terminal['id'] for terminal in terminals], dtype=np.int64),
+        'loading_time': np.array([time(terminal.get('loading_time')) for terminal in terminals], dtype=np.float64),
+        'unloading_time': np.array([time(terminal.get('unloading_time')) for terminal in terminals], dtype=np.float64),
+        'berths': np.array([terminal.get('berths', 1) for terminal in terminals], dtype=np.int64),
+        'terminal_nodes_start': csr(terminal_nodes)[0],
+        'terminal_nodes': csr(terminal_nodes)[1],
+        'node_id': np.array([node['id'] for node in nodes], dtype=np.int64),
+        'node_name': np.array([str(node.get('name', node['id'])) for node in nodes]),
+        'node_terminals_start': csr(node_terminals)[0],
+        'node_terminals': csr(node_terminals)[1],
+        'link_origin': link_array[:, 0].astype(np.int64),
+        'link_destiny': link_array[:, 1].astype(np.int64),
+        'link_distance': link_array[:, 2],
+        'link_tracks': link_array[:, 3].astype(np.int64),
+        'demand_origin': np.array([terminal_index[demand['origin']] for demand in config.get('demands', [])],
+                                  dtype=np.int64),
+        'demand_destiny': np.array([terminal_index[demand['destiny']] for demand in config.get('demands', [])],
+                                   dtype=np.int64),
+        'demand_value': np.array([demand['value'] for demand in config.get('demands', [])], dtype=np.float64),
+        'train_load': repeat('load').astype(np.float64),
+        'speed_loaded': repeat('speed_loaded').astype(np.float64),
+        'speed_empty': repeat('speed_empty').astype(np.float64),
+        'train_origin': repeat('origin', node_index.get).astype(np.int64),
+        'demand_origin_of_train': repeat('demand_origin', terminal_index.get).astype(np.int64),
+        'demand_destiny_of_train': repeat('demand_destiny', terminal_index.get).astype(np.int64),
+    }
+
+
+def number(value):
+    """ Python number of an array value: None for nan, int when integral
+    """
+    if value != value:
+        return None
+    return int(value) if float(value).is_integer() else float(value)
+
+
+class Scenario:
+    ''' Compiled scenario, builds fresh model objects on demand
+    '''
+
+    def __init__(self, arrays, digest=None):
+        """ Constructs a scenario
+
+        Args:
+            arrays (dict): arrays returned by compile_config
+            digest (str): hash of the scenario file
+        """
+        if int(arrays['format']) != SCENARIO_FORMAT:
+            raise ValueError(f'unsupported scenario format {int(arrays["format"])}')
+        self.arrays = arrays
+        self.digest = digest
+        self.name = str(arrays['name'])
+        self.simulation = json.loads(str(arrays['simulation']))
+
+    def build(self):
+        """ Builds the nodes, terminals and trains of the scenario
+
+        Returns:
+            nodes (list): list of nodes
+            terminals (list): list of terminals
+            trains (list): list of trains
+        """
+        arrays = self.arrays
+        terminals = [Terminal(id=id, loading_time=number(loading), unloading_time=number(unloading), berths=berths)
+                     for id, loading, unloading, berths in zip(arrays['terminal_id'].tolist(),
+                                                              arrays['loading_time'].tolist(),
+                                                              arrays['unloading_time'].tolist(),
+                                                              arrays['berths'].tolist())]
+        nodes = [Node(node_id=id, node_name=name)
+                 for id, name in zip(arrays['node_id'].tolist(), arrays['node_name'].tolist())]
+
+        start = arrays['node_terminals_start'].tolist()
+        related = arrays['node_terminals'].tolist()
+        for index, node in enumerate(nodes):
+            node.set_related_terminals([terminals[terminal] for terminal in related[start[index]:start[index + 1]]])
+            node.set_related_nodes([])
+        start = arrays['terminal_nodes_start'].tolist()
+        related = arrays['terminal_nodes'].tolist()
+        for index, terminal in enumerate(terminals):
+            terminal.set_related_nodes([nodes[node] for node in related[start[index]:start[index + 1]]])
+
+        for origin, destiny, distance, tracks in zip(arrays['link_origin'].tolist(), arrays['link_destiny'].tolist(),
+                                                     arrays['link_distance'].tolist(), arrays['link_tracks'].tolist()):
+            nodes[origin].set_distance_map(nodes[destiny], number(distance), None if tracks < 0 else tracks)
+            nodes[origin].related_nodes.append(nodes[destiny])
+
+        for origin, destiny, value in zip(arrays['demand_origin'].tolist(), arrays['demand_destiny'].tolist(),
+                                          arrays['demand_value'].tolist()):
+            terminals[destiny].set_demand(Demand(terminals[origin], terminals[destiny], number(value)))
+
+        trains = []
+        for train_id, (load, speed_loaded, speed_empty, origin, demand_origin, demand_destiny) in enumerate(zip(
+                arrays['train_load'].tolist(), arrays['speed_loaded'].tolist(), arrays['speed_empty'].tolist(),
+                arrays['train_origin'].tolist(), arrays['demand_origin_of_train'].tolist(),
+                arrays['demand_destiny_of_train'].tolist())):
+            train = Train(train_id=train_id, load=load, speed_loaded=number(speed_loaded),
+                          speed_empty=number(speed_empty))
+            train.set_origin(nodes[origin])
+            if demand_origin >= 0:
+                train.set_demand_origin(terminals[demand_origin])
+            if demand_destiny >= 0:
+                train.set_demand_destiny(terminals[demand_destiny])
+            trains.append(train)
+        return nodes, terminals, trains
+
+    def model(self, **kwargs):
+        """ Builds a model of the scenario
+
+        Args:
+            kwargs: attributes set on the model (e.g. verbose=False)
+
+        Returns:
+            (:obj:Model): model
+        """
+        model = Model(*self.build())
+        for key, value in kwargs.items():
+            setattr(model, key, value)
+        return model
+
+
+def scenario_hash(path):
+    """ Hash of the content of a scenario file
+
+    Args:
+        path (str): scenario file
+
+    Returns:
+        (str): hex digest
+    """
+    digest = hashlib.sha256(f'scenario-{SCENARIO_FORMAT}'.encode())
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_scenario(path, cache_dir=None):
+    """ Loads a scenario file, from the binary cache if present
+
+    Args:
+        path (str): scenario file
+        cache_dir (str): directory of the compiled scenarios, None disables caching
+
+    Returns:
+        (:obj:Scenario): compiled scenario
+    """
+    digest = scenario_hash(path)
+    if cache_dir is not None:
+        cache_path = os.path.join(cache_dir, f'scenario-{digest}.npz')
+        if os.path.exists(cache_path):
+            with np.load(cache_path) as cached:
+                return Scenario({key: cached[key] for key in cached.files}, digest)
+
+    config = read_config(path)
+    validate(config)
+    arrays = compile_config(config)
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        temporary = f'{cache_path}.{os.getpid()}.tmp.npz'
+        np.savez(temporary, **arrays)
+        os.replace(temporary, cache_path)
+    return Scenario(arrays, digest)
@@ -0,0 +1,296 @@
+""" Random service times, transit delays and breakdowns.
+
+Every entity (terminal, train) draws from its own NumPy Generator, seeded
+from (seed, kind, entity index). The same seed thus gives the same stream
+to the same entity in every scenario variant, which makes comparisons
+across variants use common random numbers. Samples are drawn in blocks
+and handed out one by one, so an event costs a list lookup instead of a
+call into the generator.
+
+    model.randomness = RandomTimes(
+        seed=1,
+        loading=lambda terminal: Exponential(terminal.loading_time),
+        transit_delay=Triangular(0, 0, 3),
+        breakdown=Breakdown(Exponential(500), LogNormal(6, 0.5)))
+"""
+import math
+
+import numpy as np
+
+# stream kinds, part of the stream seeds
+LOADING = 0
+UNLOADING = 1
+TRANSIT = 2
+FAILURE = 3
+REPAIR = 4
+
+
+class Exponential:
+    ''' Exponential distribution
+    '''
+
+    def __init__(self, mean):
+        """ Constructs the distribution
+
+        Args:
+            mean (float): mean
+        """
+        self.mean = mean
+
+    def sample(self, rng, size):
+        return rng.exponential(self.mean, size)
+
+
+class LogNormal:
+    ''' Lognormal distribution, parametrized by its mean
+    '''
+
+    def __init__(self, mean, sigma):
+        """ Constructs the distribution
+
+        Args:
+            mean (float): mean
+            sigma (float): standard deviation of the underlying normal
+        """
+        self.mean = mean
+        self.sigma = sigma
+
+    def sample(self, rng, size):
+        return rng.lognormal(math.log(self.mean) - self.sigma ** 2 / 2, self.sigma, size)
+
+
+class Triangular:
+    ''' Triangular distribution
+    '''
+
+    def __init__(self, low, mode, high):
+        """ Constructs the distribution
+
+        Args:
+            low (float): lower limit
+            mode (float): most likely value
+            high (float): upper limit
+        """
+        self.low = low
+        self.mode = mode
+        self.high = high
+
+    def sample(self, rng, size):
+        if self.low == self.high:
+            return np.full(size, float(self.low))
+        return rng.triangular(self.low, self.mode, self.high, size)
+
+
+class Empirical:
+    ''' Resamples observed values
+    '''
+
+    def __init__(self, data):
+        """ Constructs the distribution
+
+        Args:
+            data (list): observed values
+        """
+        self.data = np.asarray(data, dtype=float)
+        if not len(self.data):
+            raise ValueError('an empirical distribution needs data')
+
+    def sample(self, rng, size):
+        return rng.choice(self.data, size)
+
+
+class Breakdown:
+    ''' Train failures: operating time between failures and repair time
+    '''
+
+    def __init__(self, time_between, repair):
+        """ Constructs the breakdown model
+
+        Args:
+            time_between: distribution of the operating time between failures,
+                its samples must be positive
+            repair: distribution of the repair time
+        """
+        self.time_between = time_between
+        self.repair = repair
+
+
+class Stream:
+    ''' Samples of a distribution, drawn in blocks
+    '''
+    __slots__ = ('distribution', 'rng', 'block', 'values', 'position')
+
+    def __init__(self, distribution, rng, block=1024):
+        """ Constructs a stream
+
+        Args:
+            distribution: distribution with a sample(rng, size) method
+            rng (:obj:numpy.random.Generator): generator of the stream
+            block (int): samples drawn at once
+        """
+        self.distribution = distribution
+        self.rng = rng
+        self.block = block
+        self.values = []
+        self.position = 0
+
+    def next(self):
+        """ Next sample
+
+        Returns:
+            (float): sample
+        """
+        if self.position == len(self.values):
+            self.values = self.distribution.sample(self.rng, self.block).tolist()
+            self.position = 0
+        value = self.values[self.position]
+        self.position += 1
+        return value
+
+
+def distribution_of(spec, index, entity):
+    """ Distribution of an entity
+
+    Args:
+        spec: None, a distribution shared by every entity, a dict of
+            distributions by entity index or a function(entity) -> distribution
+        index (int): entity index
+        entity: terminal or train
+
+    Returns:
+        distribution or None
+    """
+    if spec is None:
+        return None
+    if isinstance(spec, dict):
+        return spec.get(index)
+    if callable(spec) and not hasattr(spec, 'sample'):
+        return spec(entity)
+    return spec
+
+
+class RandomTimes:
+    ''' Random times of a model, set as Model.randomness
+
+    Entities without a distribution keep their nominal times. Service times
+    replace the terminal loading/unloading times, transit delays are added
+    to the nominal transit times and breakdowns add a repair time whenever
+    a train accumulates its operating time between failures while moving.
+    Dispatch forecasts keep using the nominal times.
+    '''
+
+    def __init__(self, seed=0, loading=None, unloading=None, transit_delay=None, breakdown=None, block=1024):
+        """ Constructs the random times
+
+        Args:
+            seed (int): seed shared by every stream
+            loading: loading time distributions of the terminals, see distribution_of
+            unloading: unloading time distributions of the terminals
+            transit_delay: transit delay distributions of the trains
+            breakdown: Breakdown of the trains
+            block (int): samples drawn at once by every stream
+        """
+        self.seed = seed
+        self.loading = loading
+        self.unloading = unloading
+        self.transit_delay = transit_delay
+        self.breakdown = breakdown
+        self.block = block
+
+    def stream(self, distribution, kind, index):
+        """ Stream of an entity, seeded by (seed, kind, index)
+        """
+        if distribution is None:
+            return None
+        return Stream(distribution, np.random.default_rng([self.seed, kind, index]), self.block)
+
+    def bind(self, model):
+        """ Builds fresh streams for a model run
+
+        Args:
+            model (:obj:Model): model
+        """
+        terminals = list(enumerate(model.terminals))
+        trains = list(enumerate(model.trains))
+        self.loading_streams = [self.stream(distribution_of(self.loading, index, terminal), LOADING, index)
+                                for index, terminal in terminals]
+        self.unloading_streams = [self.stream(distribution_of(self.unloading, index, terminal), UNLOADING, index)
+                                  for index, terminal in terminals]
+        self.transit_streams = [self.stream(distribution_of(self.transit_delay, index, train), TRANSIT, index)
+                                for index, train in trains]
+        self.failure_streams = []
+        self.repair_streams = []
+        for index, train in trains:
+            breakdown = distribution_of(self.breakdown, index, train)
+            self.failure_streams.append(self.stream(breakdown and breakdown.time_between, FAILURE, index))
+            self.repair_streams.append(self.stream(breakdown and breakdown.repair, REPAIR, index))
+        # operating time left before the next failure of every train
+        self.until_failure = [self.time_between(index) if stream is not None else math.inf
+                              for index, stream in enumerate(self.failure_streams)]
+
+    def state(self):
+        """ Streams and failure counters, for checkpoints
+
+        Returns:
+            (dict): state of the bound streams
+        """
+        return {key: getattr(self, key) for key in ('loading_streams', 'unloading_streams', 'transit_streams',
+                                                     'failure_streams', 'repair_streams', 'until_failure')}
+
+    def set_state(self, state):
+        """ Restores the state returned by state
+        """
+        for key, value in state.items():
+            setattr(self, key, value)
+
+    def service_time(self, terminal, loaded, nominal):
+        """ Loading (or unloading, for loaded trains) time at a terminal
+
+        Args:
+            terminal (int): terminal index
+            loaded (bool): True if the train unloads
+            nominal (float): nominal time
+
+        Returns:
+            (float): service time
+        """
+        stream = (self.unloading_streams if loaded else self.loading_streams)[terminal]
+        return nominal if stream is None else stream.next()
+
+    def time_between(self, train):
+        """ Operating time of a train until its next failure
+
+        Args:
+            train (int): train index
+
+        Returns:
+            (float): operating time
+
+        Raises:
+            ValueError: if the sample is not positive, as repairs would
+                never catch up with the operating time
+        """
+        time = self.failure_streams[train].next()
+        if not time > 0:
+            raise ValueError(f'train {train}: operating time between failures must be positive, got {time}')
+        return time
+
+    def transit_time(self, train, nominal):
+        """ Transit time of a train, with its delay and repairs
+
+        Args:
+            train (int): train index
+            nominal (float): nominal transit time
+
+        Returns:
+            (float): transit time
+        """
+        time = nominal
+        stream = self.transit_streams[train]
+        if stream is not None:
+            time += stream.next()
+        self.until_failure[train] -= nominal
+        while self.until_failure[train] <= 0:
+            time += self.repair_streams[train].next()
+            self.until_failure[train] += self.time_between(train)
+        return time
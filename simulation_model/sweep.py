@@ -0,0 +1,281 @@
+""" Fleet-size sweeps comparing numerical and analytical productivity.
+"""
+import itertools
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from . import replication
+from .build_model import Model
+from .discrete_simulator import Simulator
+from .lockstep import Lockstep
+from .performance import get_performance_metrics
+from .train import Train
+
+sweep_dtype = np.dtype([
+    ('speed', float),
+    ('loading_time', float),
+    ('trains', int),
+    ('Pn', float),
+    ('Pa', float),
+    ('queue_time', float),
+])
+
+
+def build_fleet(templates, size, speed=None):
+    """ Builds a fleet by cycling over template trains
+
+    Args:
+        templates (list): template trains, with origin and demand set
+        size (int): number of trains
+        speed (float): loaded speed of every train (empty speed keeps the
+            template ratio), defaults to the template speeds
+
+    Returns:
+        trains (list): list of trains
+    """
+    trains = []
+    for train_id in range(size):
+        template = templates[train_id % len(templates)]
+        speed_loaded = speed if speed is not None else template.speed_loaded
+        speed_empty = template.speed_empty * speed_loaded / template.speed_loaded
+        train = Train(train_id=train_id, load=template.load, speed_loaded=speed_loaded, speed_empty=speed_empty)
+        train.set_origin(template.origin)
+        train.current_demand = list(template.current_demand)
+        trains.append(train)
+    return trains
+
+
+def fleet_definition(size, speed, loading_time, topology=None):
+    """ Fresh copy of the topology with a fleet of the given size
+
+    Args:
+        size (int): number of trains
+        speed (float): loaded train speed, None keeps the template speeds
+        loading_time (int): loading time of every loading terminal, None keeps the terminal values
+        topology (bytes): pickled (nodes, terminals, template trains), defaults
+            to the worker topology
+
+    Returns:
+        (tuple): nodes, terminals and trains
+    """
+    nodes, terminals, templates = pickle.loads(topology if topology is not None else replication.worker_topology)
+    if loading_time is not None:
+        for terminal in terminals:
+            if terminal.can_load:
+                terminal.loading_time = loading_time
+    return nodes, terminals, build_fleet(templates, size, speed)
+
+
+def fleet_result(terminals, trains, productivity, queue_time, train_load=1e3):
+    """ Numerical and analytical results of a fleet
+
+    Args:
+        terminals (list): list of terminals of the fleet definition
+        trains (list): trains of the fleet definition
+        productivity (np.ndarray): numerical productivity log
+        queue_time (float): total queue time
+        train_load (float): load of a train
+
+    Returns:
+        (tuple): speed, max loading time, Pn, Pa, queue time and the analytical
+            max number of trains
+    """
+    speed = trains[0].speed_loaded
+    max_loading_time, cycle_time = get_performance_metrics(terminals, speed)
+    max_number_of_trains = cycle_time/max_loading_time
+    Pn = productivity[-1] if len(productivity) else 0
+    Pa = min(len(trains), max_number_of_trains) * train_load / cycle_time
+    return speed, max_loading_time, Pn, Pa, queue_time, max_number_of_trains
+
+
+def run_fleet(size, speed, loading_time, horizon, calendar='heap', train_load=1e3, topology=None,
+              cache=None, key=None):
+    """ Simulates one fleet size on a fresh copy of the topology
+
+    Args:
+        size (int): number of trains
+        speed (float): loaded train speed, None keeps the template speeds
+        loading_time (int): loading time of every loading terminal, None keeps the terminal values
+        horizon (float): simulation time horizon
+        calendar (str): event calendar backend
+        train_load (float): load of a train
+        topology (bytes): pickled (nodes, terminals, template trains), defaults
+            to the worker topology
+        cache (:obj:ResultsCache): cache storing the results, None to skip
+        key (str): cache key of the fleet
+
+    Returns:
+        (tuple): speed, max loading time, Pn, Pa, queue time and the analytical
+            max number of trains
+    """
+    nodes, terminals, trains = fleet_definition(size, speed, loading_time, topology)
+
+    model = Model(nodes, terminals, trains)
+    model.verbose = False
+    if cache is not None:
+        model.trace = cache.runner_trace()
+    simulator = Simulator(calendar=calendar)
+    simulator.simulate(model, horizon)
+    if cache is not None:
+        cache.put(key, simulator, model)
+    productivity, _, _ = model.evaluate_produtivity()
+    return fleet_result(terminals, trains, productivity, model.queue_time(), train_load)
+
+
+def is_saturated(Pn, trains, max_number_of_trains, tolerance, patience):
+    """ Checks if the numerical productivity stopped growing with the fleet
+
+    Args:
+        Pn (list): numerical productivity for consecutive fleet sizes
+        trains (list): fleet sizes
+        max_number_of_trains (float): fleet size where the analytical bound saturates
+        tolerance (float): relative gain considered negligible
+        patience (int): number of consecutive negligible gains
+
+    Returns:
+        (bool): True if the last `patience` sizes are past the analytical
+            saturation and gained less than `tolerance`
+    """
+    if len(Pn) <= patience or trains[-patience] <= max_number_of_trains:
+        return False
+    for previous, current in zip(Pn[-patience - 1:-1], Pn[-patience:]):
+        if current - previous > tolerance * max(abs(previous), 1e-12):
+            return False
+    return True
+
+
+def fleet_sweep(nodes, terminals, trains, max_trains, horizon, speeds=None, loading_times=None,
+                workers=None, calendar='heap', tolerance=0.01, patience=2, early_stop=True, cache=None):
+    """ Simulates fleet sizes 1..max_trains for every speed/loading time pair
+
+    Fleet sizes of all grid points are submitted in waves to a process pool.
+    A grid point stops early once its fleet is larger than the analytical
+    max number of trains and the numerical productivity gained less than
+    `tolerance` for `patience` consecutive sizes. Fleets found in the
+    results cache are not simulated again.
+
+    Args:
+        nodes (list): list of nodes
+        terminals (list): list of terminals
+        trains (list): template trains, cycled to build every fleet
+        max_trains (int): largest fleet size
+        horizon (float): simulation time horizon
+        speeds (list): loaded train speeds to sweep, None keeps the template speeds
+        loading_times (list): loading times to sweep, None keeps the terminal values
+        workers (int): number of worker processes (defaults to all cores, 1 runs in process)
+        calendar (str): event calendar backend
+        tolerance (float): relative productivity gain considered negligible
+        patience (int): number of consecutive negligible gains before stopping
+        early_stop (bool): stop a grid point once it saturates
+        cache (:obj:ResultsCache): results cache, None to simulate every fleet
+
+    Returns:
+        (np.ndarray): structured array with sweep_dtype fields, one row per run
+    """
+    topology = pickle.dumps((nodes, terminals, trains))
+    workers = workers or os.cpu_count()
+    grid = list(itertools.product(speeds or [None], loading_times or [None]))
+    rows = {point: [] for point in grid}
+    next_size = {point: 1 for point in grid}
+    active = list(grid)
+
+    pool = None
+    if workers > 1:
+        pool = ProcessPoolExecutor(workers, initializer=replication.set_worker_topology, initargs=(topology,))
+    try:
+        while active:
+            batch = max(1, workers // len(active))
+            jobs = []
+            for point in active:
+                last = min(next_size[point] + batch, max_trains + 1)
+                jobs.extend((point, size) for size in range(next_size[point], last))
+                next_size[point] = last
+            results = [None for _ in jobs]
+            keys = [None for _ in jobs]
+            if cache is not None:
+                for index, ((speed, loading_time), size) in enumerate(jobs):
+                    nodes_copy, terminals_copy, fleet = fleet_definition(size, speed, loading_time, topology)
+                    keys[index] = cache.runner_key(nodes_copy, terminals_copy, fleet, horizon)
+                    entry = cache.get(keys[index])
+                    if entry is not None:
+                        results[index] = fleet_result(terminals_copy, fleet, entry['productivity'],
+                                                      entry['queue_time'].item())
+            missing = [index for index, result in enumerate(results) if result is None]
+            shipped = topology if pool is None else None  # workers hold their own copy
+            args = []
+            for index in missing:
+                (speed, loading_time), size = jobs[index]
+                args.append((size, speed, loading_time, horizon, calendar, 1e3, shipped, cache, keys[index]))
+            if pool is None or not args:
+                computed = [run_fleet(*arg) for arg in args]
+            else:
+                computed = pool.map(run_fleet, *zip(*args))
+            for index, result in zip(missing, computed):
+                results[index] = result
+            for (point, size), result in zip(jobs, results):
+                rows[point].append((size, result))
+
+            still_active = []
+            for point in active:
+                sizes = [size for size, _ in rows[point]]
+                Pn = [result[2] for _, result in rows[point]]
+                max_number_of_trains = rows[point][-1][1][5]
+                if next_size[point] > max_trains:
+                    continue
+                if early_stop and is_saturated(Pn, sizes, max_number_of_trains, tolerance, patience):
+                    continue
+                still_active.append(point)
+            active = still_active
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    table = [(speed, loading_time, size, Pn, Pa, queue_time)
+             for point in grid
+             for size, (speed, loading_time, Pn, Pa, queue_time, _) in rows[point]]
+    return np.array(table, dtype=sweep_dtype)
+
+
+def lockstep_sweep(nodes, terminals, trains, max_trains, horizon, speeds=None, loading_times=None):
+    """ Simulates fleet sizes 1..max_trains for every speed/loading time pair in one lockstep pass
+
+    Gives the rows of fleet_sweep without early stopping, on a single core.
+
+    Args:
+        nodes (list): list of nodes
+        terminals (list): list of terminals
+        trains (list): template trains, cycled to build every fleet
+        max_trains (int): largest fleet size
+        horizon (float): simulation time horizon
+        speeds (list): loaded train speeds to sweep, None keeps the template speeds
+        loading_times (list): loading times to sweep, None keeps the terminal values
+
+    Returns:
+        (np.ndarray): structured array with sweep_dtype fields, one row per run
+    """
+    grid = list(itertools.product(speeds or [None], loading_times or [None]))
+    variants = [{'trains': size, 'speed': speed, 'loading_time': loading_time}
+                for speed, loading_time in grid for size in range(1, max_trains + 1)]
+    batch = Lockstep(nodes, terminals, trains, variants)
+    batch.simulate(horizon)
+    productivity = batch.final_productivity()
+    queue_time = batch.queue_time()
+
+    table = []
+    for index, variant in enumerate(variants):
+        size = variant['trains']
+        if size == 1:
+            point_terminals = pickle.loads(pickle.dumps(terminals))
+            if variant['loading_time'] is not None:
+                for terminal in point_terminals:
+                    if terminal.can_load:
+                        terminal.loading_time = variant['loading_time']
+            speed = batch.speed_loaded[index, 0]
+            max_loading_time, cycle_time = get_performance_metrics(point_terminals, speed)
+            max_number_of_trains = cycle_time/max_loading_time
+        Pa = min(size, max_number_of_trains) * 1e3 / cycle_time
+        table.append((speed, max_loading_time, size, productivity[index], Pa, queue_time[index]))
+    return np.array(table, dtype=sweep_dtype)
@@ -0,0 +1,90 @@
+""" Synthetic railroad networks for benchmarks.
+"""
+import random
+
+from .demand import Demand
+from .node import Node
+from .terminal import Terminal
+from .train import Train
+
+
+def build_network(yards=10, terminals=None, trains=10, terminals_per_yard=3, neighbours=2,
+                  distances=(100, 900), service_times=(4, 10), demands=(10, 50), seed=0,
+                  regions=1, gateway_distances=(2000, 3000)):
+    """ Builds a random railroad network
+
+    Every terminal can load and unload, and a demand exists for every
+    (origin, destiny) terminal pair. The model addresses the yard a train
+    leaves a terminal to by the terminal index, so terminal i is connected
+    to yard i and there cannot be more terminals than yards.
+
+    With several regions, yards are only linked to (and related to the
+    terminals of) yards of their own region. The first yard of every region
+    is a gateway, also linked to the gateway of the next region by a link
+    longer than the others, so the nearest yard of every yard (where the
+    model sends its trains) stays in its region and the regions run
+    independently (see parallel.partition).
+
+    Args:
+        yards (int): number of yards (nodes)
+        terminals (int): number of terminals, defaults to the number of yards
+        trains (int): number of trains
+        terminals_per_yard (int): number of terminals related to each yard
+        neighbours (int): number of distance map entries of each yard
+        distances (tuple): range of the yard distances (km)
+        service_times (tuple): range of the loading and unloading times (h)
+        demands (tuple): range of the route demands (thousand tons)
+        seed (int): random seed
+        regions (int): number of regions of consecutive yards
+        gateway_distances (tuple): range of the gateway link distances (km), above distances
+
+    Returns:
+        nodes (list): list of nodes
+        terminals (list): list of terminals
+        trains (list): list of trains
+    """
+    terminals = yards if terminals is None else terminals
+    if terminals > yards:
+        raise ValueError('a network cannot have more terminals than yards')
+    if regions > 1 and terminals != yards:
+        raise ValueError('a network with regions needs one terminal per yard')
+    if regions > 1 and yards < 2 * regions:
+        raise ValueError('every region needs at least two yards')
+    rng = random.Random(seed)
+
+    terminal_list = [Terminal(id=index, loading_time=rng.randint(*service_times),
+                              unloading_time=rng.randint(*service_times))
+                     for index in range(terminals)]
+    nodes = [Node(node_id=index, node_name=f'Patio {index}') for index in range(yards)]
+    region = [index * regions // yards for index in range(yards)]
+    gateways = [region.index(number) for number in range(regions)] if regions > 1 else []
+
+    for index, node in enumerate(nodes):
+        others = [other for other in range(yards) if other != index and region[other] == region[index]]
+        related_nodes = rng.sample(others, min(neighbours, len(others)))
+        for other in related_nodes:
+            node.set_distance_map(nodes[other], rng.randint(*distances))
+        if index in gateways:
+            gateway = gateways[(region[index] + 1) % regions]
+            node.set_distance_map(nodes[gateway], rng.randint(*gateway_distances))
+            related_nodes.append(gateway)
+        node.set_related_nodes([nodes[other] for other in related_nodes])
+
+        own = index % terminals
+        others = [other for other in range(terminals) if other != own and region[other] == region[index]]
+        related = [own] + rng.sample(others, min(terminals_per_yard - 1, len(others)))
+        node.set_related_terminals([terminal_list[other] for other in related])
+
+    for index, terminal in enumerate(terminal_list):
+        terminal.set_related_nodes([nodes[index]])
+        for origin in terminal_list:
+            terminal.set_demand(Demand(origin, terminal, 1e3 * rng.randint(*demands)))
+
+    train_list = []
+    for train_id in range(trains):
+        train = Train(train_id=train_id, load=rng.choice([0, 1e3]), speed_loaded=40, speed_empty=47)
+        train.set_origin(rng.choice(nodes))
+        train.set_demand_origin(rng.choice(terminal_list))
+        train_list.append(train)
+
+    return nodes, terminal_list, train_list
@@ -1,23 +1,26 @@
 class Terminal:
-    def __init__(self, id, loading_time, unloading_time):
+    __slots__ = ('id', 'loading_time', 'unloading_time', 'can_load', 'can_unload',
+                 'demands', 'demand_map', 'related_nodes', 'berths')
+
+    def __init__(self, id, loading_time, unloading_time, berths=1):
         self.id = id
         self.loading_time = loading_time
         self.unloading_time = unloading_time
+        self.berths = berths
         self.can_load = loading_time is not None
         self.can_unload = unloading_time is not None
         self.demands = []
+        self.demand_map = {}
     
     def set_related_nodes(self, nodes):
         self.related_nodes = nodes
 
     def get_demand(self, origin, destiny):
-        for demand in self.demands:
-            if demand.destiny == destiny and demand.origin == origin:
-                return demand
-        return None
+        return self.demand_map.get((origin, destiny))
 
     def set_demand(self, demand):
         self.demands.append(demand)
+        self.demand_map.setdefault((demand.origin, demand.destiny), demand)
 
     def __repr__(self) -> str:
         return f'Terminal {self.id}'
\ No newline at end of file
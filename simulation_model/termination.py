@@ -0,0 +1,189 @@
+""" Termination conditions checked after every event of Simulator.simulate.
+
+A condition is called as condition(simulator, model) and returns True to
+stop the run. Every check is O(1): conditions read counters the model
+keeps up to date (e.g. Model.unmet_demands) or update their own state
+incrementally.
+
+    simulator.simulate(model, horizon, until=[AllDemandsMet(), WallClock(60)])
+    print(simulator.stop_reason)
+"""
+import math
+import time as clock
+from statistics import NormalDist
+
+
+class Condition:
+    ''' Base termination condition
+    '''
+    name = 'condition'
+
+    def start(self, simulator, model):
+        """ Called before the first event of a run
+        """
+
+    def __call__(self, simulator, model):
+        """ Checks the condition after an event
+
+        Returns:
+            (bool): True to stop the simulation
+        """
+        return False
+
+
+class AllDemandsMet(Condition):
+    ''' Stops once every demand is achieved
+    '''
+    name = 'all_demands_met'
+
+    def __call__(self, simulator, model):
+        return model.unmet_demands == 0
+
+
+class SteadyState(Condition):
+    ''' Stops once the production per time bin is estimated precisely enough
+
+    Completed bins of the model statistics (one day by default) are batch
+    means of the production; the run stops when the confidence interval
+    of their mean is narrower than `relative_width` times the mean.
+    '''
+    name = 'steady_state'
+
+    def __init__(self, relative_width=0.05, confidence=0.95, warmup_bins=2, min_bins=10):
+        """ Constructs the condition
+
+        Args:
+            relative_width (float): CI half-width over the mean to stop at
+            confidence (float): confidence level of the interval
+            warmup_bins (int): first bins discarded as transient
+            min_bins (int): bins required before stopping, at least 2 to
+                estimate the variance of the mean
+        """
+        if min_bins < 2:
+            raise ValueError('min_bins must be at least 2')
+        self.relative_width = relative_width
+        self.z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        self.warmup_bins = warmup_bins
+        self.min_bins = min_bins
+
+    def start(self, simulator, model):
+        self.next_bin = self.warmup_bins
+        self.count = 0
+        self.mean = 0
+        self.m2 = 0
+
+    def __call__(self, simulator, model):
+        stats = model.stats
+        completed = int(simulator.time // stats.bin_width)
+        if completed <= self.next_bin:
+            return False
+        bins = stats.production_bins
+        while self.next_bin < completed:
+            value = bins[self.next_bin] if self.next_bin < len(bins) else 0
+            self.next_bin += 1
+            self.count += 1
+            delta = value - self.mean
+            self.mean += delta / self.count
+            self.m2 += delta * (value - self.mean)
+        if self.count < self.min_bins or self.mean <= 0:
+            return False
+        half_width = self.z * math.sqrt(self.m2 / (self.count - 1) / self.count)
+        return half_width <= self.relative_width * self.mean
+
+
+class WallClock(Condition):
+    ''' Stops once a wall-clock budget is spent
+    '''
+    name = 'wall_clock'
+
+    def __init__(self, seconds, check_every=256):
+        """ Constructs the condition
+
+        Args:
+            seconds (float): wall-clock budget of the run
+            check_every (int): events between clock reads
+        """
+        self.seconds = seconds
+        self.check_every = check_every
+
+    def start(self, simulator, model):
+        self.deadline = clock.perf_counter() + self.seconds
+        self.countdown = self.check_every
+
+    def __call__(self, simulator, model):
+        self.countdown -= 1
+        if self.countdown:
+            return False
+        self.countdown = self.check_every
+        return clock.perf_counter() >= self.deadline
+
+
+class Predicate(Condition):
+    ''' Stops when a user function returns True
+    '''
+
+    def __init__(self, function, every=1, name=None):
+        """ Constructs the condition
+
+        Args:
+            function (function): function(simulator, model) -> bool
+            every (int): events between calls
+            name (str): name reported as the stop reason
+        """
+        self.function = function
+        self.every = every
+        self.name = name or getattr(function, '__name__', 'predicate')
+
+    def start(self, simulator, model):
+        self.countdown = self.every
+
+    def __call__(self, simulator, model):
+        self.countdown -= 1
+        if self.countdown:
+            return False
+        self.countdown = self.every
+        return bool(self.function(simulator, model))
+
+
+class AnyOf(Condition):
+    ''' Stops as soon as one of its conditions holds, remembering which
+    '''
+    name = 'any_of'
+
+    def __init__(self, conditions):
+        """ Constructs the condition
+
+        Args:
+            conditions (list): conditions, plain functions are wrapped in Predicate
+        """
+        self.conditions = [condition if isinstance(condition, Condition) else Predicate(condition)
+                           for condition in conditions]
+        self.reason = None
+
+    def start(self, simulator, model):
+        self.reason = None
+        for condition in self.conditions:
+            condition.start(simulator, model)
+
+    def __call__(self, simulator, model):
+        for condition in self.conditions:
+            if condition(simulator, model):
+                self.reason = condition.name
+                return True
+        return False
+
+
+def any_of(until):
+    """ Condition of the until argument of Simulator.simulate
+
+    Args:
+        until: a condition, a function or a list of them
+
+    Returns:
+        (:obj:AnyOf): combined condition
+    """
+    if isinstance(until, AnyOf):
+        return until
+    if isinstance(until, (list, tuple)):
+        return AnyOf(until)
+    return AnyOf([until])
@@ -0,0 +1,79 @@
+import numpy as np
+
+
+class Topology:
+    ''' Compiled railroad topology with dense integer ids.
+
+    Node and terminal ids are their positions in the model lists. The
+    distance maps are stored as a CSR adjacency (neighbours of node i are
+    adjacency[adjacency_start[i]:adjacency_start[i + 1]]).
+    '''
+
+    def __init__(self, nodes, terminals):
+        """ Compiles the topology of a model
+
+        Args:
+            nodes (list): list of nodes
+            terminals (list): list of terminals
+        """
+        self.node_index = {}
+        for index, node in enumerate(nodes):
+            self.node_index.setdefault(node, index)
+        self.terminal_index = {}
+        for index, terminal in enumerate(terminals):
+            self.terminal_index.setdefault(terminal, index)
+
+        # terminals holding each (origin, destiny) demand
+        self.demand_holders = {}
+        for index, terminal in enumerate(terminals):
+            for key, demand in terminal.demand_map.items():
+                self.demand_holders.setdefault(key, []).append((index, demand))
+
+        self.related_terminals = [
+            [self.terminal_index[terminal] for terminal in getattr(node, 'related_terminals', [])]
+            for node in nodes]
+        self.candidate_ids = [np.array(ids, dtype=np.int64) for ids in self.related_terminals]
+
+        adjacency = []
+        distance = []
+        self.adjacency_start = np.zeros(len(nodes) + 1, dtype=np.int64)
+        # nearest neighbour of every node, first one on ties
+        self.nearest_node = np.full(len(nodes), -1, dtype=np.int64)
+        self.nearest_distance = np.full(len(nodes), np.inf)
+        for index, node in enumerate(nodes):
+            for dist_map in node.distance_map:
+                destiny = self.node_index[dist_map.destiny]
+                adjacency.append(destiny)
+                distance.append(dist_map.distance)
+                if dist_map.distance < self.nearest_distance[index]:
+                    self.nearest_distance[index] = dist_map.distance
+                    self.nearest_node[index] = destiny
+            self.adjacency_start[index + 1] = len(adjacency)
+        self.adjacency = np.array(adjacency, dtype=np.int64)
+        self.distance = np.array(distance, dtype=float)
+        self.nearest_node = self.nearest_node.tolist()
+        self.nearest_distance = self.nearest_distance.tolist()
+
+    def candidates(self, node_index):
+        """ Terminal ids related to a node, as an array
+
+        Args:
+            node_index (int): node id
+
+        Returns:
+            (np.array): terminal ids
+        """
+        return self.candidate_ids[node_index]
+
+    def neighbours(self, node_index):
+        """ Neighbour ids and distances of a node
+
+        Args:
+            node_index (int): node id
+
+        Returns:
+            (np.array): neighbour node ids
+            (np.array): distances to the neighbours
+        """
+        start, end = self.adjacency_start[node_index], self.adjacency_start[node_index + 1]
+        return self.adjacency[start:end], self.distance[start:end]
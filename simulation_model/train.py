@@ -1,6 +1,9 @@
 class Train:
     """ Model of a train
     """
+    __slots__ = ('train_id', 'load', 'origin', 'destiny', 'speed_loaded', 'speed_empty',
+                 'arrival_time', 'current_demand', 'is_loaded', 'is_finished')
+
     def __init__(self, train_id, load, speed_loaded, speed_empty):
         """ Construct a train
         
@@ -0,0 +1,22 @@
+from simulation_model import benchmark_memory as bm
+from simulation_model import synthetic
+from simulation_model.train import Train
+
+
+def test_dict_backed_copy_keeps_the_behaviour():
+    DictTrain = bm.dict_backed(Train)
+    train = DictTrain(train_id=0, load=1e3, speed_loaded=40, speed_empty=47)
+    assert not hasattr(Train(train_id=0, load=0, speed_loaded=40, speed_empty=47), '__dict__')
+    assert set(vars(train)) == set(Train.__slots__)
+    train.update_load(0)
+    assert not train.is_loaded
+
+
+def test_baseline_network_is_larger_and_builders_are_restored():
+    baseline = {name: bm.dict_backed(cls) for name, cls in bm.state_classes.items()}
+    with bm.using_classes(baseline):
+        nodes, terminals, trains = synthetic.build_network(10, trains=50)
+        before = bm.traced_bytes(lambda: synthetic.build_network(10, trains=50))
+    assert hasattr(trains[0], '__dict__') and hasattr(nodes[0].distance_map[0], '__dict__')
+    assert synthetic.Train is Train
+    assert bm.traced_bytes(lambda: synthetic.build_network(10, trains=50)) < before
@@ -0,0 +1,42 @@
+import json
+
+import pytest
+
+from simulation_model import benchmark_suite
+
+
+@pytest.fixture
+def tiny(monkeypatch):
+    monkeypatch.setitem(benchmark_suite.scales, 'tiny', (4, 4, 6, 24 * 5))
+
+
+def test_run_scale_reports_the_breakdown():
+    result = benchmark_suite.run_scale('tiny', 4, 4, 6, 24 * 5)
+    assert result['events'] > 0 and result['us_per_event'] > 0
+    assert set(result['breakdown_us_per_event']) == {'calendar', 'dispatch', 'logging'}
+    assert all(value > 0 for value in result['breakdown_us_per_event'].values())
+
+
+def test_saved_baseline_loads_and_compares(tmp_path, tiny):
+    path = tmp_path / 'baseline.json'
+    benchmark_suite.main(['--scales', 'tiny', '--save', str(path)])
+    baseline = benchmark_suite.load_baseline(path)
+    assert [result['scale'] for result in baseline['results']] == ['tiny']
+    assert benchmark_suite.compare(baseline, baseline) == []
+
+    faster = json.loads(json.dumps(baseline))
+    faster['results'][0]['us_per_event'] /= 2
+    faster['results'][0]['events'] += 1
+    regressions = benchmark_suite.compare(baseline, faster)
+    assert len(regressions) == 2 and regressions[1].startswith('tiny: us_per_event')
+    path.write_text(json.dumps(faster))
+    with pytest.raises(SystemExit):
+        benchmark_suite.main(['--scales', 'tiny', '--compare', str(path)])
+
+
+@pytest.mark.parametrize('content', ['[]', '{"results": [{"scale": "small"}]}', 'not json'])
+def test_invalid_baselines_are_rejected(tmp_path, content):
+    path = tmp_path / 'baseline.json'
+    path.write_text(content)
+    with pytest.raises(ValueError):
+        benchmark_suite.load_baseline(path)
@@ -0,0 +1,175 @@
+import numpy as np
+import pytest
+
+from simulation_model import checkpoint
+from simulation_model import dispatch
+from simulation_model import event_calendar as ec
+from simulation_model import event_trace as et
+from simulation_model import queue_history as qh
+from simulation_model.build_model import Model
+from simulation_model.discrete_simulator import Simulator
+from simulation_model.main import build_scenario
+from simulation_model.synthetic import build_network
+
+
+def results(model):
+    productivity, production, time = model.evaluate_produtivity()
+    demands = [demand.current_demand for terminal in model.terminals for demand in terminal.demands]
+    return productivity.copy(), production.copy(), time.copy(), model.queue_time(), demands
+
+
+def run_split(build, path, warmup, horizon, configure=lambda model: None, calendar='heap'):
+    """ Runs to warmup, saves, and resumes up to horizon in a fresh model
+    """
+    model = Model(*build())
+    model.verbose = False
+    configure(model)
+    simulator = Simulator(calendar)
+    simulator.simulate(model, warmup)
+    checkpoint.save_checkpoint(path, simulator, model)
+
+    model = Model(*build())
+    model.verbose = False
+    configure(model)
+    simulator = Simulator(calendar)
+    checkpoint.load_checkpoint(path, simulator, model)
+    simulator.simulate(model, horizon, resume=True)
+    return model
+
+
+def assert_resume_matches(build, path, warmup, horizon, configure=lambda model: None, calendar='heap'):
+    """ A run resumed from a checkpoint in a fresh model ends as the uninterrupted run
+    """
+    model = Model(*build())
+    model.verbose = False
+    configure(model)
+    Simulator(calendar).simulate(model, horizon)
+    expected = results(model)
+
+    resumed = results(run_split(build, path, warmup, horizon, configure, calendar))
+    for expected_array, resumed_array in zip(expected[:3], resumed[:3]):
+        np.testing.assert_array_equal(resumed_array, expected_array)
+    assert resumed[3:] == expected[3:]
+
+
+@pytest.mark.parametrize('calendar', sorted(ec.calendars))
+def test_resume_matches_the_full_run(tmp_path, calendar):
+    assert_resume_matches(build_scenario, tmp_path / 'run.ckpt', 5 * 24, 15 * 24, calendar=calendar)
+
+
+def test_resume_matches_the_full_run_on_a_routed_network(tmp_path):
+    def build():
+        return build_network(30, trains=30, neighbours=4, seed=2)
+
+    assert_resume_matches(build, tmp_path / 'run.ckpt', 10 * 24, 30 * 24, lambda model: model.enable_routing())
+
+
+def test_resume_matches_the_full_run_with_vectorized_selection(tmp_path):
+    def build():
+        return build_network(30, trains=40, terminals_per_yard=12, seed=3)
+
+    model = Model(*build())
+    assert max(len(node.related_terminals) for node in model.nodes) >= model.vectorize_threshold
+    assert_resume_matches(build, tmp_path / 'run.ckpt', 10 * 24, 30 * 24)
+
+
+def test_resume_matches_the_full_run_with_berths_and_tracks(tmp_path):
+    def build():
+        nodes, terminals, trains = build_network(12, trains=24, seed=4)
+        for node in nodes:
+            for dist_map in node.distance_map:
+                dist_map.tracks = 1
+        for terminal in terminals:
+            terminal.berths = 2
+        return nodes, terminals, trains
+
+    assert_resume_matches(build, tmp_path / 'run.ckpt', 10 * 24, 30 * 24)
+
+
+def test_fork_with_other_parameters(tmp_path):
+    model = Model(*build_scenario())
+    model.verbose = False
+    simulator = Simulator()
+    simulator.simulate(model, 5 * 24)
+    checkpoint.save_checkpoint(tmp_path / 'warmup.ckpt', simulator, model)
+
+    def fork(loading_time):
+        nodes, terminals, trains = build_scenario()
+        terminals[0].loading_time = loading_time
+        model = Model(nodes, terminals, trains)
+        model.verbose = False
+        simulator = Simulator()
+        checkpoint.load_checkpoint(tmp_path / 'warmup.ckpt', simulator, model)
+        simulator.simulate(model, 15 * 24, resume=True)
+        return results(model)[3]
+
+    model = Model(*build_scenario())
+    model.verbose = False
+    Simulator().simulate(model, 15 * 24)
+    assert fork(7) == model.queue_time()
+    assert fork(3) != fork(7)
+    assert fork(7) == model.queue_time()
+
+
+@pytest.mark.parametrize('sink', ['array', 'file', 'ring'])
+def test_resume_keeps_the_trace(tmp_path, sink):
+    def configure(model):
+        if sink == 'array':
+            model.trace = et.array_trace(capacity=8)
+        elif sink == 'file':
+            model.trace = et.array_trace(capacity=8, path=str(tmp_path / 'trace.bin'))
+        else:
+            model.trace = et.ring_trace(capacity=16)
+
+    def records(model):
+        model.trace.flush()
+        return et.load_trace(model.trace.path) if sink == 'file' else model.trace.records()
+
+    model = Model(*build_scenario())
+    configure(model)
+    Simulator().simulate(model, 15 * 24)
+    expected = records(model)
+
+    model = run_split(build_scenario, tmp_path / 'run.ckpt', 5 * 24, 15 * 24, configure)
+    np.testing.assert_array_equal(records(model), expected)
+    if sink == 'ring':
+        assert model.trace.count > 16
+
+
+def test_resume_keeps_the_queue_history(tmp_path):
+    def configure(model):
+        model.history = qh.QueueHistory(capacity=4)
+
+    model = Model(*build_scenario())
+    model.verbose = False
+    configure(model)
+    Simulator().simulate(model, 15 * 24)
+    expected = model.history.records()
+
+    model = run_split(build_scenario, tmp_path / 'run.ckpt', 5 * 24, 15 * 24, configure)
+    np.testing.assert_array_equal(model.history.records(), expected)
+
+
+@pytest.mark.parametrize('name', sorted(dispatch.policies))
+def test_resume_matches_the_full_run_with_a_policy(tmp_path, name):
+    def build():
+        return build_network(20, trains=30, terminals_per_yard=4, neighbours=3, seed=5)
+
+    def configure(model):
+        model.policy = dispatch.policies[name]()
+
+    assert_resume_matches(build, tmp_path / 'run.ckpt', 10 * 24, 30 * 24, configure)
+
+
+def test_policy_state_needs_a_policy_to_restore():
+    model = Model(*build_scenario())
+    model.verbose = False
+    model.policy = dispatch.RoundRobin()
+    simulator = Simulator()
+    simulator.simulate(model, 5 * 24)
+    state = checkpoint.snapshot(simulator, model)
+    assert state['policy']['next_position']
+
+    model = Model(*build_scenario())
+    with pytest.raises(ValueError):
+        checkpoint.restore(Simulator(), model, state)
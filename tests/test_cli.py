@@ -0,0 +1,58 @@
+import csv
+import os
+import subprocess
+import sys
+
+import pytest
+
+from simulation_model import cli
+from simulation_model.build_model import Model
+from simulation_model.discrete_simulator import Simulator
+from simulation_model.main import build_scenario
+
+ROOT = os.path.join(os.path.dirname(__file__), os.pardir)
+EXAMPLE = os.path.join(ROOT, 'simulation_model', 'scenarios', 'example.json')
+
+
+def test_parser_reads_every_command():
+    args = cli.parser().parse_args(['run', 'a.json', 'b.toml', '--seeds', '0', '1', '--horizon', '48'])
+    assert args.function is cli.command_run
+    assert (args.scenarios, args.seeds, args.horizon, args.workers) == (['a.json', 'b.toml'], [0, 1], 48.0, 1)
+    assert args.calendar == 'heap' and args.spread == 0.2 and args.output is None
+
+    args = cli.parser().parse_args(['sweep', 'a.json', '--max-trains', '6', '--speeds', '30', '40',
+                                    '--no-early-stop', '--workers', '2'])
+    assert args.function is cli.command_sweep
+    assert (args.max_trains, args.speeds, args.no_early_stop, args.workers) == (6, [30.0, 40.0], True, 2)
+
+    args = cli.parser().parse_args(['replicate', 'a.json', '--replications', '8', '--calendar', 'bucket'])
+    assert args.function is cli.command_replicate
+    assert (args.replications, args.seeds, args.confidence, args.calendar) == (8, None, 0.95, 'bucket')
+
+
+@pytest.mark.parametrize('argv', [[], ['run'], ['sweep', 'a.json'], ['run', 'a.json', '--calendar', 'tree'],
+                                  ['run', 'a.json', '--workers', '0']])
+def test_invalid_arguments_exit(argv):
+    with pytest.raises(SystemExit):
+        cli.main(argv)
+
+
+def test_run_writes_the_nominal_results(tmp_path):
+    output = tmp_path / 'results.csv'
+    cli.main(['run', EXAMPLE, '--output', str(output)])
+    with open(output, newline='') as file:
+        rows = list(csv.DictReader(file))
+
+    model = Model(*build_scenario())
+    model.verbose = False
+    Simulator().simulate(model, 15 * 24)
+    assert len(rows) == 1
+    assert (rows[0]['scenario'], rows[0]['seed'], float(rows[0]['horizon'])) == ('example', '-1', 360)
+    assert float(rows[0]['productivity']) == model.evaluate_produtivity()[0][-1]
+    assert float(rows[0]['queue_time']) == model.queue_time()
+
+
+def test_cli_imports_only_the_standard_library():
+    code = 'import sys, simulation_model.cli; print("numpy" in sys.modules)'
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == 'False'
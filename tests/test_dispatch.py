@@ -0,0 +1,95 @@
+import random
+
+import numpy as np
+import pytest
+
+from simulation_model import benchmark_policies
+from simulation_model import dispatch
+from simulation_model.build_model import Model
+from simulation_model.discrete_simulator import Simulator
+from simulation_model.main import build_scenario
+from simulation_model.synthetic import build_network
+
+
+def outcome(build, policy=None, routing=False, horizon=30 * 24):
+    model = Model(*build())
+    model.verbose = False
+    model.policy = policy
+    if routing:
+        model.enable_routing()
+    Simulator().simulate(model, horizon)
+    return model.queue_time(), [demand.current_demand for terminal in model.terminals
+                                for demand in terminal.demands]
+
+
+@pytest.mark.parametrize('build', [
+    build_scenario,
+    lambda: build_network(30, trains=40, terminals_per_yard=3, seed=3),
+    lambda: build_network(30, trains=60, terminals_per_yard=12, neighbours=3, seed=4),
+])
+def test_shortest_wait_heaps_match_the_built_in_rule(build):
+    assert outcome(build, dispatch.ShortestExpectedWait()) == outcome(build)
+
+
+def test_shortest_route_matches_the_routed_model():
+    def build():
+        return build_network(30, trains=30, neighbours=4, seed=2)
+
+    assert outcome(build, dispatch.ShortestRoute()) == outcome(build, routing=True)
+    assert outcome(build, dispatch.ShortestRoute()) != outcome(build)
+
+
+def test_candidate_heaps_match_a_scan():
+    rng = random.Random(7)
+    size = 12
+    forecast = np.zeros(size)
+    version = [0] * size
+    service_times = [float(rng.randint(1, 6)) for _ in range(size)]
+    candidates = list(range(size))
+    heaps = dispatch.CandidateHeaps(candidates, service_times)
+    heaps.build(0, forecast, version)
+    time = 0
+    for _ in range(500):
+        time += rng.choice([0, 0, 1, 2.5])
+        skipped = set(rng.sample(range(size), rng.randint(0, 3)))
+        times = [max(time, forecast[index]) + service_times[position] if index not in skipped else np.inf
+                 for position, index in enumerate(candidates)]
+        position = int(np.argmin(times))
+        best = heaps.best(time, forecast, version, skipped.__contains__)
+        assert best == (candidates[position], times[position])
+        # the chosen terminal is booked until its expected finish time
+        forecast[best[0]] = best[1]
+        version[best[0]] += 1
+        heaps.pending[best[0]] = best[0]
+    assert len(heaps.free) + len(heaps.busy) + len(heaps.release) <= 6 * size + 8
+
+
+def test_round_robin_cursors_are_kept_by_node():
+    model = Model(*build_network(10, trains=20, terminals_per_yard=4, seed=1))
+    model.verbose = False
+    model.policy = dispatch.RoundRobin()
+    Simulator().simulate(model, 20 * 24)
+    cursors = model.policy.state()['next_position']
+    assert cursors and set(cursors) <= set(range(len(model.nodes)))
+
+    model.policy.bind(model)
+    model.clear()
+    first = [model.policy.choose_terminal(0, 0, [None, None], False)[0] for _ in range(8)]
+    assert first == model.topology.related_terminals[0] * 2
+
+
+@pytest.mark.parametrize('name', sorted(dispatch.policies))
+def test_every_policy_delivers(name):
+    def build():
+        return build_network(20, trains=30, terminals_per_yard=4, neighbours=3, seed=5)
+
+    _, demands = outcome(build, dispatch.policies[name]())
+    assert sum(demands) > 0
+
+
+def test_policy_benchmark_runs_in_process():
+    nodes, terminals, trains = build_network(8, trains=10, seed=1)
+    table = benchmark_policies.compare_policies(nodes, terminals, trains, 10 * 24, names=['shortest_wait', 'round_robin'],
+                                                replications=2, workers=1)
+    assert table['policy'].tolist() == ['shortest_wait', 'round_robin']
+    assert (table['us_per_decision'] > 0).all()
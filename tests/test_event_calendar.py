@@ -0,0 +1,107 @@
+import random
+
+import pytest
+
+from simulation_model import event_calendar as ec
+
+
+def fire(simulator, data):
+    pass
+
+
+def drain(calendar):
+    events = []
+    while not calendar.is_empty():
+        events.append(calendar.pop())
+    return events
+
+
+@pytest.mark.parametrize('name', sorted(ec.calendars))
+def test_equal_times_pop_in_insertion_order(name):
+    calendar = ec.calendars[name]()
+    rng = random.Random(1)
+    events = [(rng.randint(0, 5), fire, index) for index in range(200)]
+    for event in events:
+        calendar.push(*event)
+    assert len(calendar) == len(events)
+    assert calendar.peek() == min(events, key=lambda event: (event[0], event[2]))
+    assert drain(calendar) == sorted(events, key=lambda event: (event[0], event[2]))
+
+
+@pytest.mark.parametrize('name', sorted(ec.calendars))
+def test_push_many_matches_push(name):
+    rng = random.Random(2)
+    events = [(rng.randint(0, 5), fire, index) for index in range(100)]
+    one_by_one = ec.calendars[name]()
+    for event in events:
+        one_by_one.push(*event)
+    bulk = ec.calendars[name]()
+    bulk.push_many(events[:50])
+    bulk.push_many(events[50:])
+    assert drain(bulk) == drain(one_by_one)
+
+
+# whole hours, then fractions landing before the events already in a bucket
+@pytest.mark.parametrize('delays', [(0, 0, 1, 2, 5), (0, 0.25, 0.5, 0.75, 1.5, 3)])
+def test_backends_agree_on_interleaved_push_and_pop(delays):
+    popped = {}
+    for name in ec.calendars:
+        calendar = ec.calendars[name]()
+        rng = random.Random(3)
+        now, order = 0, []
+        for index in range(2000):
+            if calendar.is_empty() or rng.random() < 0.55:
+                # events are scheduled at the current time or later, often on the same hour
+                calendar.push(now + rng.choice(delays), fire, index)
+            else:
+                now, _, data = calendar.pop()
+                order.append((now, data))
+        popped[name] = order + [(time, data) for time, _, data in drain(calendar)]
+    reference = popped.pop('list')
+    assert reference == sorted(reference, key=lambda event: event[0])
+    for name, order in popped.items():
+        assert order == reference, name
+
+
+@pytest.mark.parametrize('name', sorted(ec.calendars))
+def test_cancelled_events_are_skipped(name):
+    calendar = ec.calendars[name]()
+    handles = [calendar.push(time, fire, time) for time in (3, 1, 2, 1)]
+    handles[1].cancel()
+    handles[1].cancel()  # cancelling twice has no effect
+    assert handles[1].cancelled
+    assert len(calendar) == 3
+    assert calendar.peek()[2] == 1
+    assert [data for _, _, data in drain(calendar)] == [1, 2, 3]
+    assert all(handle.cancelled for handle in handles)
+
+
+@pytest.mark.parametrize('name', sorted(ec.calendars))
+def test_rescheduled_events_move_after_equal_times(name):
+    calendar = ec.calendars[name]()
+    first = calendar.push(1, fire, 'first')
+    calendar.push(2, fire, 'second')
+    first.reschedule(2)
+    assert first.time == 2
+    assert len(calendar) == 2
+    # a rescheduled event is ordered as if pushed when rescheduled
+    assert [data for _, _, data in drain(calendar)] == ['second', 'first']
+    with pytest.raises(ValueError):
+        first.reschedule(3)
+
+
+@pytest.mark.parametrize('name', sorted(ec.calendars))
+def test_calendar_with_every_event_cancelled_is_empty(name):
+    calendar = ec.calendars[name]()
+    handles = calendar.push_many([(time, fire, time) for time in (2, 1, 1)])
+    for handle in handles:
+        handle.cancel()
+    assert calendar.is_empty()
+    assert len(calendar) == 0
+    assert calendar.peek() is None
+    with pytest.raises(IndexError):
+        calendar.pop()
+    calendar.push(5, fire, 'last')
+    assert calendar.peek()[2] == 'last'
+    assert calendar.pop()[2] == 'last'
+    assert calendar.peek() is None
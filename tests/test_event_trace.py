@@ -0,0 +1,48 @@
+import io
+
+import numpy as np
+
+from simulation_model import event_trace as et
+from simulation_model.build_model import Model
+from simulation_model.discrete_simulator import Simulator
+from simulation_model.main import build_scenario
+
+
+def traced_run(trace, horizon=15 * 24):
+    model = Model(*build_scenario())
+    model.trace = trace
+    Simulator().simulate(model, horizon)
+    return model
+
+
+def test_flushed_file_holds_every_record(tmp_path):
+    in_memory = et.array_trace()
+    traced_run(in_memory)
+    path = str(tmp_path / 'trace.bin')
+    # a small buffer is flushed many times, the tail when the run ends
+    traced_run(et.array_trace(capacity=7, path=path))
+    records = et.load_trace(path)
+    assert len(records) == len(in_memory.records()) > 7
+    np.testing.assert_array_equal(records, in_memory.records())
+
+
+def test_render_matches_the_text_trace():
+    stream = io.StringIO()
+    model = traced_run(et.text_trace(build_scenario()[0], stream))
+    array = et.array_trace()
+    traced_run(array)
+    assert stream.getvalue().splitlines() == et.render(array.records(), model.nodes)
+
+
+def test_ring_trace_keeps_the_latest_records():
+    array = et.array_trace()
+    traced_run(array)
+    ring = et.ring_trace(capacity=5)
+    traced_run(ring)
+    np.testing.assert_array_equal(ring.records(), array.records()[-5:])
+
+
+def test_formatted_time_is_shared():
+    assert Model.get_formatted_time is et.get_formatted_time
+    assert et.get_formatted_time(50) == 2
+    assert et.get_formatted_time(24) == 24
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from simulation_model.build_model import Model
+from simulation_model.discrete_simulator import Simulator
+from simulation_model.lockstep import Lockstep
+from simulation_model.main import build_scenario
+from simulation_model.sweep import build_fleet, fleet_sweep, lockstep_sweep
+from simulation_model.synthetic import build_network
+
+
+def network():
+    return build_network(12, trains=6, seed=4)
+
+
+@pytest.mark.parametrize('build, horizon', [(build_scenario, 15 * 24), (network, 30 * 24)])
+def test_lockstep_sweep_matches_fleet_sweep(build, horizon):
+    grid = dict(speeds=[30, 45], loading_times=[4, 8])
+    expected = fleet_sweep(*build(), 6, horizon, workers=1, early_stop=False, **grid)
+    rows = lockstep_sweep(*build(), 6, horizon, **grid)
+    assert len(rows) == len(expected) == 2 * 2 * 6
+    for name in expected.dtype.names:
+        np.testing.assert_array_equal(rows[name], expected[name], err_msg=name)
+
+
+def test_lockstep_variants_match_sequential_runs():
+    variants = [dict(trains=size, speed=speed, loading_time=loading_time)
+                for size in (1, 3, 8) for speed in (None, 55) for loading_time in (None, 3)]
+    batch = Lockstep(*network(), variants)
+    batch.simulate(30 * 24)
+
+    for index, variant in enumerate(variants):
+        nodes, terminals, templates = network()
+        for terminal in terminals:
+            if variant['loading_time'] is not None and terminal.can_load:
+                terminal.loading_time = variant['loading_time']
+        model = Model(nodes, terminals, build_fleet(templates, variant['trains'], variant['speed']))
+        model.verbose = False
+        Simulator().simulate(model, 30 * 24)
+
+        np.testing.assert_array_equal(batch.evaluate_produtivity(index)[0], model.evaluate_produtivity()[0])
+        assert batch.queue_time()[index] == model.queue_time()
+
+
+def test_resources_are_rejected():
+    nodes, terminals, trains = network()
+    terminals[0].berths = 2
+    with pytest.raises(ValueError, match='multi-berth'):
+        Lockstep(nodes, terminals, trains, [dict(trains=2)])
+    nodes, terminals, trains = network()
+    nodes[0].distance_map[0].tracks = 1
+    with pytest.raises(ValueError, match='track'):
+        Lockstep(nodes, terminals, trains, [dict(trains=2)])
@@ -0,0 +1,131 @@
+import multiprocessing
+import os
+
+import pytest
+
+from simulation_model.build_model import Model
+from simulation_model.checkpoint import encode_train
+from simulation_model.discrete_simulator import Simulator
+from simulation_model.main import build_scenario
+from simulation_model import parallel
+from simulation_model.parallel import ParallelSimulator, check_partitions, global_ranks, partition
+from simulation_model.synthetic import build_network
+
+
+def outcome(simulator, model):
+    return {
+        'time': simulator.time,
+        'queue_time': model.queue_time(),
+        'produtivity': [array.tolist() for array in model.evaluate_produtivity()],
+        'demands': [(demand.current_demand, demand.achieved_demand)
+                    for terminal in model.terminals for demand in terminal.demands],
+        'trains': [encode_train(model, train) for train in model.trains],
+        'node_queues': list(model.node_queues),
+        'terminal_queues': list(model.terminal_queues),
+    }
+
+
+def model_of(build):
+    model = Model(*build())
+    model.verbose = False
+    return model
+
+
+def regions():
+    return build_network(40, trains=60, regions=4, seed=1)
+
+
+def small_regions():
+    return build_network(8, trains=4, terminals_per_yard=3, regions=2)
+
+
+@pytest.mark.parametrize('build, partitions, parts, horizon', [
+    (build_scenario, 2, 1, 30 * 24),
+    (regions, 4, 4, 60 * 24),
+    (regions, 3, 3, 60 * 24),
+    (small_regions, 2, 2, 50000),
+])
+def test_parallel_matches_sequential_run(build, partitions, parts, horizon):
+    model = model_of(build)
+    simulator = Simulator()
+    simulator.simulate(model, horizon)
+
+    parallel_model = model_of(build)
+    assignment = partition(parallel_model, partitions)
+    assert max(assignment) + 1 == parts
+    simulated = ParallelSimulator(assignment=assignment, window=24 * 7)
+    simulated.simulate(parallel_model, horizon)
+
+    assert simulated.rounds > 1
+    assert simulated.stop_reason == simulator.stop_reason
+    assert outcome(simulated, parallel_model) == outcome(simulator, model)
+
+
+def test_partition_keeps_regions_together():
+    model = model_of(regions)
+    region = [index * 4 // 40 for index in range(40)]
+    assignment = partition(model, 4)
+    assert all((assignment[first] == assignment[second]) == (region[first] == region[second])
+               for first in range(40) for second in range(40))
+    assert max(partition(model, 8)) == 3
+    assert max(partition(model_of(build_scenario), 2)) == 0
+
+
+def test_coupled_partitions_are_rejected():
+    model = model_of(build_scenario)
+    with pytest.raises(ValueError, match='trains leaving yard 0 book the arrival register of yard 1'):
+        check_partitions(model, [0, 1])
+    model = model_of(regions)
+    assignment = partition(model, 4)
+    yard = model.topology.nearest_node[0]
+    assignment[yard] = (assignment[yard] + 1) % 4
+    with pytest.raises(ValueError, match='but'):
+        ParallelSimulator(assignment=assignment).simulate(model, 24)
+
+
+def test_unsupported_models_are_rejected():
+    model = model_of(regions)
+    model.enable_routing()
+    with pytest.raises(ValueError, match='built-in dispatch rules'):
+        check_partitions(model, partition(model, 4))
+    model = model_of(regions)
+    with pytest.raises(ValueError, match='2 partitions given for 40 yards'):
+        check_partitions(model, [0, 1])
+
+
+def test_global_ranks_merge_the_windows():
+    # partition 0 ran a start event and the event it scheduled, partition 1 a single start event
+    windows = [[(1, -1, 0), (2, 5, 0)], [(2, -1, 1)]]
+    assert global_ranks(windows, 5) == [[5, 7], [6]]
+    # both partitions number their events from 5, the merge tells them apart
+    windows = [[(1, -1, 0), (2, 5, 0)], [(1, -1, 2), (2, 5, 0)]]
+    assert global_ranks(windows, 5) == [[5, 7], [6, 8]]
+
+
+def test_dead_worker_raises():
+    connection, child = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=os._exit, args=(3,))
+    process.start()
+    try:
+        with pytest.raises(RuntimeError, match='partition 0 exited with code 3'):
+            ParallelSimulator.receive(connection, process, 0)
+    finally:
+        process.join()
+        child.close()
+
+
+run_partition = parallel.run_partition
+
+
+def exit_partition(connection, topology, index, assignment, limit):
+    if index == 1:
+        os._exit(3)
+    run_partition(connection, topology, index, assignment, limit)
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != 'fork', reason='the worker is patched in the parent')
+def test_simulate_raises_when_a_worker_dies(monkeypatch):
+    monkeypatch.setattr(parallel, 'run_partition', exit_partition)
+    model = model_of(small_regions)
+    with pytest.raises(RuntimeError, match='partition 1 exited with code 3'):
+        ParallelSimulator(partitions=2).simulate(model, 30 * 24)
@@ -0,0 +1,55 @@
+import json
+import os
+
+import numpy as np
+
+from simulation_model import cli
+from simulation_model.build_model import Model
+from simulation_model.discrete_simulator import Simulator
+from simulation_model.main import build_scenario
+from simulation_model.profiling import Profiler
+
+EXAMPLE = os.path.join(os.path.dirname(__file__), os.pardir, 'simulation_model', 'scenarios', 'example.json')
+
+
+def run(profiler=None):
+    model = Model(*build_scenario())
+    model.verbose = False
+    simulator = Simulator()
+    simulator.profiler = profiler
+    simulator.simulate(model, 15 * 24)
+    return model
+
+
+def test_profiled_run_matches_the_plain_loop():
+    samples = []
+    profiler = Profiler(sample_every=5, hooks=[lambda simulator, model: samples.append(simulator.time)])
+    profiled = run(profiler)
+    plain = run()
+    np.testing.assert_array_equal(profiled.evaluate_produtivity()[0], plain.evaluate_produtivity()[0])
+    assert profiled.queue_time() == plain.queue_time()
+
+    report = profiler.to_dict()
+    assert report['events'] == sum(callback['calls'] for callback in report['callbacks'].values()) > 0
+    assert 'starting_events' not in report['callbacks']
+    assert len(samples) == len(report['queue_length']['samples']) == report['events'] // 5
+    assert samples == sorted(samples)
+    assert report['events_per_second'] > 0
+
+
+def test_reports(tmp_path):
+    profiler = Profiler(cprofile=True)
+    run(profiler)
+    profiler.save_json(tmp_path / 'profile.json')
+    with open(tmp_path / 'profile.json') as file:
+        assert json.load(file)['events'] == profiler.events
+    summary = profiler.summary(top=5)
+    assert summary.startswith(f'{profiler.events} events')
+    assert 'cumulative' in summary
+
+
+def test_run_command_writes_a_profile(tmp_path, capsys):
+    cli.main(['run', EXAMPLE, '--horizon', '48', '--profile', str(tmp_path), '--output', str(tmp_path / 'out.csv')])
+    with open(tmp_path / 'example.json') as file:
+        assert json.load(file)['events'] > 0
+    assert 'events/s' in capsys.readouterr().err
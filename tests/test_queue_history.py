@@ -0,0 +1,42 @@
+import numpy as np
+
+from simulation_model import queue_history as qh
+from simulation_model.build_model import Model
+from simulation_model.discrete_simulator import Simulator
+from simulation_model.main import build_scenario
+from simulation_model.synthetic import build_network
+
+
+def simulate(build, horizon):
+    model = Model(*build())
+    model.verbose = False
+    model.history = qh.QueueHistory(capacity=4)
+    Simulator().simulate(model, horizon)
+    return model
+
+
+def test_wait_records_index_their_own_resource():
+    model = simulate(lambda: build_network(12, trains=20, seed=1), 30 * 24)
+    records = model.history.records()
+    terminal_waits = records[records['kind'] == qh.TERMINAL_WAIT]
+    node_waits = records[records['kind'] == qh.NODE_WAIT]
+    assert len(terminal_waits) and len(node_waits)
+    assert terminal_waits['index'].max() < len(model.terminals)
+    assert node_waits['index'].max() < len(model.nodes)
+
+    waits = model.history.queue_waits()
+    assert len(waits) == len(terminal_waits) + len(node_waits)
+    assert waits[:, 1].sum() == model.queue_time()
+    by_kind = [model.history.queue_waits(kind)[:, 1].sum() for kind in (qh.TERMINAL_WAIT, qh.NODE_WAIT)]
+    assert sum(by_kind) == model.queue_time()
+
+
+def test_queues_rebuild_the_registers():
+    model = simulate(build_scenario, 15 * 24)
+    for index, register in enumerate(model.terminal_queues):
+        assert model.history.queue(qh.TERMINAL_QUEUE, index)[-1] == register
+    for index, register in enumerate(model.node_queues):
+        assert model.history.queue(qh.NODE_QUEUE, index)[-1] == register
+    for index in range(len(model.terminals)):
+        waits = model.history.queue_waits(qh.TERMINAL_WAIT, index)
+        assert np.all(waits[:, 1] >= 0)
@@ -0,0 +1,161 @@
+import asyncio
+import json
+import os
+
+import numpy as np
+import pytest
+
+from simulation_model import cli
+from simulation_model import event_trace as et
+from simulation_model import realtime
+from simulation_model import termination
+from simulation_model.build_model import Model
+from simulation_model.discrete_simulator import Simulator
+from simulation_model.main import build_scenario
+from simulation_model.sweep import build_fleet
+
+EXAMPLE = os.path.join(os.path.dirname(__file__), os.pardir, 'simulation_model', 'scenarios', 'example.json')
+
+
+def fleet(size=6):
+    nodes, terminals, trains = build_scenario()
+    model = Model(nodes, terminals, build_fleet(trains, size))
+    model.verbose = False
+    return model
+
+
+def results(model):
+    return model.evaluate_produtivity()[0].tolist(), model.queue_time()
+
+
+@pytest.mark.parametrize('seconds_per_hour', [None, 1e-6])
+def test_runner_matches_the_simulator(seconds_per_hour):
+    expected = fleet()
+    simulator = Simulator()
+    simulator.simulate(expected, 30 * 24)
+
+    model = fleet()
+    model.trace = et.array_trace(capacity=4)
+    runner = realtime.RealTimeRunner(Simulator(), model, seconds_per_hour=seconds_per_hour, yield_every=8)
+    asyncio.run(runner.run(30 * 24))
+    assert results(model) == results(expected)
+    assert runner.events == len(model.trace.records())
+    assert runner.simulator.stop_reason == simulator.stop_reason == 'horizon'
+
+
+def test_subscriptions_drop_the_oldest_updates():
+    async def session():
+        runner = realtime.RealTimeRunner(Simulator(), fleet())
+        everything = runner.subscribe(maxsize=100000)
+        latest = runner.subscribe(maxsize=4)
+        await runner.run(10 * 24)
+        return runner, [update async for update in everything], [update async for update in latest]
+
+    runner, everything, latest = asyncio.run(session())
+    assert len(everything) == runner.events
+    assert latest == everything[-3:]  # the close marker takes the last slot
+    assert runner.subscriptions[1].dropped == runner.events - 3
+    assert {'time', 'event', 'train', 'origin', 'destiny', 'unmet_demands'} <= set(everything[0])
+
+
+def stop_at(callback, followers):
+    """ Runs until a train waits for `callback` with `followers` trains queued behind it
+    """
+    def queued(simulator, model):
+        for index, handle in enumerate(model.pending_events):
+            if handle is not None and not handle.cancelled and handle.callback.__name__ == callback:
+                behind = [other for other, pending in enumerate(model.pending_events)
+                          if pending is not None and not pending.cancelled and pending.callback.__name__ == callback
+                          and pending.data[1] == handle.data[1] and pending.time > handle.time]
+                if len(behind) >= followers:
+                    stop_at.train, stop_at.behind = index, behind
+                    return True
+        return False
+
+    model = fleet(8)
+    simulator = Simulator()
+    simulator.simulate(model, 60 * 24, until=termination.Predicate(queued, name='queued'))
+    assert simulator.stop_reason == 'queued'
+    return simulator, model, stop_at.train, stop_at.behind
+
+
+@pytest.mark.parametrize('callback, register', [('from_port2port', 'node_queues'),
+                                                ('on_finish_unloading', 'terminal_queues')])
+def test_breakdown_delays_the_trains_queued_behind(callback, register):
+    simulator, model, train, behind = stop_at(callback, 1)
+    destiny = model.pending_events[train].data[1]
+    times = [handle.time for handle in model.pending_events]
+    queue = getattr(model, register)[destiny]
+    forecast = model.terminal_queues_forecast[destiny]
+    others = [index for index in range(len(times)) if index != train and index not in behind]
+
+    realtime.breakdown(train, 5)(simulator, model)
+    for index in [train] + behind:
+        assert model.pending_events[index].time == times[index] + 5
+    for index in others:
+        assert model.pending_events[index].time == times[index]
+    assert getattr(model, register)[destiny] == queue + 5
+    if register == 'terminal_queues':
+        assert model.terminal_queues_forecast[destiny] == forecast + 5
+    simulator.simulate(model, 60 * 24, resume=True)
+
+
+def test_breakdown_at_a_multi_berth_terminal_delays_the_train_alone():
+    nodes, terminals, trains = build_scenario()
+    terminals[1].berths = 2
+    model = Model(nodes, terminals, build_fleet(trains, 6))
+    model.verbose = False
+    simulator = Simulator()
+    simulator.simulate(model, 0)
+    times = [handle.time for handle in model.pending_events]
+    queue = model.terminal_queues[1]
+    train = next(index for index, handle in enumerate(model.pending_events) if handle.data[1] == 1)
+
+    realtime.breakdown(train, 5)(simulator, model)
+    assert [handle.time for handle in model.pending_events] == [
+        time + 5 if index == train else time for index, time in enumerate(times)]
+    assert model.terminal_queues[1] == queue
+
+
+def test_breakdowns_of_the_local_dispatcher_delay_the_run():
+    async def session(probability):
+        runner = realtime.RealTimeRunner(Simulator(), fleet())
+        dispatcher = realtime.LocalDispatcher(runner, runner.subscribe(), probability, repair_time=12, seed=1)
+        await asyncio.gather(runner.run(30 * 24), dispatcher.run())
+        return runner, dispatcher
+
+    runner, dispatcher = asyncio.run(session(0.5))
+    nominal, _ = asyncio.run(session(0))
+    assert dispatcher.sent == runner.external_events > 0
+    assert results(runner.model)[0][-1] < results(nominal.model)[0][-1]
+
+
+def test_new_demand_reopens_a_met_demand():
+    model = fleet()
+    Simulator().simulate(model, 24 * 365)
+    assert model.unmet_demands == 0
+    realtime.new_demand(1, 0, 1e9)(None, model)
+    assert model.unmet_demands == 1
+    with pytest.raises(ValueError):
+        realtime.new_demand(0, 1, 1000)(None, model)
+
+
+def test_cancelled_run_reports_it():
+    async def session():
+        runner = realtime.RealTimeRunner(Simulator(), fleet(), seconds_per_hour=1)
+        task = asyncio.ensure_future(runner.run(30 * 24))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return runner
+
+    assert asyncio.run(session()).simulator.stop_reason == 'cancelled'
+
+
+def test_realtime_command_streams_json_lines(capsys):
+    cli.main(['realtime', EXAMPLE, '--horizon', '48', '--breakdown-probability', '0'])
+    captured = capsys.readouterr()
+    lines = [json.loads(line) for line in captured.out.splitlines()]
+    assert lines and all(line['time'] <= 48 or line is lines[-1] for line in lines)
+    assert 'stopped by horizon' in captured.err
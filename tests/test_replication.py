@@ -0,0 +1,34 @@
+import pickle
+
+import numpy as np
+
+from simulation_model.main import build_scenario
+from simulation_model.replication import replicate, run_replication, summarize
+
+
+def test_replications_are_reproducible_by_seed():
+    first = replicate(*build_scenario(), 300, replications=4, workers=1)
+    second = replicate(*build_scenario(), 300, seeds=[3, 2, 1, 0], workers=1)
+    np.testing.assert_array_equal(first['seeds'], [0, 1, 2, 3])
+    np.testing.assert_array_equal(second['productivity'], first['productivity'][::-1])
+    np.testing.assert_array_equal(second['queue_time'], first['queue_time'][::-1])
+    # the perturbation makes the replications differ
+    assert len(set(first['queue_time'].tolist())) > 1
+
+    productivity, queue_time = run_replication(2, 300, topology=pickle.dumps(build_scenario()))
+    assert (productivity, queue_time) == (first['productivity'][2], first['queue_time'][2])
+
+
+def test_worker_pool_matches_in_process_runs():
+    in_process = replicate(*build_scenario(), 300, replications=4, workers=1)
+    pooled = replicate(*build_scenario(), 300, replications=4, workers=2)
+    np.testing.assert_array_equal(pooled['productivity'], in_process['productivity'])
+    np.testing.assert_array_equal(pooled['queue_time'], in_process['queue_time'])
+
+
+def test_summarize():
+    summary = summarize([1, 2, 3, np.nan])
+    assert summary['mean'] == 2
+    assert summary['std'] == 1
+    assert summary['ci'][0] < 2 < summary['ci'][1]
+    np.testing.assert_allclose(summary['quantiles'], [1.1, 2, 2.9])
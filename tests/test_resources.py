@@ -0,0 +1,53 @@
+import pytest
+
+from simulation_model import dispatch
+from simulation_model.build_model import Model
+from simulation_model.discrete_simulator import Simulator
+from simulation_model.main import build_scenario
+from simulation_model.resources import Resource
+from simulation_model.sweep import build_fleet
+
+
+def run(tracks=None, berths=1, fleet=8, horizon=30 * 24, policy=None):
+    nodes, terminals, trains = build_scenario()
+    for node in nodes:
+        for dist_map in node.distance_map:
+            dist_map.tracks = tracks
+    for terminal in terminals:
+        terminal.berths = berths
+    model = Model(nodes, terminals, build_fleet(trains, fleet))
+    model.verbose = False
+    model.policy = policy
+    Simulator().simulate(model, horizon)
+    return model.evaluate_produtivity()[0][-1], model.queue_time()
+
+
+def test_enough_tracks_match_no_track_constraint():
+    assert run(tracks=100) == run(tracks=None)
+
+
+def test_tracks_never_beat_no_track_constraint():
+    productivity = [run(tracks=tracks)[0] for tracks in (1, 2, 3, None)]
+    assert productivity == sorted(productivity)
+
+
+def test_single_berth_keeps_the_terminal_register():
+    model = Model(*build_scenario())
+    model.clear()
+    assert model.berths is None
+    assert run(berths=1) == run()
+
+
+def test_berths_add_capacity_and_keep_the_policy_heaps_in_sync():
+    assert run(berths=2)[0] > run(berths=1)[0]
+    assert run(berths=2, policy=dispatch.ShortestExpectedWait()) == run(berths=2)
+
+
+def test_resource_serves_the_first_free_unit():
+    resource = Resource(2)
+    assert resource.request(0, 10) == 0
+    assert resource.request(0, 5) == 0
+    assert resource.request(1, 3) == 5
+    assert resource.next_free() == 8
+    with pytest.raises(ValueError):
+        Resource(0)
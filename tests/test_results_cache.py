@@ -0,0 +1,117 @@
+import os
+
+import numpy as np
+
+from simulation_model import event_trace as et
+from simulation_model.build_model import Model
+from simulation_model.discrete_simulator import Simulator
+from simulation_model.main import build_scenario
+from simulation_model.replication import replicate
+from simulation_model.results_cache import ResultsCache
+
+
+def model_of(build=build_scenario):
+    model = Model(*build())
+    model.verbose = False
+    return model
+
+
+def outcome(simulator, model):
+    return {
+        'time': simulator.time,
+        'stop_reason': simulator.stop_reason,
+        'queue_time': model.queue_time(),
+        'produtivity': [array.tolist() for array in model.evaluate_produtivity()],
+        'demands': [demand.current_demand for terminal in model.terminals for demand in terminal.demands],
+        'unmet_demands': model.unmet_demands,
+    }
+
+
+def test_hit_reproduces_the_run(tmp_path):
+    cache = ResultsCache(str(tmp_path))
+    simulator, model = Simulator(), model_of()
+    assert not cache.simulate(simulator, model, 30 * 24)
+    cached_simulator, cached_model = Simulator(), model_of()
+    assert cache.simulate(cached_simulator, cached_model, 30 * 24)
+    assert outcome(cached_simulator, cached_model) == outcome(simulator, model)
+
+
+def test_hit_restores_the_trace(tmp_path):
+    cache = ResultsCache(str(tmp_path))
+    simulator, model = Simulator(), model_of()
+    model.trace = et.array_trace()
+    assert not cache.simulate(simulator, model, 30 * 24)
+    cached_model = model_of()
+    cached_model.trace = et.array_trace()
+    assert cache.simulate(Simulator(), cached_model, 30 * 24)
+    assert len(model.trace.records())
+    np.testing.assert_array_equal(cached_model.trace.records(), model.trace.records())
+
+
+def test_trace_sink_is_part_of_the_key(tmp_path):
+    cache = ResultsCache(str(tmp_path))
+    assert not cache.simulate(Simulator(), model_of(), 30 * 24)
+    traced = model_of()
+    traced.trace = et.array_trace()
+    assert not cache.simulate(Simulator(), traced, 30 * 24)  # the untraced entry has no trace to restore
+    assert len(traced.trace.records())
+    ring = model_of()
+    ring.trace = et.ring_trace(capacity=4)
+    assert not cache.simulate(Simulator(), ring, 30 * 24)
+    larger = model_of()
+    larger.trace = et.ring_trace(capacity=8)
+    assert not cache.simulate(Simulator(), larger, 30 * 24)
+    again = model_of()
+    again.trace = et.ring_trace(capacity=4)
+    assert cache.simulate(Simulator(), again, 30 * 24)
+    np.testing.assert_array_equal(again.trace.records(), ring.trace.records())
+    assert again.trace.count == ring.trace.count
+
+
+def test_hit_into_a_text_trace_prints_nothing(tmp_path, capsys):
+    cache = ResultsCache(str(tmp_path))
+    model = Model(*build_scenario())
+    assert not cache.simulate(Simulator(), model, 30 * 24)
+    assert capsys.readouterr().out
+    cached_simulator, cached_model = Simulator(), Model(*build_scenario())
+    assert cache.simulate(cached_simulator, cached_model, 30 * 24)
+    assert capsys.readouterr().out == ''
+    assert outcome(cached_simulator, cached_model)['produtivity'] == [
+        array.tolist() for array in model.evaluate_produtivity()]
+
+
+def test_replicate_skips_cached_replications(tmp_path, monkeypatch):
+    cache = ResultsCache(str(tmp_path))
+    expected = replicate(*build_scenario(), 300, replications=6, workers=1)
+    replicate(*build_scenario(), 300, replications=4, workers=1, cache=cache)
+
+    runs = []
+    simulate = Simulator.simulate
+
+    def counting(self, *args, **kwargs):
+        runs.append(args)
+        return simulate(self, *args, **kwargs)
+
+    monkeypatch.setattr(Simulator, 'simulate', counting)
+    results = replicate(*build_scenario(), 300, replications=6, workers=1, cache=cache)
+    assert len(runs) == 2
+    np.testing.assert_array_equal(results['productivity'], expected['productivity'])
+    np.testing.assert_array_equal(results['queue_time'], expected['queue_time'])
+
+
+def test_evicts_the_least_recently_used_entries(tmp_path):
+    cache = ResultsCache(str(tmp_path))
+    keys = []
+    for horizon in (100, 200, 300):
+        simulator, model = Simulator(), model_of()
+        key = cache.key(model.nodes, model.terminals, model.trains, horizon)
+        simulator.simulate(model, horizon)
+        cache.put(key, simulator, model)
+        keys.append(key)
+    for age, key in zip((3, 2, 1), keys):
+        os.utime(cache.path(key), ns=(0, 10 ** 9 * (100 - age)))
+
+    assert cache.get(keys[0]) is not None  # the oldest entry becomes the most recent
+    cache.max_bytes = cache.size() - 1
+    cache.evict()
+    assert [key in cache for key in keys] == [True, False, True]
@@ -0,0 +1,85 @@
+import os
+
+import numpy as np
+import pytest
+
+from simulation_model import routing
+from simulation_model.build_model import Model
+from simulation_model.discrete_simulator import Simulator
+from simulation_model.node import Node
+from simulation_model.synthetic import build_network
+from simulation_model.topology import Topology
+from simulation_model.train import Train
+
+
+class RecordingModel(Model):
+    ''' Model keeping its routed (origin, target, next yard) decisions
+    '''
+
+    def clear(self):
+        super().clear()
+        self.hops = []
+
+    def get_closest_node(self, train, time):
+        origin = self.topology.node_index[train.origin]
+        target = self.get_route_target(train, origin)
+        destiny, transit_time = super().get_closest_node(train, time)
+        self.hops.append((origin, target, destiny))
+        return destiny, transit_time
+
+
+def test_floyd_warshall_matches_dijkstra():
+    nodes, terminals, _ = build_network(40, trains=1, neighbours=3, seed=4)
+    topology = Topology(nodes, terminals)
+    fw = routing.build_routing(topology, 'floyd_warshall')
+    dj = routing.build_routing(topology, 'dijkstra')
+    np.testing.assert_allclose(fw.distance, dj.distance)
+    for origin in range(len(nodes)):
+        for destiny in range(len(nodes)):
+            path = fw.path(origin, destiny)
+            if not path:
+                assert np.isinf(dj.distance[origin, destiny])
+                continue
+            length = sum(fw.distance[a, b] for a, b in zip(path, path[1:]))
+            assert path[0] == origin and path[-1] == destiny
+            assert length == pytest.approx(dj.distance[origin, destiny])
+
+
+def test_routing_tables_are_cached(tmp_path):
+    nodes, terminals, _ = build_network(15, trains=1, seed=1)
+    topology = Topology(nodes, terminals)
+    built = routing.build_routing(topology, cache_dir=str(tmp_path))
+    assert len(os.listdir(tmp_path)) == 1
+    cached = routing.build_routing(topology, cache_dir=str(tmp_path))
+    np.testing.assert_array_equal(built.distance, cached.distance)
+    np.testing.assert_array_equal(built.next_hop, cached.next_hop)
+
+
+def test_get_next_hop_raises_when_unreachable():
+    node_a = Node(node_id=0, node_name='Patio A')
+    node_b = Node(node_id=1, node_name='Patio B')
+    node_a.set_distance_map(node_b, 800)
+    train = Train(train_id=0, load=0, speed_loaded=40, speed_empty=50)
+    model = Model([node_a, node_b], [], [train])
+    model.enable_routing()
+
+    train.set_origin(node_a)
+    assert model.get_next_hop(train, 1) == (1, 16)
+    train.set_origin(node_b)
+    with pytest.raises(ValueError):
+        model.get_next_hop(train, 0)
+
+
+def test_routed_dispatch_follows_the_routing_table():
+    model = RecordingModel(*build_network(30, trains=30, neighbours=4, seed=2))
+    model.verbose = False
+    model.enable_routing()
+    Simulator().simulate(model, 24 * 60)
+
+    routed = [(origin, target, destiny) for origin, target, destiny in model.hops
+              if target is not None and target != origin]
+    assert routed
+    for origin, target, destiny in routed:
+        assert destiny == model.routing.next_hop[origin, target]
+    assert any(destiny != model.topology.nearest_node[origin] for origin, _, destiny in routed)
+    assert model.evaluate_produtivity()[0][-1] > 0
@@ -0,0 +1,77 @@
+import copy
+import json
+import os
+
+import pytest
+
+from simulation_model.build_model import Model
+from simulation_model.discrete_simulator import Simulator
+from simulation_model.main import build_scenario
+from simulation_model.scenario import load_scenario, read_config, validate
+
+SCENARIOS = os.path.join(os.path.dirname(__file__), os.pardir, 'simulation_model', 'scenarios')
+
+
+def simulate(nodes, terminals, trains, horizon=15 * 24):
+    model = Model(nodes, terminals, trains)
+    model.verbose = False
+    Simulator().simulate(model, horizon)
+    return model.evaluate_produtivity()[0].tolist(), model.queue_time()
+
+
+def example_config():
+    return copy.deepcopy(read_config(os.path.join(SCENARIOS, 'example.json')))
+
+
+@pytest.mark.parametrize('name', ['example.json', 'example.toml'])
+def test_example_scenario_matches_the_built_in_example(tmp_path, name):
+    path = os.path.join(SCENARIOS, name)
+    expected = simulate(*build_scenario())
+    assert simulate(*load_scenario(path).build()) == expected
+    load_scenario(path, tmp_path)
+    assert simulate(*load_scenario(path, tmp_path).build()) == expected  # from the binary cache
+
+
+@pytest.mark.parametrize('section, value', [('terminals', 'A'), ('terminals', 1.5), ('nodes', True)])
+def test_non_integer_ids_are_validation_errors(section, value):
+    config = example_config()
+    config[section][0]['id'] = value
+    with pytest.raises(ValueError, match=f'{section} 0 id: expected an integer, got {value!r}'):
+        validate(config)
+
+
+def test_non_integer_counts_are_validation_errors(tmp_path):
+    config = example_config()
+    config['terminals'][0]['berths'] = 1.5
+    config['trains'][0]['count'] = 2.0
+    path = tmp_path / 'scenario.json'
+    path.write_text(json.dumps(config))
+    with pytest.raises(ValueError) as error:
+        load_scenario(str(path))
+    assert 'terminal 0 berths: expected a positive integer' in str(error.value)
+    assert 'train 0 count: expected a positive integer' in str(error.value)
+
+
+@pytest.mark.parametrize('change, message', [
+    (lambda config: config.update(terminals='A'), "terminals: expected a list, got 'A'"),
+    (lambda config: config['nodes'].append([1]), 'nodes 2: expected a mapping, got [1]'),
+    (lambda config: config['links'].__setitem__(0, 'A-B'), "links 0: expected a mapping, got 'A-B'"),
+    (lambda config: config['nodes'][0].update(terminals=0), 'node 0 terminals: expected a list, got 0'),
+    (lambda config: config['nodes'][0]['terminals'].append([1]), 'node 0: unknown terminal [1]'),
+    (lambda config: config.update(simulation=[360]), 'simulation: expected a mapping, got [360]'),
+])
+def test_malformed_entries_are_validation_errors(change, message):
+    config = example_config()
+    change(config)
+    with pytest.raises(ValueError, match=message.replace('[', r'\[').replace(']', r'\]')):
+        validate(config)
+
+
+@pytest.mark.parametrize('load', [-1, 'heavy', None])
+def test_train_load_must_be_non_negative(load):
+    config = example_config()
+    config['trains'][0]['load'] = load
+    with pytest.raises(ValueError, match=f'train 0 load: expected a non-negative number, got {load!r}'):
+        validate(config)
+    config['trains'][0]['load'] = 0
+    validate(config)
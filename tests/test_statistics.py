@@ -0,0 +1,14 @@
+from simulation_model.build_model import Model
+from simulation_model.discrete_simulator import Simulator
+from simulation_model.main import build_scenario
+
+
+def test_queue_time_matches_the_statistics_and_is_cleared():
+    model = Model(*build_scenario())
+    model.verbose = False
+    Simulator().simulate(model, 15 * 24)
+    assert model.queue_time() > 0
+    assert model.queue_time() == model.stats.total_queue_time
+
+    model.clear()
+    assert model.queue_time() == model.stats.total_queue_time == 0
@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+
+from simulation_model import checkpoint
+from simulation_model import stochastic
+from simulation_model.build_model import Model
+from simulation_model.discrete_simulator import Simulator
+from simulation_model.main import build_scenario
+from simulation_model.synthetic import build_network
+
+
+def random_times(seed=1, **kwargs):
+    options = {
+        'loading': lambda terminal: stochastic.Exponential(terminal.loading_time) if terminal.can_load else None,
+        'unloading': stochastic.LogNormal(8, 0.5),
+        'transit_delay': stochastic.Triangular(0, 0, 3),
+        'breakdown': stochastic.Breakdown(stochastic.Exponential(200), stochastic.Empirical([5, 10, 20])),
+    }
+    options.update(kwargs)
+    return stochastic.RandomTimes(seed=seed, **options)
+
+
+def run(build, randomness, horizon=30 * 24):
+    model = Model(*build())
+    model.verbose = False
+    model.randomness = randomness
+    Simulator().simulate(model, horizon)
+    return model.evaluate_produtivity()[0].tolist(), model.queue_time()
+
+
+def network():
+    return build_network(12, trains=20, seed=5)
+
+
+def test_same_seed_reproduces_the_run():
+    assert run(network, random_times(seed=1)) == run(network, random_times(seed=1))
+    assert run(network, random_times(seed=1)) != run(network, random_times(seed=2))
+
+
+def test_constant_distributions_keep_the_nominal_run():
+    randomness = stochastic.RandomTimes(loading={0: stochastic.Triangular(7, 7, 7)},
+                                        transit_delay=stochastic.Triangular(0, 0, 0))
+    assert run(build_scenario, randomness) == run(build_scenario, None)
+
+
+def test_every_entity_has_its_own_stream():
+    def samples(randomness, build):
+        model = Model(*build())
+        randomness.bind(model)
+        loading = [stream and [stream.next() for _ in range(5)] for stream in randomness.loading_streams]
+        transit = [stream and [stream.next() for _ in range(5)] for stream in randomness.transit_streams]
+        return loading, transit
+
+    loading, transit = samples(random_times(), network)
+    assert loading[0] != loading[1] and transit[0] != transit[1]
+    # the streams of an entity do not depend on the other entities or kinds
+    other_loading, other_transit = samples(random_times(unloading=None, breakdown=None,
+                                                        transit_delay={1: stochastic.Triangular(0, 0, 3)}), network)
+    assert other_loading == loading
+    assert other_transit[0] is None and other_transit[1] == transit[1]
+    # and do not depend on the block size
+    assert samples(random_times(block=3), network) == (loading, transit)
+
+
+def test_breakdowns_add_repair_time():
+    nominal = stochastic.RandomTimes(seed=1)
+    broken = stochastic.RandomTimes(seed=1, breakdown=stochastic.Breakdown(stochastic.Exponential(50),
+                                                                          stochastic.Triangular(20, 20, 20)))
+    model = Model(*build_scenario())
+    nominal.bind(model)
+    broken.bind(model)
+    assert nominal.transit_time(0, 100) == 100
+    times = [broken.transit_time(0, 100) for _ in range(20)]
+    assert all(time >= 100 and (time - 100) % 20 == 0 for time in times)
+    assert max(times) > 100
+
+
+@pytest.mark.parametrize('time_between', [stochastic.Triangular(0, 0, 0), stochastic.Empirical([-1])])
+def test_time_between_failures_must_be_positive(time_between):
+    randomness = stochastic.RandomTimes(breakdown=stochastic.Breakdown(time_between, stochastic.Exponential(5)))
+    with pytest.raises(ValueError, match='must be positive'):
+        run(build_scenario, randomness)
+
+
+def test_resume_continues_the_streams(tmp_path):
+    def build():
+        model = Model(*network())
+        model.verbose = False
+        model.randomness = random_times()
+        return model
+
+    model = build()
+    Simulator().simulate(model, 30 * 24)
+    expected = model.evaluate_produtivity()[0], model.queue_time()
+
+    model = build()
+    simulator = Simulator()
+    simulator.simulate(model, 10 * 24)
+    checkpoint.save_checkpoint(tmp_path / 'run.ckpt', simulator, model)
+    model = build()
+    simulator = Simulator()
+    checkpoint.load_checkpoint(tmp_path / 'run.ckpt', simulator, model)
+    simulator.simulate(model, 30 * 24, resume=True)
+    np.testing.assert_array_equal(model.evaluate_produtivity()[0], expected[0])
+    assert model.queue_time() == expected[1]
+
+    model = build()
+    model.randomness = None
+    with pytest.raises(ValueError, match='random times'):
+        checkpoint.load_checkpoint(tmp_path / 'run.ckpt', Simulator(), model)
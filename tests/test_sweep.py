@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from simulation_model.main import build_scenario
+from simulation_model.performance import analytical_productivity
+from simulation_model.sweep import build_fleet, fleet_sweep, is_saturated
+
+
+def test_sweep_follows_the_analytical_bound():
+    nodes, terminals, trains = build_scenario()
+    rows = fleet_sweep(nodes, terminals, trains, 8, 60 * 24, workers=1, early_stop=False)
+    np.testing.assert_array_equal(rows['trains'], np.arange(1, 9))
+    expected = [analytical_productivity(size, terminals, 40) for size in range(1, 9)]
+    np.testing.assert_allclose(rows['Pa'], expected)
+    # a single train never queues and runs the analytical cycle
+    assert rows['queue_time'][0] == 0
+    assert rows['Pn'][0] == pytest.approx(rows['Pa'][0], rel=0.05)
+    # larger fleets saturate the loading terminal below the bound
+    assert (rows['Pn'][1:] < rows['Pa'][1:]).all()
+
+
+def test_worker_pool_matches_in_process_sweep():
+    grid = dict(speeds=[30, 45], loading_times=[4, 8])
+    in_process = fleet_sweep(*build_scenario(), 4, 30 * 24, workers=1, early_stop=False, **grid)
+    pooled = fleet_sweep(*build_scenario(), 4, 30 * 24, workers=2, early_stop=False, **grid)
+    assert len(in_process) == 2 * 2 * 4
+    np.testing.assert_array_equal(pooled, in_process)
+
+
+def test_saturation():
+    assert not is_saturated([1, 2, 3], [1, 2, 3], 1.5, 0.01, 2)
+    assert is_saturated([1, 2, 2, 2], [1, 2, 3, 4], 1.5, 0.01, 2)
+    # no early stop before the analytical max number of trains
+    assert not is_saturated([1, 2, 2, 2], [1, 2, 3, 4], 3.5, 0.01, 2)
+
+
+def test_build_fleet_cycles_the_templates():
+    _, _, templates = build_scenario()
+    fleet = build_fleet(templates, 5, speed=20)
+    assert [train.train_id for train in fleet] == list(range(5))
+    assert all(train.speed_loaded == 20 for train in fleet)
+    assert fleet[0].speed_empty == pytest.approx(47 / 2)
+    assert all(train.origin is templates[0].origin for train in fleet)
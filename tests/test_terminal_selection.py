@@ -0,0 +1,46 @@
+import pytest
+
+from simulation_model.build_model import Model
+from simulation_model.discrete_simulator import Simulator
+from simulation_model.main import build_scenario
+from simulation_model.synthetic import build_network
+
+
+def dispatch(build, threshold, horizon=30 * 24):
+    model = Model(*build())
+    model.verbose = False
+    model.vectorize_threshold = threshold
+    Simulator().simulate(model, horizon)
+    return (model.queue_time(), [demand.current_demand for terminal in model.terminals
+                                 for demand in terminal.demands])
+
+
+@pytest.mark.parametrize('terminals_per_yard', [3, 12])
+def test_vectorized_selection_matches_the_loop(terminals_per_yard):
+    def build():
+        return build_network(30, trains=40, terminals_per_yard=terminals_per_yard, seed=3)
+
+    # below the candidate count every choice is vectorized, above it none is
+    assert dispatch(build, 1) == dispatch(build, terminals_per_yard + 1)
+
+
+def test_missing_service_times_count_as_infinite():
+    model = Model(*build_scenario())
+    model.verbose = False
+    model.clear()
+    # yard B holds two unloading terminals: none of them can load
+    for threshold in (1, 3):
+        model.vectorize_threshold = threshold
+        model.terminal_queues_forecast[:] = 0
+        assert model.get_next_terminal(0, 1, [None, None], True) == 1
+        assert model.terminal_queues_forecast[1] == float('inf')
+        model.terminal_queues_forecast[:] = 0
+        assert model.get_next_terminal(0, 1, [None, None], False) == 1
+        assert model.terminal_queues_forecast[1] == 6
+
+
+def test_candidates_are_keyed_by_node():
+    model = Model(*build_network(10, trains=5, terminals_per_yard=4, seed=1))
+    for index in range(len(model.nodes)):
+        assert model.topology.candidates(index).tolist() == model.topology.related_terminals[index]
+    assert model.topology.candidates(0) is model.topology.candidates(0)
@@ -0,0 +1,106 @@
+import csv
+import os
+
+import numpy as np
+import pytest
+
+from simulation_model import checkpoint
+from simulation_model import cli
+from simulation_model import termination
+from simulation_model.build_model import Model
+from simulation_model.discrete_simulator import Simulator
+from simulation_model.main import build_scenario
+from simulation_model.profiling import Profiler
+
+EXAMPLE = os.path.join(os.path.dirname(__file__), os.pardir, 'simulation_model', 'scenarios', 'example.json')
+
+
+def run(horizon, until=None, profiler=None):
+    model = Model(*build_scenario())
+    model.verbose = False
+    simulator = Simulator()
+    simulator.profiler = profiler
+    simulator.simulate(model, horizon, until=until)
+    return simulator, model
+
+
+def test_steady_state_needs_two_bins():
+    with pytest.raises(ValueError):
+        termination.SteadyState(min_bins=1)
+    termination.SteadyState(min_bins=2)
+
+
+def test_all_demands_met_stops_before_the_horizon():
+    model = Model(*build_scenario())
+    model.verbose = False
+    simulator = Simulator()
+    simulator.simulate(model, 24 * 365, until=[termination.AllDemandsMet()])
+    assert simulator.stop_reason == 'all_demands_met'
+    assert model.unmet_demands == 0
+    assert simulator.time < 24 * 365
+
+
+def test_steady_state_stops_a_long_run():
+    model = Model(*build_scenario())
+    model.verbose = False
+    for terminal in model.terminals:
+        for demand in terminal.demands:
+            demand.total_demand = 1e12
+    simulator = Simulator()
+    simulator.simulate(model, 24 * 3650, until=termination.SteadyState(relative_width=0.2, min_bins=2))
+    assert simulator.stop_reason == 'steady_state'
+
+
+def test_stop_reason_without_conditions():
+    simulator, _ = run(24)
+    assert simulator.stop_reason == 'horizon'
+    simulator, model = run(24 * 365)
+    assert model.unmet_demands == 0
+    assert simulator.stop_reason in ('horizon', 'empty')
+
+
+def test_predicates_and_functions_report_their_name():
+    def late(simulator, model):
+        return simulator.time > 100
+
+    simulator, _ = run(24 * 30, until=late)
+    assert simulator.stop_reason == 'late'
+    assert 100 < simulator.time < 24 * 30
+    simulator, _ = run(24 * 30, until=[termination.Predicate(late, every=3, name='after 100 h')])
+    assert simulator.stop_reason == 'after 100 h'
+
+
+def test_profiled_run_stops_at_the_same_event():
+    condition = termination.AllDemandsMet()
+    plain, plain_model = run(24 * 365, until=condition)
+    profiled, profiled_model = run(24 * 365, until=condition, profiler=Profiler())
+    assert (profiled.time, profiled.stop_reason) == (plain.time, plain.stop_reason)
+    np.testing.assert_array_equal(profiled_model.evaluate_produtivity()[0], plain_model.evaluate_produtivity()[0])
+
+
+def test_wall_clock_budget():
+    simulator, _ = run(24 * 365 * 100, until=termination.WallClock(0, check_every=1))
+    assert simulator.stop_reason == 'wall_clock'
+
+
+def test_resume_recounts_the_unmet_demands(tmp_path):
+    simulator, model = run(5 * 24)
+    checkpoint.save_checkpoint(tmp_path / 'run.ckpt', simulator, model)
+    model = Model(*build_scenario())
+    model.verbose = False
+    simulator = Simulator()
+    checkpoint.load_checkpoint(tmp_path / 'run.ckpt', simulator, model)
+    assert model.unmet_demands == model.count_unmet_demands()
+    simulator.simulate(model, 24 * 365, resume=True, until=termination.AllDemandsMet())
+    assert simulator.stop_reason == 'all_demands_met'
+    full, full_model = run(24 * 365, until=termination.AllDemandsMet())
+    assert (simulator.time, model.queue_time()) == (full.time, full_model.queue_time())
+
+
+def test_run_command_reports_the_stop_reason(tmp_path):
+    output = tmp_path / 'results.csv'
+    cli.main(['run', EXAMPLE, '--horizon', str(24 * 365), '--until-demands-met', '--output', str(output)])
+    with open(output, newline='') as file:
+        row = next(csv.DictReader(file))
+    assert row['stop_reason'] == 'all_demands_met'
+    assert float(row['time']) < 24 * 365
@@ -0,0 +1,39 @@
+import numpy as np
+
+from simulation_model.build_model import Model
+from simulation_model.discrete_simulator import Simulator
+from simulation_model.main import build_scenario
+from simulation_model.synthetic import build_network
+
+
+def test_dense_ids():
+    nodes, terminals, trains = build_scenario()
+    topology = Model(nodes, terminals, trains).topology
+    assert [topology.node_index[node] for node in nodes] == [0, 1]
+    assert [topology.terminal_index[terminal] for terminal in terminals] == [0, 1, 2]
+    assert topology.related_terminals == [[0], [1, 2]]
+    assert topology.nearest_node == [1, 0]
+    neighbours, distances = topology.neighbours(1)
+    assert neighbours.tolist() == [0] and distances.tolist() == [800]
+
+
+def test_nearest_node_is_the_first_on_ties():
+    nodes, terminals, trains = build_network(12, trains=4, neighbours=4, seed=2)
+    topology = Model(nodes, terminals, trains).topology
+    for index, node in enumerate(nodes):
+        distances = [dist_map.distance for dist_map in node.distance_map]
+        first = int(np.argmin(distances))
+        assert topology.nearest_node[index] == topology.node_index[node.distance_map[first].destiny]
+        assert topology.nearest_distance[index] == distances[first]
+
+
+def test_synthetic_networks_are_reproducible():
+    def run(seed):
+        model = Model(*build_network(20, trains=15, seed=seed))
+        model.verbose = False
+        Simulator().simulate(model, 30 * 24)
+        return model.queue_time(), [demand.current_demand for terminal in model.terminals
+                                    for demand in terminal.demands]
+
+    assert run(1) == run(1)
+    assert run(1) != run(2)